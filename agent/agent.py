@@ -2,8 +2,8 @@
 # -*- coding: utf-8 -*-
 
 # use relative imports for other modules 
-from env.market import MarketState, Order, Trade
-from env.replay import Backtest # use timestamp_global
+from env.context import Context
+from env.market import Order
 
 # general imports
 import abc
@@ -12,6 +12,14 @@ import textwrap
 
 class BaseAgent(abc.ABC):
 
+    # set to True if agent treats each market independently (see Backtest.run_partitioned)
+    market_separable = False
+
+    # number of book levels used by agent, None for all levels (see Backtest)
+    book_depth = None
+    # event types the agent is informed about, i.e. on_quote ('BOOK') and on_trade ('TRADES')
+    event_types = ("BOOK", "TRADES")
+
     def __init__(self, name, exposure_limit=1e6, latency=10, transaction_cost_factor=5e-05):
         """
         Trading agent base class. Subclass BaseAgent to define how a concrete
@@ -85,8 +93,8 @@ class BaseAgent(abc.ABC):
         String representation.
         """
 
-        # read global timestamp from Backtest class attribute
-        timestamp_global = Backtest.timestamp_global
+        # read timestamp from the clock of the engine context
+        timestamp_global = self.market_interface.context.timestamp
 
         # string representation
         string = f"""
@@ -115,6 +123,7 @@ class MarketInterface:
         exposure_limit:float,
         latency:int, # in us (microseconds)
         transaction_cost_factor:float, # 0.5 bps
+        context=None,
     ):
         """
         The market interface is used to interact with the market, that is, 
@@ -131,18 +140,55 @@ class MarketInterface:
             int, latency before order submission (in us), default is 10
         :param transaction_cost_factor:
             float, transcation cost factor per trade (in bps), default is 10
+        :param context:
+            Context, engine context to interact with, default is Context.default
         """
 
         # containers for related class instances
-        self.market_state_list = MarketState.instances
-        self.order_list = Order.history
-        self.trade_list = Trade.history
+        self.bind(context or Context.default)
 
         # settings
         self.exposure_limit = exposure_limit # ...
         self.latency = latency # in microseconds ("U"), used only in submit method
         self.transaction_cost_factor = transaction_cost_factor # in bps
 
+    def bind(self, context):
+        """
+        Bind market interface to an engine context, that is, use its markets,
+        orders, trades and clock. Backtest binds a copy of the market 
+        interface to its own context with each episode.
+
+        :param context:
+            Context, engine context to interact with
+        """
+
+        # containers for related class instances
+        self.context = context
+        self.market_state_list = context.markets
+        self.order_list = context.orders
+        self.trade_list = context.trades
+
+    def __getstate__(self):
+        """
+        Exclude engine context and its containers when pickled (or 
+        deep-copied), as the context is not to be shared.
+        """
+
+        state = self.__dict__.copy()
+        for key in ["context", "market_state_list", "order_list", "trade_list"]:
+            state.pop(key, None)
+
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore pickled (or deep-copied) instance and bind it to the default 
+        engine context.
+        """
+
+        self.__dict__.update(state)
+        self.bind(Context.default)
+
     # order management ---
 
     def submit_order(self, market_id, side, quantity, limit=None):
@@ -166,11 +212,12 @@ class MarketInterface:
 
         # submit order
         order = Order(
-            timestamp=Backtest.timestamp_global + pd.Timedelta(self.latency, "us"), # microseconds
+            timestamp=self.context.timestamp + pd.Timedelta(self.latency, "us"), # microseconds
             market_id=market_id,
             side=side,
             quantity=quantity,
             limit=limit,
+            context=self.context,
         )
 
         return order
@@ -227,7 +274,7 @@ class MarketInterface:
 
     def get_filtered_orders(self, market_id=None, side=None, status=None):
         """
-        Filter Order.history based on market_id, side and status.
+        Filter order_list based on market_id, side and status.
 
         :param market_id:
             str, market identifier, optional
@@ -255,7 +302,7 @@ class MarketInterface:
 
     def get_filtered_trades(self, market_id=None, side=None):
         """
-        Filter Trade.history based on market_id and side.
+        Filter trade_list based on market_id and side.
 
         :param market_id:
             str, market identifier, optional
@@ -276,6 +323,18 @@ class MarketInterface:
 
         return list(trades)
 
+    @property
+    def blotter(self):
+        """
+        Columnar representation of trade_list, use `blotter.to_numpy()` or
+        `blotter.to_frame()` for vectorised analytics.
+
+        :return blotter:
+            Blotter, trade blotter of the current episode
+        """
+
+        return self.context.blotter
+
     # symbol, agent statistics ---
 
     @property
@@ -459,7 +518,9 @@ class MarketInterface:
             float, accumulated transaction cost
         """
 
-        result = sum(t.price * t.quantity for t in self.trade_list)
+        # vectorised over the trade blotter
+        trades = self.blotter.to_numpy()
+        result = float((trades["price"] * trades["quantity"]).sum())
         result = result * self.transaction_cost_factor
         result = round(result, 3)
 
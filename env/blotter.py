@@ -0,0 +1,204 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# general imports
+import numpy as np
+import pandas as pd
+
+
+class Blotter:
+
+    # column name: dtype
+    columns = {
+        "timestamp": np.int64, # in ns, exported as datetime64[ns]
+        "market": np.int32, # index into Blotter.markets
+        "side": np.int8, # +1 for 'buy', -1 for 'sell'
+        "quantity": np.int64,
+        "price": np.float64,
+    }
+
+    def __init__(self, capacity=1024):
+        """
+        Columnar trade blotter, that is a struct-of-arrays representation of
+        all trades with one NumPy array per column. The arrays grow by
+        doubling their capacity whenever they are full, and are exported
+        without copy using `to_numpy()` or `to_frame()`.
+
+        Note that market_id and side are encoded as integers, market_id as
+        index into `markets` and side as +1 ('buy') or -1 ('sell'), so that
+        e.g. the signed position is simply `(side * quantity).sum()`.
+
+        :param capacity:
+            int, initial number of rows, default is 1024
+        """
+
+        # one array per column, filled up to self._size
+        self._arrays = {column: np.empty(capacity, dtype=dtype)
+            for column, dtype in self.columns.items()
+        }
+        self._size = 0
+
+        # market index, [<market_id>, *]
+        self.markets = []
+        self._market_index = dict()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, market_id, side, quantity, price):
+        """
+        Append a single trade to the blotter, as its last row.
+
+        :param timestamp:
+            pd.Timestamp, date and time that trade was created
+        :param market_id:
+            str, market identifier
+        :param side:
+            str, either 'buy' or 'sell'
+        :param quantity:
+            int, number of shares executed
+        :param price:
+            float, price of shares executed
+        """
+
+        # grow by doubling if all rows are used
+        if self._size == len(self._arrays["price"]):
+            self._grow()
+
+        # encode market_id, add to market index if new
+        market = self._market_index.get(market_id)
+        if market is None:
+            market = self._market_index[market_id] = len(self.markets)
+            self.markets.append(market_id)
+
+        # write row
+        i = self._size
+        self._arrays["timestamp"][i] = timestamp.value
+        self._arrays["market"][i] = market
+        self._arrays["side"][i] = 1 if side == "buy" else -1
+        self._arrays["quantity"][i] = quantity
+        self._arrays["price"][i] = price
+        self._size += 1
+
+    def get(self, row, column):
+        """
+        Value of a single cell, decoded as passed to `append`, that is,
+        timestamp as pd.Timestamp, market as market_id, side as 'buy' or
+        'sell', quantity and price as int and float.
+
+        :param row:
+            int, row index
+        :param column:
+            str, column name, see `columns`
+        :return value:
+            ..., decoded value
+        """
+
+        value = self._arrays[column][row]
+
+        # decode column
+        if column == "timestamp":
+            return pd.Timestamp(value)
+        if column == "market":
+            return self.markets[value]
+        if column == "side":
+            return "buy" if value == 1 else "sell"
+
+        return value.item()
+
+    def _grow(self):
+        """
+        Double the capacity of all columns.
+        """
+
+        for column, array in self._arrays.items():
+            array_new = np.empty(max(2 * len(array), 1), dtype=array.dtype)
+            array_new[:self._size] = array[:self._size]
+            self._arrays[column] = array_new
+
+    # merge ---
+
+    @classmethod
+    def concat(class_reference, blotter_list):
+        """
+        Merge multiple blotters into a new blotter, ordered by timestamp. 
+        Trades with identical timestamps keep the order of blotter_list.
+
+        :param blotter_list:
+            list, [<Blotter>, *]
+        :return blotter:
+            Blotter, merged blotter
+        """
+
+        blotter = class_reference(capacity=sum(len(b) for b in blotter_list))
+
+        # nothing to merge
+        if not blotter_list:
+            return blotter
+
+        # merged market index, in order of first occurrence
+        for b in blotter_list:
+            for market_id in b.markets:
+                if market_id not in blotter._market_index:
+                    blotter._market_index[market_id] = len(blotter.markets)
+                    blotter.markets.append(market_id)
+
+        # concatenate columns, re-encode market as index into merged market index
+        for column in class_reference.columns:
+            if column == "market":
+                array_list = [np.array([blotter._market_index[market_id] 
+                    for market_id in b.markets], dtype=np.int32
+                )[b._arrays["market"][:b._size]] for b in blotter_list]
+            else:
+                array_list = [b._arrays[column][:b._size] for b in blotter_list]
+            blotter._arrays[column][:] = np.concatenate(array_list)
+
+        # sort all columns by timestamp (stable)
+        order = np.argsort(blotter._arrays["timestamp"], kind="stable")
+        for column, array in blotter._arrays.items():
+            blotter._arrays[column] = array[order]
+        blotter._size = len(order)
+
+        return blotter
+
+    # export ---
+
+    def to_numpy(self):
+        """
+        Export blotter as read-only views on the underlying arrays (no copy).
+
+        Note that the views remain valid only until the next row is appended,
+        as growing the blotter reallocates the arrays.
+
+        :return columns:
+            dict, {<column>: <np.ndarray>, *}
+        """
+
+        result = dict()
+
+        for column, array in self._arrays.items():
+            view = array[:self._size]
+            # timestamp is stored as int64 but exported as datetime64
+            if column == "timestamp":
+                view = view.view("datetime64[ns]")
+            view.flags.writeable = False
+            result[column] = view
+
+        return result
+
+    def to_frame(self):
+        """
+        Export blotter as dataframe, based on the views returned by
+        `to_numpy()`. The market column is provided as categorical with
+        market_id as categories, using the stored market index as codes.
+
+        :return blotter:
+            pd.DataFrame, one row per trade
+        """
+
+        columns = self.to_numpy()
+        columns["market"] = pd.Categorical.from_codes(columns["market"],
+            categories=self.markets,
+        )
+
+        return pd.DataFrame(columns, copy=False)
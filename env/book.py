@@ -0,0 +1,145 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# general imports
+import bisect
+from collections.abc import Mapping, MutableMapping
+
+
+class PriceLevels(MutableMapping):
+
+    def __init__(self):
+        """
+        Price level container that keeps track of the liquidity_list per price
+        level while additionally maintaining a sorted index of all included
+        prices. Prices are inserted into the sorted index (using bisect) only
+        when they are added for the first time, so that the container never
+        needs to be re-sorted as a whole.
+
+        The data structure is ...
+        {<price>: [(<timestamp>, <quantity>), *], *}
+
+        ... and iterates over prices in ASCENDING order. Use `view(side,
+        midpoint)` to obtain a side-aware, read-only view that iterates over
+        the price levels of either the bid side (DESCENDING) or the ask side
+        (ASCENDING), split at the given midpoint.
+        """
+
+        # liquidity_list per price level
+        self._levels = dict()
+        # sorted price index (ASCENDING)
+        self._prices = list()
+
+    # mapping interface ---
+
+    def __getitem__(self, price):
+        return self._levels[price]
+
+    def __setitem__(self, price, liquidity_list):
+        # insert price into sorted index only if price is new
+        if price not in self._levels:
+            bisect.insort(self._prices, price)
+        self._levels[price] = liquidity_list
+
+    def __delitem__(self, price):
+        # remove price from sorted index as well
+        del self._levels[price]
+        del self._prices[bisect.bisect_left(self._prices, price)]
+
+    def __contains__(self, price):
+        return price in self._levels
+
+    def __iter__(self):
+        return iter(self._prices)
+
+    def __len__(self):
+        return len(self._prices)
+
+    def get(self, price, default=None):
+        return self._levels.get(price, default)
+
+    # views ---
+
+    def view(self, side, midpoint):
+        """
+        Return read-only view for a given side of the price levels.
+
+        :param side:
+            str, either 'bid' or 'ask'
+        :param midpoint:
+            float, midpoint used to separate bid side and ask side
+        :return view:
+            PriceLevelsView, read-only view on the respective side
+        """
+
+        return PriceLevelsView(self, side, midpoint)
+
+    def _bounds(self, side, midpoint):
+        """
+        Compute the bounds of a given side within the sorted price index.
+        Prices equal to the midpoint belong to neither side.
+        """
+
+        # bid side includes all prices below midpoint
+        if side == "bid":
+            return 0, bisect.bisect_left(self._prices, midpoint)
+        # ask side includes all prices above midpoint
+        if side == "ask":
+            return bisect.bisect_right(self._prices, midpoint), len(self._prices)
+
+        raise ValueError("side can only take values 'bid' and 'ask', not '{side}'".format(
+            side=side,
+        ))
+
+
+class PriceLevelsView(Mapping):
+
+    def __init__(self, levels, side, midpoint):
+        """
+        Read-only view on one side of a PriceLevels container. The view does
+        not copy any price level, it iterates over the underlying container
+        in price priority order, that is DESCENDING for the bid side and
+        ASCENDING for the ask side.
+
+        Note that the view is live, it reflects all subsequent changes made
+        to the underlying container.
+
+        :param levels:
+            PriceLevels, underlying price level container
+        :param side:
+            str, either 'bid' or 'ask'
+        :param midpoint:
+            float, midpoint used to separate bid side and ask side
+        """
+
+        # static attributes from arguments
+        self._levels = levels
+        self.side = side
+        self.midpoint = midpoint
+
+    def _includes(self, price):
+        return price < self.midpoint if self.side == "bid" else price > self.midpoint
+
+    def __getitem__(self, price):
+        # price must belong to the respective side
+        if not self._includes(price):
+            raise KeyError(price)
+        return self._levels[price]
+
+    def __contains__(self, price):
+        return self._includes(price) and price in self._levels
+
+    def __iter__(self):
+        start, stop = self._levels._bounds(self.side, self.midpoint)
+        prices = self._levels._prices
+        # bid side is iterated DESCENDING, ask side ASCENDING (without copy)
+        if self.side == "bid":
+            return (prices[i] for i in range(stop - 1, start - 1, -1))
+        return (prices[i] for i in range(start, stop))
+
+    def __len__(self):
+        start, stop = self._levels._bounds(self.side, self.midpoint)
+        return stop - start
+
+    def get(self, price, default=None):
+        return self._levels.get(price, default) if self._includes(price) else default
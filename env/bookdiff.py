@@ -0,0 +1,151 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# use relative imports for other modules
+from env import kernels
+
+# general imports
+import numpy as np
+
+
+class BookDifferences:
+
+    def __init__(self, df, book_last=None):
+        """
+        Book differences of a single BOOK source, that is, the quantity to add
+        (positive) or to use (negative) per price level and book update, as
+        computed by `MarketState._update_posttrade_state` from two consecutive
+        book updates. All book differences of a source are computed at once,
+        using array operations on price and quantity matrices ...
+
+        - same side (price on the same side of last and this midpoint): one
+        entry with (this - last) quantity
+        - opposite side (otherwise): two entries, remove last quantity, add
+        this quantity (in that order)
+
+        ... so that the market state only needs to apply the book differences
+        of each update, see `get(row)`. Entries with empty quantity are
+        dropped. As with `MarketState.update`, corrupted book updates (any bid
+        larger than or equal to its respective ask) are skipped, the next book
+        update is compared against the last valid one.
+
+        Note that prices are kept as provided by the source, that is, not
+        converted into tick counts.
+
+        :param df:
+            pd.DataFrame, aligned BOOK source (timestamp, then price and
+            quantity per level and side), rows without update are empty (NaN)
+        :param book_last:
+            tuple, (prices, quantities, midpoint) of the last valid book
+            update before df, None if df includes the first book update
+        """
+
+        # price and quantity matrices, [<L1-BidPrice>, <L1-AskPrice>, <L2-BidPrice>, ...]
+        values = df.iloc[:, 1:].to_numpy(dtype=float)
+        prices, quantities = values[:, 0::2], values[:, 1::2]
+
+        # book updates that are not empty and not corrupted
+        with np.errstate(invalid="ignore"):
+            is_corrupted = (values[:, 0::4] >= values[:, 2::4]).any(axis=1)
+        rows = np.flatnonzero(~np.isnan(values).all(axis=1) & ~is_corrupted)
+
+        # this and last book update per valid book update
+        prices_this, quantities_this = prices[rows], quantities[rows]
+        midpoint_this = (prices_this[:, 0] + prices_this[:, 1]) / 2
+        if book_last is None:
+            book_last = (np.full(prices.shape[1], np.nan), np.full(prices.shape[1], np.nan), 0.) # empty book
+        prices_last = np.vstack([book_last[0][None, :], prices_this])[:len(rows)]
+        quantities_last = np.vstack([book_last[1][None, :], quantities_this])[:len(rows)]
+        midpoint_last = np.concatenate([[book_last[2]], midpoint_this])[:len(rows)]
+
+        # keep last valid book update for the subsequent part
+        if len(rows):
+            self.book_last = (prices_this[-1], quantities_this[-1], midpoint_this[-1])
+        else:
+            self.book_last = book_last
+
+        # entries ---
+
+        # compiled kernel, if enabled (see env.kernels)
+        if kernels.is_enabled():
+            step, price, quantity = kernels.book_difference(
+                prices_last, quantities_last, midpoint_last,
+                prices_this, quantities_this, midpoint_this,
+            )
+        else:
+            step, price, quantity = self._compute_entries(
+                prices_last, quantities_last, midpoint_last,
+                prices_this, quantities_this, midpoint_this,
+            )
+
+        # compact representation ---
+
+        # entries per row of df, rows without (valid) book update have no entries
+        self._price = price
+        self._quantity = quantity
+        self._offsets = np.searchsorted(rows[step], np.arange(len(values) + 1))
+        self._is_valid = np.zeros(len(values), dtype=bool)
+        self._is_valid[rows] = True
+
+    @staticmethod
+    def _compute_entries(prices_last, quantities_last, midpoint_last, prices_this, quantities_this, midpoint_this):
+        """
+        Entries of all book differences, with array operations.
+
+        :param prices_last, quantities_last, midpoint_last:
+            np.ndarray, last valid book update (t-1) per step
+        :param prices_this, quantities_this, midpoint_this:
+            np.ndarray, this book update (t) per step
+        :return step, price, quantity:
+            np.ndarray, entries sorted by step, price and order (remove, add)
+        """
+
+        # one entry per price level, last (remove, order 0) and this (add, order 1)
+        num_steps, num_levels = prices_this.shape
+        step = np.tile(np.repeat(np.arange(num_steps), num_levels), 2)
+        price = np.concatenate([prices_last.ravel(), prices_this.ravel()])
+        quantity = np.concatenate([-quantities_last.ravel(), quantities_this.ravel()])
+        order = np.repeat([0, 1], num_steps * num_levels)
+
+        # skip missing price levels (NaN)
+        is_valid = ~np.isnan(price)
+        step, price, quantity, order = step[is_valid], price[is_valid], quantity[is_valid], order[is_valid]
+
+        # price on same side of last and this midpoint
+        is_same_side = (midpoint_this[step] - price) * (midpoint_last[step] - price) > 0
+        # same side entries are merged per price level (order 0), opposite side entries are kept
+        order = np.where(is_same_side, 0, order)
+
+        # sort by step, price and order, merge entries with identical keys
+        index = np.lexsort((order, price, step))
+        step, price, quantity, order = step[index], price[index], quantity[index], order[index]
+        is_first = np.ones(len(step), dtype=bool)
+        is_first[1:] = (step[1:] != step[:-1]) | (price[1:] != price[:-1]) | (order[1:] != order[:-1])
+        start = np.flatnonzero(is_first)
+        quantity = np.add.reduceat(quantity, start) if len(start) else quantity
+        step, price = step[start], price[start]
+
+        # drop entries with empty quantity (or missing quantity)
+        is_valid = (quantity > 0) | (quantity < 0)
+        step, price, quantity = step[is_valid], price[is_valid], quantity[is_valid]
+
+        return step, price, quantity
+
+    def get(self, row):
+        """
+        Book difference of a given book update.
+
+        :param row:
+            int, row of the aligned BOOK source
+        :return book_difference:
+            list, [(<price>, <quantity>), *], None if the book update is
+            empty or corrupted
+        """
+
+        if not self._is_valid[row]:
+            return None
+
+        # ...
+        start, stop = self._offsets[row], self._offsets[row + 1]
+
+        return list(zip(self._price[start:stop], self._quantity[start:stop]))
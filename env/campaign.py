@@ -0,0 +1,390 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# use relative imports for other modules
+from env.checkpoint import Checkpoint, describe_agent
+from env.events import EventLog
+from env.replay import Backtest
+
+# general imports
+import contextlib
+import logging
+import os
+import pandas as pd
+import pickle
+import socket
+import threading
+import time
+import traceback
+
+
+class Campaign:
+
+    # marker that starts each failed attempt in an item file
+    _attempt_marker = "--- failed attempt"
+
+    def __init__(self, directory):
+        """
+        Campaign that shares the episodes of a backtest across any number of
+        worker processes on any number of hosts, using nothing but a shared
+        filesystem (e.g. NFS). The campaign directory is structured as ...
+
+        - `campaign.pkl`: agent_factory, sources and episode_list
+        - `todo/<item>`: one file per episode that has yet to be run
+        - `claimed/<item>`: episodes that are currently being run
+        - `failed/<item>`: episodes that have failed max_attempts times
+        - `results/`: result per episode, see Checkpoint
+
+        Use `Campaign.create(...)` once to write a new campaign, and
+        `Campaign(directory).work()` (e.g. `python main.py --campaign
+        <directory>`) to start a worker. Workers claim items by renaming them
+        from todo/ to claimed/, which is atomic, so that each item is claimed
+        by exactly one worker. While an item is being run, its claim is
+        refreshed regularly. Claims that have not been refreshed for
+        claim_timeout seconds (e.g. the worker has died) are stale and
+        returned to todo/.
+
+        If an episode raises an exception (e.g. in the agent), the traceback
+        is appended to its item file and the item is returned to todo/, so
+        that the worker continues with the next item. Stale claims are
+        recorded in the same way. Items that have failed max_attempts times
+        are moved to failed/ instead of being run again.
+
+        :param directory:
+            str, campaign directory, see Campaign.create
+        """
+
+        # static attributes from arguments
+        self.directory = directory
+
+        # load campaign specification
+        with open(os.path.join(directory, "campaign.pkl"), "rb") as file:
+            self.spec = pickle.load(file)
+
+        # results are saved per episode, keyed by configuration
+        self.checkpoint = Checkpoint(os.path.join(directory, "results"),
+            config=self.spec["config"],
+        )
+
+    @classmethod
+    def create(class_reference,
+        directory:str,
+        agent_factory,
+        identifier_list:list,
+        source_directory:str,
+        episode_list:list,
+        sampling_freq:int or str=1,
+        tick_size:float or dict=None,
+    ):
+        """
+        Write a new campaign to directory, with one work item per episode.
+
+        :param directory:
+            str, campaign directory, must be empty or not exist yet
+        :param agent_factory:
+            callable, picklable factory that returns a fresh agent instance,
+            must be importable by all workers
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        :param source_directory:
+            str, path to book and trade sources, may be overridden per worker
+        :param episode_list:
+            list, includes (episode_start_buffer, episode_start, episode_end) tuples
+        :param sampling_freq:
+            int or str, int for event-based subsampling, every i-th event or str for time-based subsampling, e.g.
+            '1s' for last event in each second
+        :param tick_size:
+            float or dict, see Backtest
+        :return campaign:
+            Campaign, ...
+        """
+
+        # Assert
+        assert not os.path.exists(directory) or not os.listdir(directory), \
+            "Campaign already exists in {directory} (directory is not empty)".format(directory=directory)
+
+        # fails if another campaign is created in the same directory at the same time
+        for subdirectory in ["todo", "claimed", "failed", "results"]:
+            os.makedirs(os.path.join(directory, subdirectory))
+
+        # campaign specification
+        spec = {
+            'agent_factory': agent_factory,
+            'tick_size': tick_size,
+            'run_kwargs': dict(
+                identifier_list=identifier_list,
+                source_directory=source_directory,
+                sampling_freq=sampling_freq,
+            ),
+            'episode_list': [tuple(map(pd.Timestamp, episode)) for episode in episode_list],
+            'config': dict(
+                agent=describe_agent(agent_factory()),
+                identifier_list=identifier_list,
+                sampling_freq=sampling_freq,
+                tick_size=tick_size,
+            ),
+        }
+
+        # work items first, campaign.pkl last (written atomically)
+        for index in range(len(episode_list)):
+            open(os.path.join(directory, "todo", f"{index:06d}"), "w").close()
+        with open(os.path.join(directory, "campaign.pkl.tmp"), "wb") as file:
+            pickle.dump(spec, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(os.path.join(directory, "campaign.pkl.tmp"),
+            os.path.join(directory, "campaign.pkl"),
+        )
+
+        return class_reference(directory)
+
+    # properties ---
+
+    @property
+    def status(self):
+        """
+        Number of work items per state.
+
+        :return status:
+            dict, {'todo': <int>, 'claimed': <int>, 'failed': <int>, 'done': <int>}
+        """
+
+        result = {
+            'todo': len(os.listdir(os.path.join(self.directory, "todo"))),
+            'claimed': len(os.listdir(os.path.join(self.directory, "claimed"))),
+            'failed': len(os.listdir(os.path.join(self.directory, "failed"))),
+        }
+        result['done'] = len(self.spec["episode_list"]) - result['todo'] - result['claimed'] - result['failed']
+
+        return result
+
+    @property
+    def results(self):
+        """
+        Results of all successful episodes that have been completed so far,
+        in the order of episode_list.
+
+        :return results:
+            list, see Backtest.results
+        """
+
+        result_list = [self.checkpoint.load(episode)[1]
+            for episode in self.spec["episode_list"]
+        ]
+
+        return [result for result in result_list if result]
+
+    # work ---
+
+    def work(self, claim_timeout:int=3600, poll_interval:int=10, source_directory:str=None, wait:bool=True,
+        max_attempts:int=3,
+    ):
+        """
+        Run work items until no item is left. Stale claims of other workers
+        are returned to todo/ before each claim. Items that fail are returned
+        to todo/ as well, see Campaign.
+
+        :param claim_timeout:
+            int, seconds after which a claim that has not been refreshed is
+            considered stale, default is 3600
+        :param poll_interval:
+            int, seconds to wait for claims of other workers, default is 10
+        :param source_directory:
+            str, path to book and trade sources on this host, optional
+        :param wait:
+            bool, if True, wait until all claims of other workers have either
+            been completed or become stale, default is True
+        :param max_attempts:
+            int, number of failed attempts (exceptions or stale claims) after
+            which an item is moved to failed/, default is 3
+        :return num_items:
+            int, number of work items run by this worker (without failures)
+        """
+
+        # ...
+        worker_id = "{host}:{pid}".format(host=socket.gethostname(), pid=os.getpid())
+        num_items = 0
+
+        while True:
+
+            # return stale claims to todo/
+            self._reclaim(claim_timeout)
+
+            # claim next work item
+            item = self._claim(max_attempts)
+
+            # nothing left to claim, wait for claims of other workers if required
+            if item is None:
+                if wait and self.status['claimed']:
+                    time.sleep(poll_interval)
+                    continue
+                break
+
+            # ...
+            logging.info("(INFO) worker {worker_id} has claimed item {item}".format(
+                worker_id=worker_id,
+                item=item,
+            ))
+            try:
+                self._run_item(item, claim_timeout, source_directory)
+            # record failure and return item, continue with the next item
+            except Exception:
+                logging.info("(ERROR) worker {worker_id} has failed on item {item}".format(
+                    worker_id=worker_id,
+                    item=item,
+                ))
+                # claim may have been returned as stale in the meantime
+                with contextlib.suppress(FileNotFoundError):
+                    self._release(item, "failed on worker {worker_id}\n{traceback}".format(
+                        worker_id=worker_id,
+                        traceback=traceback.format_exc(),
+                    ))
+                continue
+            num_items = num_items + 1
+
+        return num_items
+
+    def _claim(self, max_attempts):
+        """
+        Claim next work item, that is, rename it from todo/ to claimed/. Items
+        that have failed max_attempts times are moved on to failed/.
+
+        :param max_attempts:
+            int, ...
+        :return item:
+            str, name of claimed work item, None if no item is left
+        """
+
+        for item in sorted(os.listdir(os.path.join(self.directory, "todo"))):
+            path_todo = os.path.join(self.directory, "todo", item)
+            path_claimed = os.path.join(self.directory, "claimed", item)
+
+            # refresh before rename, rename keeps modification time
+            try:
+                os.utime(path_todo)
+                os.rename(path_todo, path_claimed)
+            # item has been claimed by another worker in the meantime
+            except FileNotFoundError:
+                continue
+
+            # give up on items that keep failing
+            if self._count_attempts(path_claimed) >= max_attempts:
+                os.rename(path_claimed, os.path.join(self.directory, "failed", item))
+                logging.info("(ERROR) item {item} has failed {max_attempts} times and is moved to failed/".format(
+                    item=item,
+                    max_attempts=max_attempts,
+                ))
+                continue
+
+            return item
+
+        return None
+
+    def _reclaim(self, claim_timeout):
+        """
+        Return stale claims, that is, claims that have not been refreshed for
+        claim_timeout seconds, from claimed/ to todo/.
+
+        :param claim_timeout:
+            int, ...
+        """
+
+        for item in os.listdir(os.path.join(self.directory, "claimed")):
+            path_claimed = os.path.join(self.directory, "claimed", item)
+
+            try:
+                if time.time() - os.path.getmtime(path_claimed) > claim_timeout:
+                    self._release(item, "stale claim (worker has died or hung)")
+                    logging.info("(INFO) stale claim for item {item} has been returned".format(
+                        item=item,
+                    ))
+            # claim has been completed or returned by another worker in the meantime
+            except FileNotFoundError:
+                continue
+
+    def _release(self, item, message):
+        """
+        Record a failed attempt of a claimed work item, that is, append
+        message to the item file, and return the item to todo/. Raises
+        FileNotFoundError if the claim has been returned by another worker in
+        the meantime.
+
+        :param item:
+            str, name of claimed work item
+        :param message:
+            str, reason of failure, e.g. traceback
+        """
+
+        # append to existing item file only, do not create it
+        path = os.path.join(self.directory, "claimed", item)
+        with open(path, "r+") as file:
+            file.seek(0, os.SEEK_END)
+            file.write("{marker} {timestamp}: {message}\n".format(
+                marker=self._attempt_marker,
+                timestamp=pd.Timestamp.now(tz="UTC"),
+                message=message.rstrip("\n"),
+            ))
+        os.rename(path, os.path.join(self.directory, "todo", item))
+
+    def _count_attempts(self, path):
+        """
+        Number of failed attempts recorded in an item file.
+
+        :param path:
+            str, path to item file
+        :return num_attempts:
+            int, ...
+        """
+
+        with open(path, "r") as file:
+            return sum(line.startswith(self._attempt_marker) for line in file)
+
+    def _run_item(self, item, claim_timeout, source_directory=None):
+        """
+        Run the episode of a claimed work item, save its result and complete
+        the claim. The claim is refreshed in a background thread.
+
+        :param item:
+            str, name of claimed work item
+        :param claim_timeout:
+            int, ...
+        :param source_directory:
+            str, path to book and trade sources on this host, optional
+        """
+
+        path_claimed = os.path.join(self.directory, "claimed", item)
+        episode_start_buffer, episode_start, episode_end = self.spec["episode_list"][int(item)]
+
+        # refresh claim regularly while the episode is being run
+        stop = threading.Event()
+        def refresh():
+            while not stop.wait(claim_timeout / 4):
+                try:
+                    os.utime(path_claimed)
+                except FileNotFoundError:
+                    break
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+
+        try:
+            # run episode (or load result if it has been saved already)
+            backtest = Backtest(agent=self.spec["agent_factory"](),
+                tick_size=self.spec["tick_size"],
+            )
+            backtest._run_or_resume(self.checkpoint, **dict(self.spec["run_kwargs"],
+                source_directory=source_directory or self.spec["run_kwargs"]["source_directory"],
+                episode_start_buffer=episode_start_buffer,
+                episode_start=episode_start,
+                episode_end=episode_end,
+            ))
+            EventLog.sink.flush()
+        finally:
+            stop.set()
+            thread.join()
+
+        # complete claim, result has been saved (even if the claim has been 
+        # returned as stale in the meantime, the item is done anyway)
+        for subdirectory in ["claimed", "todo"]:
+            try:
+                os.remove(os.path.join(self.directory, subdirectory, item))
+                break
+            except FileNotFoundError:
+                continue
@@ -0,0 +1,264 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# general imports
+import contextlib
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pandas as pd
+
+DATETIME = "TIMESTAMP_UTC"
+
+
+class Catalog:
+
+    def __init__(self, source_directory, cache_path=None):
+        """
+        Catalog of all book and trade sources available in source_directory,
+        used to plan episodes without loading any data. The directory is
+        listed only once, and for each BOOK file, the first and last
+        timestamp are read once (lazily) and cached ...
+
+        - `find(identifier, date)`: path for a given source and date
+        - `bounds(path)`: first and last timestamp of a BOOK file
+        - `is_valid(...)`: whether an episode can be built at all
+
+        The timestamps are also stored in a JSON file using `save()`, so that
+        they are read only once across runs, by default in the user's cache
+        directory (one file per source_directory). Cached timestamps are
+        invalidated whenever a file's size or modification time changes.
+
+        :param source_directory:
+            str, path to book and trade sources, e.g. "/home/jovyan/_shared_storage/read_only/efn2_backtesting"
+        :param cache_path:
+            str, path to JSON file to cache first and last timestamps, default
+            is ~/.cache/l2bt/catalog-<key>.json
+        """
+
+        # static attributes from arguments
+        self.source_directory = source_directory
+        self.cache_path = cache_path or self._default_cache_path(source_directory)
+
+        # path_list includes all paths available in directory
+        self.path_list = [os.path.join(pre, file) for pre, _, sub in os.walk(source_directory)
+            for file in sub if not file.startswith((".", "_"))
+        ]
+
+        # cached lookups, {(<identifier>, <date_string>): <path>, *}
+        self._path_store = dict()
+        # cached bounds, {<path>: [<size>, <mtime>, <first>, <last>], *}
+        self._bounds_store = dict()
+        self._is_modified = False
+
+        # load bounds cached by other processes (or earlier runs)
+        if os.path.exists(self.cache_path):
+            with contextlib.suppress(OSError, ValueError):
+                with open(self.cache_path, "r") as file:
+                    self._bounds_store = json.load(file)
+
+    def find(self, identifier, date):
+        """
+        Find the path for a given source and date. The path must contain
+        market_id, event_id (both case-insensitive) and date (YYYYMMDD).
+
+        :param identifier:
+            str, <market_id>.BOOK/TRADES identifier
+        :param date:
+            datetime.date, ...
+        :return path:
+            str, path if there is exactly one matching path, None otherwise
+        """
+
+        # ...
+        date_string = str(date).replace("-", "")
+        key = (identifier, date_string)
+
+        if key not in self._path_store:
+
+            # identify matching criteria
+            market_id, event_id = identifier.split(".")
+
+            # filter based on matching criteria
+            path_list = [path for path in self.path_list
+                if market_id.lower() in path.lower()
+                and event_id.lower() in path.lower()
+                and date_string in path
+            ]
+
+            # there should be exactly one matching path
+            self._path_store[key] = path_list[0] if len(path_list) == 1 else None
+
+        return self._path_store[key]
+
+    def bounds(self, path):
+        """
+        First and last timestamp of a BOOK file, read from the first and
+        the last line only (timezone-unaware, as in Episode).
+
+        :param path:
+            str, path to .csv(.gz) file
+        :return first:
+            pd.Timestamp, first timestamp, None if file is empty
+        :return last:
+            pd.Timestamp, last timestamp, None if file is empty
+        """
+
+        # cache is valid only as long as file remains unchanged
+        stat = os.stat(path)
+        cached = self._bounds_store.get(path)
+
+        if not cached or cached[:2] != [stat.st_size, stat.st_mtime]:
+            first, last = self._read_bounds(path)
+            self._bounds_store[path] = [stat.st_size, stat.st_mtime, first, last]
+            self._is_modified = True
+        else:
+            first, last = cached[2:]
+
+        # ...
+        parse = lambda timestamp: None if timestamp is None else \
+            pd.DatetimeIndex([timestamp]).tz_localize(None)[0]
+
+        return parse(first), parse(last)
+
+    def is_valid(self, identifier_list, timestamp_start, timestamp_end, max_deviation_tol=300):
+        """
+        Check whether an episode between timestamp_start and timestamp_end
+        may be built, without loading any data. An episode is invalid if ...
+
+        - any source has no (or more than one) matching path on the date of
+        timestamp_start or the date of timestamp_end
+        - the first timestamps (date of timestamp_start) and last timestamps
+        (date of timestamp_end) of the BOOK files imply that the episode 
+        would fail the max_deviation_tol sanity check in Episode
+
+        Note that an episode deemed valid may still fail once data is loaded,
+        but an episode deemed invalid would always fail.
+
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        :param timestamp_start:
+            pd.Timestamp, ...
+        :param timestamp_end:
+            pd.Timestamp, ...
+        :param max_deviation_tol:
+            int, maximum deviation from the expected episode length (in seconds)
+        :return is_valid:
+            bool, ...
+        """
+
+        # each source requires exactly one matching path on first and last date
+        path_store_first, path_store_last = [{identifier: self.find(identifier, date)
+            for identifier in identifier_list
+        } for date in [timestamp_start.date(), timestamp_end.date()]]
+        if not all(path_store_first.values()) or not all(path_store_last.values()):
+            return False
+
+        # first timestamp across all BOOK sources on first date, last on last date
+        bounds_first = [self.bounds(path) for identifier, path in path_store_first.items()
+            if "BOOK" in identifier
+        ]
+        bounds_last = [self.bounds(path) for identifier, path in path_store_last.items()
+            if "BOOK" in identifier
+        ]
+        first_list = [first for first, _ in bounds_first if first is not None]
+        last_list = [last for _, last in bounds_last if last is not None]
+        if not first_list or not last_list:
+            return not any("BOOK" in identifier for identifier in identifier_list)
+
+        first = min(first_list)
+        last = max(last_list)
+
+        # lower bound for the time delta observed in Episode, data is
+        # restricted to the episode, hence it cannot start before
+        # timestamp_start or end after timestamp_end
+        time_delta_observed = (
+            max(pd.Timedelta(0), first - timestamp_start) +
+            max(pd.Timedelta(0), timestamp_end - last)
+        )
+
+        return time_delta_observed < pd.Timedelta(max_deviation_tol, "s")
+
+    def save(self):
+        """
+        Write cached bounds to cache_path, if any bounds have been read since
+        (atomically).
+        """
+
+        if not self._is_modified:
+            return
+
+        # write into temporary file first and rename afterwards
+        path_temp = "{path}.{pid}.tmp".format(path=self.cache_path, pid=os.getpid())
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(path_temp, "w") as file:
+                json.dump(self._bounds_store, file)
+            os.replace(path_temp, self.cache_path)
+            self._is_modified = False
+        # cache is optional, e.g. directory is read-only
+        except OSError as e:
+            logging.info("(INFO) could not write catalog cache: {error}".format(error=e))
+
+    # helper methods ---
+
+    @staticmethod
+    def _default_cache_path(source_directory):
+        """
+        Default path to cache first and last timestamps, one file per
+        source_directory in the user's cache directory.
+
+        :param source_directory:
+            str, path to book and trade sources
+        :return cache_path:
+            str, ~/.cache/l2bt/catalog-<key>.json
+        """
+
+        key = hashlib.sha1(os.path.abspath(source_directory).encode()).hexdigest()[:16]
+
+        return os.path.join(os.path.expanduser("~"), ".cache", "l2bt", "catalog-{key}.json".format(key=key))
+
+    @staticmethod
+    def _read_bounds(path):
+        """
+        Read first and last timestamp from .csv(.gz) file, without parsing
+        the file as a whole.
+
+        :param path:
+            str, path to .csv(.gz) file
+        :return first:
+            str, first timestamp, None if file is empty
+        :return last:
+            str, last timestamp, None if file is empty
+        """
+
+        # gzip requires decompression up to the last line
+        if path.endswith(".gz"):
+            with gzip.open(path, "rt") as file:
+                header = file.readline().rstrip("\n").split(",")
+                first = last = file.readline()
+                for line in file:
+                    if line.strip():
+                        last = line
+
+        # otherwise, read only the tail of the file
+        else:
+            with open(path, "rb") as file:
+                header = file.readline().decode().rstrip("\r\n").split(",")
+                first = file.readline().decode()
+                file.seek(0, os.SEEK_END)
+                file.seek(max(0, file.tell() - 65536))
+                last = [line for line in file.read().decode(errors="ignore").splitlines()
+                    if line.strip()
+                ][-1]
+
+        # file without any rows
+        if not first.strip():
+            return None, None
+
+        # ...
+        i = header.index(DATETIME)
+
+        return first.split(",")[i].strip(), last.split(",")[i].strip()
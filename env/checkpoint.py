@@ -0,0 +1,213 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# general imports
+import contextlib
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+# file locking is platform-specific
+try:
+    import fcntl
+except ImportError: # windows
+    fcntl = None
+    import msvcrt
+
+
+class Checkpoint:
+
+    def __init__(self, directory, config):
+        """
+        On-disk store of per-episode results, used to resume a series of
+        episodes. Each result is pickled into a separate file whose name is
+        derived from the episode timestamps and a hash of config, so that
+        only results obtained with the same configuration are reused.
+
+        Results are written atomically (temporary file + rename), hence a
+        result file is either complete or missing. While an episode is being
+        run, its lock file is locked exclusively, so that multiple processes
+        may share the same directory without running an episode twice.
+
+        :param directory:
+            str, output directory, created if it does not exist
+        :param config:
+            dict, configuration that results depend on (e.g. identifier_list,
+            sampling_freq), values must have a stable repr
+        """
+
+        # static attributes from arguments
+        self.directory = directory
+        self.key = hashlib.sha1(repr(sorted(config.items())).encode()).hexdigest()[:10]
+
+        # ...
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, episode):
+        """
+        Path to the result file of a given episode.
+
+        :param episode:
+            tuple, (episode_start_buffer, episode_start, episode_end)
+        :return path:
+            str, path to result file
+        """
+
+        # e.g. 20210104T080000_20210104T080500_20210104T083500_<key>.pkl
+        filename = "_".join(timestamp.strftime("%Y%m%dT%H%M%S")
+            for timestamp in episode
+        ) + f"_{self.key}.pkl"
+
+        return os.path.join(self.directory, filename)
+
+    def load(self, episode):
+        """
+        Load result of a given episode.
+
+        :param episode:
+            tuple, (episode_start_buffer, episode_start, episode_end)
+        :return is_found:
+            bool, True if episode has been completed before
+        :return result:
+            dict, result of the episode, None if episode could not be run
+        """
+
+        # episode has not been completed yet
+        if not os.path.exists(self.path(episode)):
+            return False, None
+
+        with open(self.path(episode), "rb") as file:
+            result = pickle.load(file)
+
+        return True, result
+
+    def save(self, episode, result):
+        """
+        Save result of a given episode atomically, that is, write into a
+        temporary file first and rename afterwards.
+
+        :param episode:
+            tuple, (episode_start_buffer, episode_start, episode_end)
+        :param result:
+            dict, result of the episode, None if episode could not be run
+        """
+
+        # temporary file in the same directory, so that rename is atomic
+        fd, path_temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(path_temp, self.path(episode))
+        # do not leave incomplete temporary files behind
+        except BaseException:
+            os.remove(path_temp)
+            raise
+
+    def lock(self, episode):
+        """
+        Lock a given episode exclusively, wait if it is locked by another
+        process. The lock is released on exit and whenever the process dies.
+
+        :param episode:
+            tuple, (episode_start_buffer, episode_start, episode_end)
+        """
+
+        return file_lock(self.path(episode) + ".lock")
+
+
+def describe_agent(agent):
+    """
+    Describe an agent by its class and parameters, that is, its instance
+    attributes and the settings of its market interface, so that results of
+    the same agent class with different parameters are not mixed up (see
+    Checkpoint). Parameters without a stable repr (e.g. objects that include
+    their memory address) result in a new description with each run, hence
+    such results are computed again rather than reused.
+
+    :param agent:
+        BaseAgent, fresh agent instance, before it has been run
+    :return description:
+        str, e.g. "agent.MyAgent([('name', 'my_agent'), ...])"
+    """
+
+    # instance attributes, except the market interface (bound to a context)
+    attribute_list = sorted((name, value) for name, value in vars(agent).items()
+        if name != "market_interface"
+    )
+    # settings of the market interface
+    market_interface = agent.market_interface
+    attribute_list.extend([
+        ("exposure_limit", market_interface.exposure_limit),
+        ("latency", market_interface.latency),
+        ("transaction_cost_factor", market_interface.transaction_cost_factor),
+    ])
+
+    return "{module}.{qualname}({attribute_list!r})".format(
+        module=type(agent).__module__,
+        qualname=type(agent).__qualname__,
+        attribute_list=attribute_list,
+    )
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Lock a given lock file exclusively, wait if it is locked by another
+    process. The lock is released on exit and whenever the process dies.
+
+    The lock file is removed on exit, while it is still locked, unless it
+    has already been removed while locked (e.g. by DayStore). A process
+    that has been waiting for the removed lock file then acquires the lock
+    on a file that no longer exists, hence it retries with a new lock file.
+
+    :param path:
+        str, path to lock file, created if it does not exist
+    """
+
+    while True:
+        file = open(path, "a+")
+
+        # acquire lock, block until available
+        if fcntl:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                # LK_LOCK gives up after 10 attempts, keep waiting
+                except OSError:
+                    time.sleep(1)
+
+        # lock file has been removed (or replaced) while waiting, retry
+        if fcntl:
+            try:
+                is_current = os.stat(path).st_ino == os.fstat(file.fileno()).st_ino
+            except FileNotFoundError:
+                is_current = False
+            if not is_current:
+                file.close() # releases lock
+                continue
+
+        break
+
+    try:
+        yield
+    # remove lock file, then release lock
+    finally:
+        if fcntl:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            file.close()
+        # open files cannot be removed on windows, keep lock file if still in use
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+            file.close()
+            with contextlib.suppress(OSError):
+                os.remove(path)
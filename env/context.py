@@ -0,0 +1,62 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# use relative imports for other modules
+from env.blotter import Blotter
+
+
+class Context:
+
+    default = None # default context, set below
+
+    def __init__(self):
+        """
+        Engine context that owns the entire state of a single simulation,
+        that is ...
+
+        - `markets`: dict, {<market_id>: <MarketState>, *}
+        - `orders`: list, [<Order>, *]
+        - `trades`: list, [<Trade>, *]
+        - `blotter`: Blotter, columnar store of trades, trades are views on its rows
+        - `timestamp`: pd.Timestamp, simulation clock
+
+        The context is threaded through Backtest, MarketState, Order, Trade
+        and MarketInterface, so that independent simulations (e.g. multiple
+        Backtest instances) may live and run in a single process.
+
+        Note that `Context.default` is used whenever no context is specified.
+        Its containers are also available through the class attributes
+        `MarketState.instances`, `Order.history` and `Trade.history`.
+        """
+
+        # containers for related class instances
+        self.markets = dict()
+        self.orders = list()
+        self.trades = list()
+        self.blotter = Blotter()
+
+        # simulation clock
+        self.timestamp = None
+
+    def reset(self):
+        """
+        Reset context, that is, delete all markets, orders and trades.
+
+        Note that the blotter is replaced rather than cleared, so that any
+        reference to the previous blotter remains valid.
+        """
+
+        # delete all elements in containers, references remain valid
+        self.markets.clear()
+        del self.orders[:]
+        del self.trades[:]
+
+        # replace blotter with a new, empty blotter
+        self.blotter = Blotter()
+
+        # ...
+        self.timestamp = None
+
+
+# default context, used whenever no context is specified
+Context.default = Context()
@@ -0,0 +1,329 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# use relative imports for other modules
+from env.checkpoint import file_lock
+from env.stream import book_usecols
+
+# general imports
+import contextlib
+import glob
+import hashlib
+import itertools
+import numpy as np
+import os
+import pandas as pd
+import pickle
+import shutil
+import tempfile
+import threading
+import uuid
+
+DATETIME = "TIMESTAMP_UTC"
+
+
+class DayStore:
+
+    def __init__(self, directory=None):
+        """
+        Store of decoded source files (one per source and date) that is shared
+        by all processes on the same host, so that processes replaying the
+        same date (e.g. workers of a parameter search) do not each parse and
+        hold a private copy of the data.
+
+        Each file is decoded only once, that is, parsed, deduplicated (BOOK)
+        and made timezone-unaware as in Episode, and written column by column
+        into .npy files on a RAM-backed filesystem (/dev/shm, if available).
+        Processes then attach read-only, memory-mapped (zero-copy) views and
+        slice the rows within their episode without copy, see `load(...)`.
+
+        The store is owned by the process that has created it. Use it as a
+        context manager, the store is removed on exit. Entries are reference-
+        counted, entries that are still attached by other processes on exit
+        are removed as soon as the last process has detached.
+
+        :param directory:
+            str, base directory, default is /dev/shm (temporary directory if
+            /dev/shm does not exist)
+        """
+
+        # ...
+        base = directory or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+        self.directory = os.path.join(base, "l2bt-{key}".format(key=uuid.uuid4().hex[:12]))
+        os.makedirs(self.directory)
+
+        # owner marker, store is kept as long as the owner is alive
+        self._owner_path = os.path.join(self.directory, "owner.{pid}".format(pid=os.getpid()))
+        open(self._owner_path, "w").close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Release ownership and remove all entries that are not attached by any
+        other process.
+        """
+
+        # ...
+        if os.path.exists(self._owner_path):
+            os.remove(self._owner_path)
+
+        # ...
+        for entry in glob.glob(os.path.join(self.directory, "*.entry")):
+            with file_lock(entry + ".lock"):
+                self._remove_unused(entry)
+
+        # only once the store is empty
+        with contextlib.suppress(OSError):
+            os.rmdir(self.directory)
+
+    def load(self, identifier, path, timestamp_start, timestamp_end, book_depth=None):
+        """
+        Load the rows of a source between timestamp_start and timestamp_end,
+        decode the source first if it has not been decoded by any process yet.
+
+        :param identifier:
+            str, <market_id>.BOOK/TRADES identifier
+        :param path:
+            str, path to .csv(.gz) or .json file
+        :param timestamp_start:
+            pd.Timestamp, ...
+        :param timestamp_end:
+            pd.Timestamp, ...
+        :param book_depth:
+            int, number of price levels to load (BOOK), None for all price levels
+        :return df:
+            pd.DataFrame, rows between timestamp_start and timestamp_end
+            (both inclusive), timezone-unaware timestamps, read-only views on
+            the memory-mapped columns except for columns of lists
+        :return num_rows:
+            int, number of rows of the decoded source (entire date)
+        """
+
+        with self._attach(identifier, path, book_depth) as (meta, array_store):
+
+            # select time window on memory-mapped timestamps (sorted)
+            timestamps = array_store[DATETIME]
+            start = np.searchsorted(timestamps, timestamp_start.to_datetime64(), side="left")
+            stop = np.searchsorted(timestamps, timestamp_end.to_datetime64(), side="right")
+
+            # slice memory-mapped columns (views, no copy), lists are rebuilt from flat values
+            column_store = dict()
+            for column, kind in meta["columns"]:
+                if kind == "ragged":
+                    values, offsets = array_store[column]
+                    values = values[offsets[start]:offsets[stop]].tolist()
+                    offsets = (offsets[start:stop + 1] - offsets[start]).tolist()
+                    column_store[column] = [values[offsets[i]:offsets[i + 1]]
+                        for i in range(stop - start)
+                    ]
+                else:
+                    column_store[column] = array_store[column][start:stop]
+
+        # ...
+        df = pd.DataFrame(column_store, index=pd.RangeIndex(start, stop), copy=False)
+
+        return df, meta["num_rows"]
+
+    # helper methods ---
+
+    @contextlib.contextmanager
+    def _attach(self, identifier, path, book_depth=None):
+        """
+        Attach to the entry of a given source, that is, decode the source if
+        required and hold a reference until exit.
+
+        :param identifier:
+            str, <market_id>.BOOK/TRADES identifier
+        :param path:
+            str, path to .csv(.gz) or .json file
+        :param book_depth:
+            int, number of price levels to load (BOOK), None for all price levels
+        :return entry:
+            tuple, (meta, array_store) with read-only arrays per column
+        """
+
+        # one entry per source and depth, deduplication depends on depth
+        key = "{path}:{book_depth}".format(path=path, book_depth=book_depth)
+        entry = os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest()[:16] + ".entry")
+        reference = os.path.join(entry, "refs", "{pid}.{thread}".format(
+            pid=os.getpid(), thread=threading.get_ident(),
+        ))
+
+        # decode source, exactly one process decodes, all others wait
+        with file_lock(entry + ".lock"):
+            if not os.path.exists(os.path.join(entry, "meta.pkl")):
+                self._write(entry, self._decode(identifier, path, book_depth))
+            open(reference, "w").close()
+
+        try:
+            yield self._read(entry)
+        # detach, remove entry if this has been the last reference
+        finally:
+            with file_lock(entry + ".lock"):
+                os.remove(reference)
+                if not self._is_owned():
+                    self._remove_unused(entry)
+
+    def _is_owned(self):
+        """
+        Whether the owner of the store is still alive.
+        """
+
+        return any(_is_alive(int(path.rsplit(".", 1)[1]))
+            for path in glob.glob(os.path.join(self.directory, "owner.*"))
+        )
+
+    def _remove_unused(self, entry):
+        """
+        Remove entry if it is not attached by any (live) process. Must be
+        called while the entry is locked.
+
+        :param entry:
+            str, path to entry directory
+        """
+
+        # references of processes that have died are ignored
+        reference_list = glob.glob(os.path.join(entry, "refs", "*"))
+        if any(_is_alive(int(os.path.basename(reference).split(".")[0]))
+            for reference in reference_list
+        ):
+            return
+
+        # ...
+        shutil.rmtree(entry, ignore_errors=True)
+        with contextlib.suppress(OSError):
+            os.remove(entry + ".lock")
+            os.rmdir(self.directory) # only once the store is empty
+
+    @staticmethod
+    def _decode(identifier, path, book_depth=None):
+        """
+        Parse a source file as in Episode._build_data_store, before the time
+        window is selected.
+
+        :param identifier:
+            str, <market_id>.BOOK/TRADES identifier
+        :param path:
+            str, path to .csv(.gz) or .json file
+        :param book_depth:
+            int, number of price levels to load (BOOK), None for all price levels
+        :return df:
+            pd.DataFrame, timezone-unaware timestamps
+        """
+
+        # load event_id 'BOOK' as .csv(.gz), without rows that do not change the book
+        if "BOOK" in identifier:
+            df = pd.read_csv(path, parse_dates=[DATETIME], usecols=book_usecols(book_depth))
+            df = df.drop_duplicates(subset=[c for c in df.columns[1:]], keep='first').reset_index(drop=True)
+
+        # load event_id 'TRADES' as .json
+        if "TRADES" in identifier:
+            df = pd.read_json(path, convert_dates=True)
+
+        # make timestamp timezone-unaware
+        df[DATETIME] = pd.DatetimeIndex(df[DATETIME]).tz_localize(None)
+
+        return df
+
+    @staticmethod
+    def _write(entry, df):
+        """
+        Write decoded source into entry directory, one .npy file per column.
+        Columns of lists (e.g. TRADES prices) are written as flat values and
+        offsets. meta.pkl is written last, so that entries without meta.pkl
+        are incomplete.
+
+        :param entry:
+            str, path to entry directory
+        :param df:
+            pd.DataFrame, decoded source
+        """
+
+        os.makedirs(os.path.join(entry, "refs"), exist_ok=True)
+        column_list = []
+
+        # ...
+        for i, column in enumerate(df.columns):
+            values = df[column].to_numpy()
+
+            # flatten column of lists into values and offsets
+            if values.dtype == object and all(isinstance(x, list) for x in values):
+                offsets = np.concatenate([[0], np.cumsum([len(x) for x in values])]).astype(np.int64)
+                np.save(os.path.join(entry, f"{i}.npy"), np.array(list(itertools.chain.from_iterable(values))))
+                np.save(os.path.join(entry, f"{i}.offsets.npy"), offsets)
+                column_list.append((column, "ragged"))
+
+            # other columns of python objects cannot be memory-mapped
+            elif values.dtype == object:
+                np.save(os.path.join(entry, f"{i}.npy"), values, allow_pickle=True)
+                column_list.append((column, "object"))
+
+            # ...
+            else:
+                np.save(os.path.join(entry, f"{i}.npy"), values)
+                column_list.append((column, "array"))
+
+        # ...
+        with open(os.path.join(entry, "meta.pkl"), "wb") as file:
+            pickle.dump({'columns': column_list, 'num_rows': len(df.index)}, file)
+
+    @staticmethod
+    def _read(entry):
+        """
+        Read meta data and memory-map all columns of an entry (read-only).
+
+        :param entry:
+            str, path to entry directory
+        :return meta:
+            dict, {'columns': [(<column>, <kind>), *], 'num_rows': <int>}
+        :return array_store:
+            dict, {<column>: <np.ndarray or (values, offsets)>, *}
+        """
+
+        with open(os.path.join(entry, "meta.pkl"), "rb") as file:
+            meta = pickle.load(file)
+
+        array_store = dict()
+
+        # ...
+        for i, (column, kind) in enumerate(meta["columns"]):
+            if kind == "ragged":
+                array_store[column] = (
+                    np.load(os.path.join(entry, f"{i}.npy"), mmap_mode="r"),
+                    np.load(os.path.join(entry, f"{i}.offsets.npy"), mmap_mode="r"),
+                )
+            elif kind == "object":
+                array_store[column] = np.load(os.path.join(entry, f"{i}.npy"), allow_pickle=True)
+            else:
+                array_store[column] = np.load(os.path.join(entry, f"{i}.npy"), mmap_mode="r")
+
+        return meta, array_store
+
+
+def _is_alive(pid):
+    """
+    Whether a process with a given pid is alive (on this host).
+
+    :param pid:
+        int, ...
+    :return is_alive:
+        bool, ...
+    """
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # process exists, but belongs to another user
+    except PermissionError:
+        return True
+    # signal 0 is not supported (windows), assume alive
+    except (OSError, ValueError):
+        return True
+
+    return True
@@ -0,0 +1,250 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# general imports
+import collections
+import json
+
+
+class Event(collections.namedtuple("Event", [
+    "kind", "event_id", "timestamp", "market_id", "side", "quantity", "price",
+    "status", "message",
+])):
+    """
+    Event emitted by Order and Trade instances, with the following fields ...
+
+    - `kind`: str, either 'order' or 'trade'
+    - `event_id`: int, order_id or trade_id
+    - `timestamp`: pd.Timestamp, timestamp of order or trade
+    - `market_id`: str, market identifier
+    - `side`: str, either 'buy' or 'sell'
+    - `quantity`: int, number of shares ordered or executed
+    - `price`: float, limit (None for market orders) or executed price
+    - `status`: str, 'ACTIVE', 'REJECTED', 'CANCELLED' or 'EXECUTED'
+    - `message`: str, additional information (e.g. reason for rejection)
+
+    Note that events are formatted lazily, that is only if a sink converts
+    them into a string.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        """
+        String representation.
+        """
+
+        # describe what has happened to the order or trade
+        action = {
+            "ACTIVE": "accepted",
+            "REJECTED": "rejected",
+            "CANCELLED": "cancelled",
+            "EXECUTED": "executed",
+        }.get(self.status, self.status)
+
+        # rejected orders are described by their reason for rejection
+        if self.message:
+            description = self.message
+        else:
+            description = "{side} {market_id} with {quantity}@{price}, {time}".format(
+                time=self.timestamp,
+                market_id=self.market_id,
+                side=self.side,
+                quantity=self.quantity,
+                price=self.price or "market",
+            )
+
+        string = "(INFO) {kind} {event_id} was {action}: {description}".format(
+            kind=self.kind,
+            event_id=self.event_id,
+            action=action,
+            description=description,
+        )
+
+        return string
+
+    def to_dict(self):
+        """
+        Dictionary representation with JSON-compatible values.
+        """
+
+        result = self._asdict()
+        result["timestamp"] = str(self.timestamp)
+
+        # convert numpy scalars (e.g. np.int64 quantity) into python scalars
+        for key, value in result.items():
+            if hasattr(value, "item"):
+                result[key] = value.item()
+
+        return result
+
+
+class NullSink:
+
+    def __init__(self):
+        """
+        Sink that discards all events. NullSink evaluates to False, so that
+        no event is even created as long as the NullSink is set.
+        """
+
+        pass
+
+    def __bool__(self):
+        return False
+
+    def write(self, event):
+        pass
+
+    def flush(self):
+        pass
+
+    def discard(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PrintSink(NullSink):
+
+    def __init__(self):
+        """
+        Sink that prints each event to stdout as soon as it is written.
+        """
+
+        pass
+
+    def __bool__(self):
+        return True
+
+    def write(self, event):
+        print(event)
+
+
+class MemorySink(NullSink):
+
+    def __init__(self, maxlen=100_000):
+        """
+        Sink that keeps the most recent events in memory (ring buffer).
+
+        :param maxlen:
+            int, maximum number of events to keep, default is 100_000
+        """
+
+        # ring buffer, oldest events are dropped first
+        self.events = collections.deque(maxlen=maxlen)
+
+    def __bool__(self):
+        return True
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __len__(self):
+        return len(self.events)
+
+    def write(self, event):
+        self.events.append(event)
+
+    def clear(self):
+        """
+        Remove all events from the ring buffer.
+        """
+
+        self.events.clear()
+
+
+class FileSink(NullSink):
+
+    def __init__(self, path, buffer_size=10_000):
+        """
+        Sink that writes events to a JSONL file, one JSON object per line.
+        Events are buffered in memory and written in batches of buffer_size
+        events, use `flush()` or `close()` to write the remaining events.
+
+        :param path:
+            str, path to JSONL file, events are appended
+        :param buffer_size:
+            int, number of events to buffer before writing, default is 10_000
+        """
+
+        # static attributes from arguments
+        self.path = path
+        self.buffer_size = buffer_size
+
+        # buffered events, not yet written
+        self._buffer = []
+        self._file = open(path, "a")
+
+    def __bool__(self):
+        return True
+
+    def write(self, event):
+        self._buffer.append(event)
+
+        # write batch once buffer is full
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        # format events only when written to file
+        self._file.writelines(json.dumps(event.to_dict()) + "\n"
+            for event in self._buffer
+        )
+        self._file.flush()
+        self._buffer.clear()
+
+    def discard(self):
+        # drop buffered events without writing them
+        self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class EventLog:
+
+    sink = NullSink() # default sink does no work
+
+    def __init__(self):
+        """
+        Event log that Order and Trade instances write their events to. The
+        event log itself is stateless, events are passed on to the sink set
+        in the `sink` class attribute ...
+
+        - `NullSink`: discard all events (default)
+        - `PrintSink`: print all events to stdout
+        - `MemorySink`: keep most recent events in memory (ring buffer)
+        - `FileSink`: write events to a buffered JSONL file
+
+        Use `EventLog.set_sink(sink)` to replace the current sink.
+        """
+
+        pass
+
+    @classmethod
+    def set_sink(class_reference, sink):
+        """
+        Replace the current sink, the previous sink is closed.
+
+        :param sink:
+            NullSink, any sink instance, None resets to NullSink
+        """
+
+        # close previous sink, write remaining events
+        class_reference.sink.close()
+
+        # set new sink
+        class_reference.sink = sink or NullSink()
+
+    @classmethod
+    def init_worker(class_reference):
+        """
+        Initialise the event log of a forked worker process. Buffered events
+        inherited from the parent process are discarded, as they are written
+        by the parent process (flush the sink before creating the workers).
+        """
+
+        # ...
+        class_reference.sink.discard()
@@ -0,0 +1,319 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# general imports
+import numpy as np
+
+# numba is optional, kernels are compiled only if numba is available
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# backends
+PYTHON = "python"
+NUMBA = "numba"
+
+# backend in use, python unless numba is selected explicitly (see set_backend)
+backend = PYTHON
+
+
+def set_backend(name=None):
+    """
+    Select the backend for the innermost market state operations (add, use
+    and restore liquidity, matching across price levels, book differences).
+
+    (python) the original implementation in MarketState and BookDifferences
+
+    (numba) the kernels in this module, compiled with numba, operating on
+    arrays rather than on liquidity lists
+
+    Both backends are meant to produce identical results. The numba backend
+    is opt-in, as it has yet to be cross-checked in compiled form and its
+    speedup is unmeasured: the wrappers convert liquidity lists into arrays
+    and back on every call, which may well cancel the gain for the short
+    queues per price level. Note that the backend is a module-level setting,
+    worker processes inherit it only if forked.
+
+    :param name:
+        str, either 'python' or 'numba', default is 'python'
+    """
+
+    global backend
+
+    # ...
+    name = name or PYTHON
+    assert name in (PYTHON, NUMBA), \
+        "backend can only take values 'python' and 'numba', not '{name}'".format(
+            name=name,
+        )
+    assert name == PYTHON or numba, \
+        "backend 'numba' requires numba, which is not installed"
+
+    backend = name
+
+
+def is_enabled():
+    """
+    Whether the kernels in this module are used (numba backend).
+    """
+
+    return backend == NUMBA
+
+
+def _jit(function):
+    """
+    Compile function with numba if available, leave unchanged otherwise.
+    """
+
+    if numba:
+        return numba.njit(cache=True)(function)
+
+    return function
+
+
+# kernels (arrays) ---
+
+@_jit
+def _add_liquidity_kernel(timestamps, timestamp):
+    """
+    Position of timestamp in timestamps (ns, ASCENDING), and whether the
+    timestamp is already included.
+    """
+
+    i = np.searchsorted(timestamps, timestamp)
+
+    return i, i < len(timestamps) and timestamps[i] == timestamp
+
+
+@_jit
+def _use_liquidity_kernel(quantities, quantity):
+    """
+    Index of the first entry whose cumulative quantity covers quantity, and
+    the remainder of that entry, -1 if quantity exceeds liquidity.
+    """
+
+    quantity_cumsum = 0.
+    for i in range(len(quantities)):
+        quantity_cumsum += quantities[i]
+        if quantity_cumsum >= quantity:
+            return i, quantity_cumsum - quantity
+
+    return -1, 0.
+
+
+@_jit
+def _restore_liquidity_kernel(timestamps, quantities, timestamps_init, quantities_init, quantity):
+    """
+    Merge liquidity (t) and liquidity (t-1), both sorted by timestamp, and
+    restore quantity per timestamp, oldest first, up to the quantity used
+    between t-1 and t. Returns merged timestamps, quantities, and the
+    remaining quantity surplus.
+    """
+
+    timestamps_merged = np.empty(len(timestamps) + len(timestamps_init), dtype=np.int64)
+    quantities_merged = np.empty(len(timestamps) + len(timestamps_init), dtype=np.float64)
+
+    i, j, k = 0, 0, 0
+    while i < len(timestamps) or j < len(timestamps_init):
+
+        # entry (t) only
+        if j == len(timestamps_init) or (i < len(timestamps) and timestamps[i] < timestamps_init[j]):
+            timestamps_merged[k] = timestamps[i]
+            quantities_merged[k] = quantities[i]
+            i += 1
+
+        # entry (t-1), possibly with entry (t)
+        else:
+            quantity_this = 0.
+            if i < len(timestamps) and timestamps[i] == timestamps_init[j]:
+                quantity_this = quantities[i]
+                i += 1
+            restored = min(quantity, max(quantities_init[j] - quantity_this, 0.))
+            timestamps_merged[k] = timestamps_init[j]
+            quantities_merged[k] = quantity_this + restored
+            quantity -= restored
+            j += 1
+
+        k += 1
+
+    return timestamps_merged[:k], quantities_merged[:k], quantity
+
+
+@_jit
+def _match_levels_kernel(quantity_available, quantity_blocked, quantity_left):
+    """
+    Quantity used per price level, walking the levels in order of price
+    priority until quantity_left is exhausted. Quantities are integer.
+    """
+
+    quantity_used = np.zeros(len(quantity_available), dtype=np.int64)
+    for i in range(len(quantity_available)):
+        if not quantity_left:
+            break
+        quantity_used[i] = min(max(quantity_available[i] - quantity_blocked[i], 0), quantity_left)
+        quantity_left -= quantity_used[i]
+
+    return quantity_used
+
+
+@_jit
+def _book_difference_kernel(prices_last, quantities_last, midpoint_last, prices_this, quantities_this, midpoint_this):
+    """
+    Book differences of consecutive book updates (see BookDifferences), rows
+    of prices_last and prices_this are (t-1) and (t). Returns step, price and
+    quantity per entry, sorted by step, price and order (remove, add).
+    """
+
+    num_steps, num_levels = prices_this.shape
+    step_array = np.empty(num_steps * num_levels * 2, dtype=np.int64)
+    price_array = np.empty(num_steps * num_levels * 2, dtype=np.float64)
+    quantity_array = np.empty(num_steps * num_levels * 2, dtype=np.float64)
+
+    price_step = np.empty(num_levels * 2, dtype=np.float64)
+    quantity_step = np.empty(num_levels * 2, dtype=np.float64)
+    order_step = np.empty(num_levels * 2, dtype=np.int64)
+
+    k = 0
+    for step in range(num_steps):
+
+        # entries per price level, last (remove, order 0) and this (add, order 1)
+        n = 0
+        for source in range(2):
+            for level in range(num_levels):
+                if source == 0:
+                    price, quantity = prices_last[step, level], -quantities_last[step, level]
+                else:
+                    price, quantity = prices_this[step, level], quantities_this[step, level]
+                # skip missing price levels (NaN)
+                if price != price:
+                    continue
+                # same side entries are merged per price level (order 0)
+                is_same_side = (midpoint_this[step] - price) * (midpoint_last[step] - price) > 0
+                price_step[n] = price
+                quantity_step[n] = quantity
+                order_step[n] = 0 if is_same_side else source
+                n += 1
+
+        # sort by price (stable, remove before add), merge entries per price and order
+        index = np.argsort(price_step[:n], kind="mergesort")
+        i = 0
+        while i < n:
+            price = price_step[index[i]]
+            quantity_remove, quantity_add = 0., 0.
+            is_remove, is_add = False, False
+            while i < n and price_step[index[i]] == price:
+                if order_step[index[i]] == 0:
+                    quantity_remove = quantity_step[index[i]] if not is_remove else quantity_remove + quantity_step[index[i]]
+                    is_remove = True
+                else:
+                    quantity_add = quantity_step[index[i]] if not is_add else quantity_add + quantity_step[index[i]]
+                    is_add = True
+                i += 1
+
+            # drop entries with empty quantity (or missing quantity)
+            if is_remove and (quantity_remove > 0 or quantity_remove < 0):
+                step_array[k], price_array[k], quantity_array[k] = step, price, quantity_remove
+                k += 1
+            if is_add and (quantity_add > 0 or quantity_add < 0):
+                step_array[k], price_array[k], quantity_array[k] = step, price, quantity_add
+                k += 1
+
+    return step_array[:k], price_array[:k], quantity_array[:k]
+
+
+# wrappers (liquidity lists) ---
+
+def add_liquidity(liquidity_list, timestamp, quantity):
+    """
+    Equivalent to `MarketState._add_liquidity`.
+    """
+
+    timestamps = np.array([t.value for t, _ in liquidity_list], dtype=np.int64)
+    i, is_included = _add_liquidity_kernel(timestamps, timestamp.value)
+
+    # aggregate with pre-existent quantity, or insert
+    liquidity_list = list(liquidity_list)
+    if is_included:
+        liquidity_list[i] = (liquidity_list[i][0], liquidity_list[i][1] + quantity)
+    else:
+        liquidity_list.insert(i, (timestamp, quantity))
+
+    # remove liquidity with empty quantity
+    return [entry for entry in liquidity_list if entry[1]]
+
+
+def use_liquidity(liquidity_list, quantity):
+    """
+    Equivalent to `MarketState._use_liquidity`.
+    """
+
+    quantities = np.array([q for _, q in liquidity_list], dtype=np.float64)
+    i, remainder = _use_liquidity_kernel(quantities, quantity)
+
+    # quantity exceeds liquidity, raise as MarketState._use_liquidity does
+    if i < 0:
+        raise IndexError("quantity {quantity} exceeds liquidity".format(
+            quantity=quantity,
+        ))
+
+    # remove used liquidity, prepend (timestamp, quantity_left) to liquidity_list
+    timestamp = liquidity_list[i][0]
+    liquidity_list = [entry for entry in liquidity_list[i+1:] if entry[1]]
+    if remainder:
+        liquidity_list.insert(0, (timestamp, remainder))
+
+    return liquidity_list
+
+
+def restore_liquidity(liquidity_list, liquidity_list_init, quantity):
+    """
+    Equivalent to `MarketState._restore_liquidity`.
+    """
+
+    # timestamps are restored from their integer value (ns)
+    timestamp_store = {t.value: t for t, _ in liquidity_list}
+    timestamp_store.update((t.value, t) for t, _ in liquidity_list_init)
+
+    timestamps, quantities, quantity = _restore_liquidity_kernel(
+        np.array([t.value for t, _ in liquidity_list], dtype=np.int64),
+        np.array([q for _, q in liquidity_list], dtype=np.float64),
+        np.array([t.value for t, _ in liquidity_list_init], dtype=np.int64),
+        np.array([q for _, q in liquidity_list_init], dtype=np.float64),
+        float(quantity),
+    )
+
+    # remove liquidity with empty quantity
+    liquidity_list = [(timestamp_store[t], q)
+        for t, q in zip(timestamps.tolist(), quantities.tolist()) if q
+    ]
+
+    return liquidity_list, quantity
+
+
+def match_levels(quantity_available, quantity_blocked, quantity_left):
+    """
+    Equivalent to `MarketState._match_levels`.
+    """
+
+    return _match_levels_kernel(
+        np.asarray(quantity_available, dtype=np.int64),
+        np.asarray(quantity_blocked, dtype=np.int64),
+        int(quantity_left),
+    )
+
+
+def book_difference(prices_last, quantities_last, midpoint_last, prices_this, quantities_this, midpoint_this):
+    """
+    Equivalent to the entries computed by `BookDifferences`, see
+    `_book_difference_kernel`.
+    """
+
+    return _book_difference_kernel(
+        np.ascontiguousarray(prices_last, dtype=np.float64),
+        np.ascontiguousarray(quantities_last, dtype=np.float64),
+        np.ascontiguousarray(midpoint_last, dtype=np.float64),
+        np.ascontiguousarray(prices_this, dtype=np.float64),
+        np.ascontiguousarray(quantities_this, dtype=np.float64),
+        np.ascontiguousarray(midpoint_this, dtype=np.float64),
+    )
@@ -1,20 +1,28 @@
 # !/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+# use relative imports for other modules
+from env.blotter import Blotter
+from env.book import PriceLevels
+from env.context import Context
+from env.events import Event, EventLog
+from env import kernels
+
 # specific imports
 from decimal import Decimal
 
 # general imports
 import copy
+import math
 import numpy as np
 import pandas as pd
 
 
 class MarketState:
 
-    instances = dict() # instance store
+    instances = Context.default.markets # instance store (default context)
 
-    def __init__(self, market_id):
+    def __init__(self, market_id, tick_size=None, tick_size_window=100, context=None):
         """
         Market state is implemented as a stateful object in order to ensure
         price-time-priority in simulated order execution. This means that 
@@ -43,17 +51,42 @@ class MarketState:
         - ...
 
         All market instances are stored in and may be accessed through the
-        `instances` class attribute (dictionary).
+        `markets` attribute (dictionary) of the given context, the default 
+        context is available through the `instances` class attribute.
+
+        If a fixed tick_size is specified, the market state runs in tick mode, 
+        meaning that book prices, order limits and trade prices are represented 
+        internally as integer tick counts. Prices are converted back to float
+        only when they leave the market state (properties, trades). Otherwise,
+        the tick_size is inferred once from the first book updates.
 
         :param market_id:
             str, market identifier
+        :param tick_size:
+            float, fixed tick size to enable tick mode, optional
+        :param tick_size_window:
+            int, number of book updates to infer tick_size from, default is 100
+        :param context:
+            Context, engine context to register market with, default is 
+            Context.default
         """
 
         # static attributes from arguments
         self.market_id = market_id
+        self.context = context or Context.default
+        self._tick_size = tick_size
+        self._tick_size_window = tick_size_window
+
+        # inferred tick_size in units of 1e-3, updated with the first book updates only
+        self._tick_units = 0
+        self._tick_units_count = 0
+
+        # number of decimals required to represent a (half) tick as float
+        if tick_size:
+            self._tick_decimals = 1 - Decimal(str(tick_size)).normalize().as_tuple().exponent
 
-        # global attributes update
-        self.__class__.instances.update({market_id: self})
+        # context attributes update
+        self.context.markets.update({market_id: self})
 
     # properties ---
     
@@ -78,11 +111,17 @@ class MarketState:
         `state` represents the most recent market post-trade market state that
         would be observable by a market participant ('pseudo' level 3).
         
-        It is provided as a tuple of dictionaries with the following structure
+        It is provided as a tuple of read-only views with the following 
+        structure
         (
             {<price>: [(<timestamp>, <quantity>), *], *}, # bid side
             {...}, # ask side
         )
+
+        Note that both views are zero-copy and sorted according to price 
+        priority (bid side DESCENDING, ask side ASCENDING), use `dict(...)` to 
+        create an independent copy.
+        In tick mode, prices are provided as integer tick counts.
         """
         
         # ...
@@ -102,7 +141,7 @@ class MarketState:
         
         # ...
         try:
-            midpoint = self._midpoint_this
+            midpoint = self.to_price(self._midpoint_this)
         except:
             midpoint = None
         
@@ -117,13 +156,11 @@ class MarketState:
 
         # ...
         try:
-            best_bid = max(k for k, v in self._posttrade_state_bid.items()
-                if len(v) > 0
-            )
+            best_bid = self.to_price(self._best_bid)
         except:
             best_bid = None
         
-        # based on current market state, return best_bid
+        # based on current market state, return best_bid (cached)
         return best_bid
 
     @property
@@ -134,35 +171,124 @@ class MarketState:
 
         # ...
         try:
-            best_ask = min(k for k, v in self._posttrade_state_ask.items()
-                if len(v) > 0
-            )
+            best_ask = self.to_price(self._best_ask)
         except:
             best_ask = None
         
-        # based on current market state, return best_ask
+        # based on current market state, return best_ask (cached)
         return best_ask
 
+    @property
+    def spread(self):
+        """
+        `spread` is based on the most recent book update. 
+        """
+
+        # ...
+        try:
+            spread = self.to_price(self._best_ask - self._best_bid)
+        except:
+            spread = None
+
+        # based on current market state, return spread
+        return spread
+
+    @property
+    def tick_mode(self):
+        """
+        `tick_mode` is set if a fixed tick_size has been specified. 
+        """
+
+        return bool(self._tick_size)
+
     @property
     def tick_size(self): # infer tick_size at runtime
         """
-        `tick_size` is inferred dynamically at runtime based on the most recent
-        book update, identifying the greatest common divisor among all inluded 
-        price levels. 
+        `tick_size` is inferred once at runtime based on the first book 
+        updates (see `tick_size_window`), identifying the greatest common 
+        divisor among all included price levels. In tick mode, the fixed 
+        tick_size is returned instead.
+        """
+
+        # in tick mode, tick_size is fixed
+        if self.tick_mode:
+            return self._tick_size
+
+        # based on cached greatest common divisor, return tick_size
+        return self._tick_units / 1e3 if self._tick_units else None
+
+    # price conversion ---
+
+    def to_ticks(self, price):
+        """
+        Convert price into its internal representation, that is an integer
+        tick count in tick mode. Otherwise, the price is returned unchanged.
+
+        :param price:
+            float, price
+        :return price:
+            int (tick mode) or float, internal price
         """
 
-        # extract all price levels present in the book update
-        tick_size = np.array(list(self._book_this)) * 1e3
-        # tick_size is greatest common divisor among price levels
-        tick_size = np.gcd.reduce(
-            np.around(tick_size).astype(int)
-        ) / 1e3
+        # bypass if not in tick mode
+        if not self.tick_mode:
+            return price
 
-        return tick_size
+        return round(price / self._tick_size)
+
+    def to_price(self, ticks):
+        """
+        Convert internal price representation back into price, that is a float
+        rounded to the precision of the tick_size. Otherwise, the price is 
+        returned unchanged.
+
+        :param ticks:
+            int (tick mode) or float, internal price
+        :return price:
+            float, price
+        """
+
+        # bypass if not in tick mode
+        if not self.tick_mode:
+            return ticks
+
+        return round(ticks * self._tick_size, self._tick_decimals)
+
+    def is_valid_limit(self, limit):
+        """
+        Test whether limit is a multiple of the tick_size. This test is used
+        on every order submission and thus avoids Decimal arithmetic.
+
+        :param limit:
+            float, limit price
+        :return is_valid:
+            bool, True if limit is not too granular for tick_size
+        """
+
+        # in tick mode, limit must correspond to an integer tick count
+        if self.tick_mode:
+            ticks = limit / self._tick_size
+            return abs(ticks - round(ticks)) < 1e-6
+
+        # otherwise, limit (in units of 1e-3) must be a multiple of tick_size
+        units = limit * 1e3
+        return abs(units - round(units)) < 1e-6 and not round(units) % self._tick_units
+
+    def _update_tick_size(self):
+        """
+        Update inferred tick_size (in units of 1e-3) with the price levels of 
+        the current book update, that is the greatest common divisor among all
+        price levels seen so far.
+        """
+
+        self._tick_units = math.gcd(self._tick_units, *(round(price * 1e3)
+            for price in self._book_this if price == price # skip missing price levels (NaN)
+        ))
+        self._tick_units_count += 1
 
     # update ---
 
-    def update(self, book_update, trade_update):
+    def update(self, book_update, trade_update, book_difference=None):
         """
         Update the market state that is represented by two separate stages,
         post-trade state and pre-trade state. 
@@ -193,11 +319,16 @@ class MarketState:
             pd.Series, book data
         :param trade_update:
             pd.Series, trade data, aggregated per timestamp
+        :param book_difference:
+            list, [(<price>, <quantity>), *], book difference between last
+            and this book update, precomputed from the source (see 
+            BookDifferences), computed from the book updates if None
+        :return is_updated:
+            bool, False if update was skipped (corrupted book update)
         """
 
-        # unpack pd.Series into list for each book update and trade update
-        timestamp, *book_update = book_update.values
-        _, *trade_update = trade_update.values # optional (may be empty pd.Series)
+        # unpack book update and trade update, in internal representation
+        timestamp, book_update, trade_update = self._unpack_update(book_update, trade_update)
 
         # ensure that each ask is larger than its respective bid
         is_corrupted = any(bid >= ask 
@@ -205,7 +336,7 @@ class MarketState:
         )
         # otherwise, skip this particular update
         if is_corrupted:
-            return
+            return False
 
         # set dictionary representation for time t-1 (_book_last)
         if hasattr(self, "_book_this"): 
@@ -219,20 +350,24 @@ class MarketState:
         # set nested list representation for trade update at time t (_trade_this)
         self._trade_this = trade_update
 
+        # infer tick_size only from the first book updates, otherwise use cached tick_size
+        if not self.tick_mode and self._tick_units_count < self._tick_size_window:
+            self._update_tick_size()
+
         # set variables required to determine current state
         self._timestamp = timestamp
         self._midpoint_last = sum(list(self._book_last)[:2]) / 2 # [<L1-BidPrice>, <L1-AskPrice>]
         self._midpoint_this = sum(list(self._book_this)[:2]) / 2 # ...
 
-        # if variable does not exist, set empty dictionary for post-trade state
+        # if variable does not exist, set empty price levels for post-trade state
         if not hasattr(self, "_posttrade_state"): 
-            self._posttrade_state = dict() 
+            self._posttrade_state = PriceLevels() 
 
         # create deepcopy of post-trade state to later reconstruct timestamps in pre-trade state
         self._SNAPSHOT = copy.deepcopy(self._posttrade_state)        
 
         # run update on post-trade state 
-        _ = self._update_posttrade_state()
+        _ = self._update_posttrade_state(book_difference)
         
         # run update on pre-trade state
         _ = self._update_pretrade_state()
@@ -240,7 +375,141 @@ class MarketState:
         # fetch the relevant orders submitted by the trading agent
         _ = self._update_simulated_orders()
 
-    def _update_posttrade_state(self):
+        return True
+
+    def _unpack_update(self, book_update, trade_update):
+        """
+        Unpack book update and trade update into lists, with prices in the
+        internal representation (integer tick counts in tick mode).
+
+        :param book_update:
+            pd.Series, book data
+        :param trade_update:
+            pd.Series, trade data, aggregated per timestamp
+        :return timestamp:
+            pd.Timestamp, timestamp of the book update
+        :return book_update:
+            list, [<L1-BidPrice>, <L1-BidSize>, <L1-AskPrice>, ...]
+        :return trade_update:
+            list, [<price_list>, <quantity_list>] or empty values
+        """
+
+        # unpack pd.Series into list for each book update and trade update
+        timestamp, *book_update = book_update.values
+        _, *trade_update = trade_update.values # optional (may be empty pd.Series)
+
+        # in tick mode, convert book prices and trade prices into tick counts
+        if self.tick_mode:
+            book_update[0::2] = [self.to_ticks(price) if price == price else price
+                for price in book_update[0::2] # skip missing price levels (NaN)
+            ]
+            if isinstance(trade_update[0], list):
+                trade_update[0] = [self.to_ticks(price) for price in trade_update[0]]
+
+        return timestamp, book_update, trade_update
+
+    def initialize(self, book_update):
+        """
+        Initialise the market state directly from a single book update, that
+        is, without a buffer phase to build up the liquidity_list per price
+        level. Each price level is given a single (synthetic) entry with the
+        timestamp of the book update, so that agent orders are placed behind
+        all displayed liquidity. Trades are not reverted for this update.
+
+        :param book_update:
+            pd.Series, book data
+        :return is_updated:
+            bool, False if update was skipped (corrupted book update)
+        """
+
+        # update from empty market state, liquidity is added at this timestamp only
+        is_updated = self.update(
+            book_update=book_update,
+            trade_update=pd.Series([None] * 3), # empty pd.Series
+        )
+
+        # there is no previous book update, keep midpoint
+        if is_updated:
+            self._midpoint_last = self._midpoint_this
+
+        return is_updated
+
+    def update_from(self, market_state):
+        """
+        Update the market state by adopting post-trade state and pre-trade 
+        state from another market state instance (same market_id) that has 
+        just been updated. As orders submitted by the agent do NOT have market 
+        impact, both states are identical for all agents, so that a single 
+        market replay may be shared by multiple engine contexts (see 
+        `Backtest.run_sweep`). Only the simulated orders are fetched from the 
+        context of this market state. 
+
+        Note that the post-trade state is shared (read-only), while the 
+        pre-trade state is copied since it gets consumed by `match()`.
+
+        :param market_state:
+            MarketState, market state that has been updated with `update(...)`
+        """
+
+        # share post-trade state and all variables required to determine current state
+        for attribute in ["_timestamp", "_book_last", "_book_this", 
+            "_trade_this", "_midpoint_last", "_midpoint_this", "_posttrade_state", 
+            "_posttrade_state_bid", "_posttrade_state_ask", "_best_bid", 
+            "_best_ask", "_tick_units", "_tick_units_count", 
+        ]:
+            setattr(self, attribute, getattr(market_state, attribute))
+
+        # copy pre-trade state, liquidity_list is replaced rather than modified in match()
+        self._pretrade_state_bid = dict(market_state._pretrade_state_bid)
+        self._pretrade_state_ask = dict(market_state._pretrade_state_ask)
+
+        # fetch the relevant orders submitted by the trading agent (own context)
+        _ = self._update_simulated_orders()
+
+    def snapshot(self):
+        """
+        Take a snapshot of the market state, that is, an independent copy of
+        post-trade state (liquidity_list per price level, with timestamps),
+        pre-trade state, last book update and all variables required to
+        continue with `update(...)`. Simulated orders are not included. Use
+        `restore(snapshot)` to continue from the snapshot, e.g. to skip the
+        buffer phase of an episode (see `Backtest.run`).
+
+        :return snapshot:
+            dict, {<attribute>: <value>, *}, None if the market state has not
+            been updated yet
+        """
+
+        # market state must have been updated with `update(...)`
+        if not hasattr(self, "_book_this"):
+            return None
+
+        # deepcopy in a single pass, so that views remain bound to the copied post-trade state
+        return copy.deepcopy({attribute: getattr(self, attribute) for attribute in [
+            "_timestamp", "_book_last", "_book_this", "_trade_this",
+            "_midpoint_last", "_midpoint_this", "_posttrade_state",
+            "_posttrade_state_bid", "_posttrade_state_ask", "_best_bid",
+            "_best_ask", "_tick_units", "_tick_units_count",
+            "_pretrade_state_bid", "_pretrade_state_ask",
+        ]})
+
+    def restore(self, snapshot):
+        """
+        Restore the market state from a snapshot, see `snapshot()`. The
+        snapshot is adopted without copy and must not be reused.
+
+        :param snapshot:
+            dict, {<attribute>: <value>, *}
+        """
+
+        # ...
+        for attribute, value in snapshot.items():
+            setattr(self, attribute, value)
+
+        # fetch the relevant orders submitted by the trading agent
+        _ = self._update_simulated_orders()
+
+    def _update_posttrade_state(self, book_difference=None):
         """
         Compute post-trade state that is identical to the historical book
         state, but that keeps track of the detailed liquidity_list per price 
@@ -249,31 +518,22 @@ class MarketState:
 
         The post-trade state data structure is ...
         {<price>: [(<timestamp>, <quantity>), *], *}
-        """        
 
-        # book_difference, [(<price>, <quantity>), *]
-        book_difference = []
+        Note that emptied price levels are evicted, the post-trade state 
+        therefore includes only price levels that are currently part of the
+        book (at most 10 per side). Evicted price levels can still be restored 
+        in the pre-trade state since `_SNAPSHOT` is taken before the update.
 
-        # test whether price is on opposite sides of last and this midpoint 
-        same_side = lambda price: (
-            (self._midpoint_this - price) * (self._midpoint_last - price)
-        ) > 0
+        :param book_difference:
+            list, [(<price>, <quantity>), *], precomputed book_difference, 
+            optional
+        """        
 
-        # compute book_difference
-        for price in set(self._book_this) | set(self._book_last):
-            # price on same side: remove (this - last) quantity
-            if same_side(price):
-                book_difference.append(
-                    (price, self._book_this.get(price, 0) - self._book_last.get(price, 0))
-                )
-            # price on opposite side: remove last quantity, add this quantity
-            else:
-                book_difference.append( # remove
-                    (price, self._book_last.get(price, 0) * (-1))
-                )
-                book_difference.append( # add
-                    (price, self._book_this.get(price, 0))
-                )
+        # compute book_difference, unless precomputed (prices are then converted into tick counts)
+        if book_difference is None:
+            book_difference = self._compute_book_difference()
+        elif self.tick_mode:
+            book_difference = [(self.to_ticks(price), qdiff) for price, qdiff in book_difference]
 
         # apply book_difference
         for price, qdiff in book_difference:
@@ -289,6 +549,9 @@ class MarketState:
                     liquidity_list=self._posttrade_state.get(price, []),
                     quantity=abs(qdiff),
                 )
+                # evict price level once its liquidity is used up entirely
+                if not self._posttrade_state[price]:
+                    del self._posttrade_state[price]
             # ...
             else:
                 pass
@@ -301,19 +564,58 @@ class MarketState:
         # NOTE: ... but is additionally split by side for further processing
 
         # set post-trade state, bid side with sorted price levels (DESCENDING)
-        self._posttrade_state_bid = {p: q for p, q 
-            in sorted(self._posttrade_state.items(), reverse=True)
-            if p < self._midpoint_this
-        }
-        self._posttrade_state_bid = self._posttrade_state_bid
+        self._posttrade_state_bid = self._posttrade_state.view(
+            "bid", self._midpoint_this
+        )
 
         # set post-trade state, ask side with sorted price levels (ASCENDING)
-        self._posttrade_state_ask = {p: q for p, q 
-            in sorted(self._posttrade_state.items(), reverse=False)
-            if p > self._midpoint_this
-        }
-        self._posttrade_state_ask = self._posttrade_state_ask
+        self._posttrade_state_ask = self._posttrade_state.view(
+            "ask", self._midpoint_this
+        )
+
+        # cache top of book, that is the first non-empty price level per side
+        self._best_bid = next((p for p, q 
+            in self._posttrade_state_bid.items() if q), None
+        )
+        self._best_ask = next((p for p, q 
+            in self._posttrade_state_ask.items() if q), None
+        )
     
+    def _compute_book_difference(self):
+        """
+        Compute book_difference between last and this book update, that is 
+        the quantity to add (positive) or to use (negative) per price level.
+
+        :return book_difference:
+            list, [(<price>, <quantity>), *]
+        """
+
+        # book_difference, [(<price>, <quantity>), *]
+        book_difference = []
+
+        # test whether price is on opposite sides of last and this midpoint 
+        same_side = lambda price: (
+            (self._midpoint_this - price) * (self._midpoint_last - price)
+        ) > 0
+
+        # compute book_difference
+        for price in set(self._book_this) | set(self._book_last):
+            # price on same side: remove (this - last) quantity
+            if same_side(price):
+                book_difference.append(
+                    (price, self._book_this.get(price, 0) - self._book_last.get(price, 0))
+                )
+            # price on opposite side: remove last quantity, add this quantity
+            else:
+                book_difference.append( # remove
+                    (price, self._book_last.get(price, 0) * (-1))
+                )
+                book_difference.append( # add
+                    (price, self._book_this.get(price, 0))
+                )
+
+        return book_difference
+
     def _update_pretrade_state(self):
         """
         Compute pre-trade state that is the post-trade state without the 
@@ -335,10 +637,12 @@ class MarketState:
         {<price>: [(<timestamp>, <quantity>), *], *}
         """
         
-        # create deepcopy of post-trade state (bid side) as a basis to compute pre-trade state
-        self._pretrade_state_bid = copy.deepcopy(self._posttrade_state_bid) 
+        # create copy of post-trade state (bid side) as a basis to compute pre-trade state
+        self._pretrade_state_bid = dict(self._posttrade_state_bid.items())
         # ...
-        self._pretrade_state_ask = copy.deepcopy(self._posttrade_state_ask)
+        self._pretrade_state_ask = dict(self._posttrade_state_ask.items())
+
+        # NOTE: a shallow copy is sufficient, liquidity_list is never modified in place
 
         # check that trade_state is a nested list, as otherwise it must be empty
         require_revert = isinstance(self._trade_this[0], list) 
@@ -375,27 +679,25 @@ class MarketState:
                     quantity=quantity,
                 )
 
-        # otherwise, pre-trade state remains identical to post-trade state
-        else:
-            pass
+            # NOTE: the pre-trade state can only exist for each individual side due to potential crossing
 
-        # NOTE: the pre-trade state can only exist for each individual side due to potential crossing
+            # set pre-trade state, bid side with sorted price levels (DESCENDING)
+            self._pretrade_state_bid = dict(
+                sorted(self._pretrade_state_bid.items(), reverse=True)
+            )
 
-        # set pre-trade state, bid side with sorted price levels (DESCENDING)
-        self._pretrade_state_bid = dict(
-            sorted(self._pretrade_state_bid.items(), reverse=True)
-        )
-        self._pretrade_state_bid = self._pretrade_state_bid
+            # set pre-trade state, ask side with sorted price levels (ASCENDING)
+            self._pretrade_state_ask = dict(
+                sorted(self._pretrade_state_ask.items(), reverse=False)
+            )
 
-        # set pre-trade state, ask side with sorted price levels (ASCENDING)
-        self._pretrade_state_ask = dict(
-            sorted(self._pretrade_state_ask.items(), reverse=False)
-        )
-        self._pretrade_state_ask = self._pretrade_state_ask
+        # otherwise, pre-trade state remains identical to post-trade state (already sorted)
+        else:
+            pass
 
     def _update_simulated_orders(self):
         """
-        View based on Order.history, includes all AGENT orders filtered by
+        View based on context orders, includes all AGENT orders filtered by
         status 'ACTIVE', older-than-current timestamp (with regard to 
         latency), and corresponding market_id. 
 
@@ -404,7 +706,7 @@ class MarketState:
         """
 
         # orders must have status 'ACTIVE'
-        orders = filter(lambda order: order.status == "ACTIVE", Order.history)
+        orders = filter(lambda order: order.status == "ACTIVE", self.context.orders)
         # orders must have corresponding market_id 
         orders = filter(lambda order: order.market_id == self.market_id, orders)
         # orderst must have timestamp greater than current timestamp
@@ -417,7 +719,7 @@ class MarketState:
         # sort by (1) limit DESCENDING and (2) time ASCENDING
         orders_buy = sorted(orders_buy, key=lambda x: x.timestamp)
         orders_buy = sorted(orders_buy, 
-            key=lambda x: x.limit or min(self._posttrade_state_ask), reverse=True
+            key=lambda x: x._limit or next(iter(self._posttrade_state_ask)), reverse=True
         )
         self._orders_buy = orders_buy
 
@@ -426,7 +728,7 @@ class MarketState:
         # sort by (1) limit ASCENDING and (2) time ASCENDING
         orders_sell = sorted(orders_sell, key=lambda x: x.timestamp)
         orders_sell = sorted(orders_sell, 
-            key=lambda x: x.limit or max(self._posttrade_state_bid), reverse=False
+            key=lambda x: x._limit or next(iter(self._posttrade_state_bid)), reverse=False
         )
         self._orders_sell = orders_sell
 
@@ -452,6 +754,10 @@ class MarketState:
         if (not quantity):
             return liquidity_list
 
+        # compiled kernel, if enabled (see env.kernels)
+        if kernels.is_enabled():
+            return kernels.add_liquidity(liquidity_list, timestamp, quantity)
+
         # convert to dictionary, timestamps are unique
         liquidity = dict(liquidity_list)
         # aggregate added quantity with pre-existent quantity
@@ -489,6 +795,10 @@ class MarketState:
         if (not quantity) or (not liquidity_list):
             return liquidity_list
 
+        # compiled kernel, if enabled (see env.kernels)
+        if kernels.is_enabled():
+            return kernels.use_liquidity(liquidity_list, quantity)
+
         # determine used liquidity
         timestamp_list, quantity_list = zip(*liquidity_list)
         quantity_cumsum = np.cumsum(quantity_list)
@@ -532,6 +842,10 @@ class MarketState:
             int, remaining quantity surplus
         """
 
+        # compiled kernel, if enabled (see env.kernels)
+        if kernels.is_enabled():
+            return kernels.restore_liquidity(liquidity_list, liquidity_list_init, quantity)
+
         # convert to dictionary, timestamps are unique
         liquidity = dict(liquidity_list)
         liquidity_init = dict(liquidity_list_init)
@@ -565,31 +879,29 @@ class MarketState:
         """
         Match simulated standing buy orders against pre-trade ask state, and 
         simulated standing sell orders against pre-trade bid state. Iterate
-        the order queue per side and level, matching each order individually.
+        the order queue per side, matching each order across levels at once,
+        see `_match_levels`.
         """
 
-        # pretrade_state_ask is consumed, COPY_STATE_ASK is competing state
-        PRETRADE_STATE_ASK_FIXED = copy.deepcopy(self._pretrade_state_ask)
-        pretrade_state_ask = self._pretrade_state_ask
-        
-        # pretrade_state_bid is consumed, COPY_STATE_BID is competing state
-        PRETRADE_STATE_BID_FIXED = copy.deepcopy(self._pretrade_state_bid)
-        pretrade_state_bid = self._pretrade_state_bid
+        # competing state remains fixed, hence is converted into arrays once
+        # NOTE: liquidity_list is replaced rather than modified in _match_order
+        state_compete_bid = self._build_state_compete(self._pretrade_state_bid)
+        state_compete_ask = self._build_state_compete(self._pretrade_state_ask)
 
         # match agent buy orders against ask state, bid state is competing
         for order in self._orders_buy:
-            pretrade_state_ask = self._match_order(
+            self._pretrade_state_ask = self._match_order(
                 order=order, 
-                state=pretrade_state_ask, 
-                state_compete=PRETRADE_STATE_BID_FIXED,
+                state=self._pretrade_state_ask, 
+                state_compete=state_compete_bid,
             )
 
         # match agent sell orders against bid state, ask state is competing
         for order in self._orders_sell:
-            pretrade_state_bid = self._match_order(
+            self._pretrade_state_bid = self._match_order(
                 order=order, 
-                state=pretrade_state_bid, 
-                state_compete=PRETRADE_STATE_ASK_FIXED,
+                state=self._pretrade_state_bid, 
+                state_compete=state_compete_ask,
             )
 
     def _match_order(self, order, state, state_compete):
@@ -607,12 +919,16 @@ class MarketState:
         order), and state_compete (same side as order). Longer-standing 
         liquidity on the competing side is given priority over agent order.
 
+        Note that prices and limits are compared in their internal 
+        representation, trades are executed at the converted price.
+
         :param order:
             Order, order instance with side corresponding to state
         :param state:
             dict, state filtered by side corresponding to order, gets consumed
         :param state_compete:
-            dict, state filtered by side competing with order, remains fixed
+            dict, state filtered by side competing with order, as returned by
+            `_build_state_compete`
         :return state:
             dict, state after order excecution
         """
@@ -623,24 +939,47 @@ class MarketState:
             "sell": np.greater_equal,
         }[order.side]    
 
-        # ...
-        for price, liquidity_list in state.items():
-
-            # break matching algorithm when price is worse than limit
-            if order.limit and not better_than(price, order.limit):
-                break
-
-            # determine how much quantity can be used by agent order
-            quantity_available = sum(q for _, q in liquidity_list)
-            quantity_blocked = sum(q for t, q in state_compete.get(price, [])
-                if t <= order.timestamp # standing orders are prioritized
-            )
-            quantity_available = max(0, quantity_available - quantity_blocked)
-            quantity_used = min(quantity_available, order.quantity_left)
+        # price levels up to the first level that is worse than limit
+        price_list = list(state)
+        if order._limit:
+            is_better = better_than(np.array(price_list, dtype=float), order._limit)
+            num_levels = len(price_list) if is_better.all() else int(np.argmin(is_better))
+            price_list = price_list[:num_levels]
+        if not price_list:
+            return state
+
+        # available quantity per level, sum of liquidity_list via cumulative sum
+        quantity_list = [q for price in price_list for _, q in state[price]]
+        quantity_cumsum = np.concatenate([[0], np.cumsum(quantity_list, dtype=np.int64)])
+        stop = np.cumsum([len(state[price]) for price in price_list])
+        start = np.concatenate([[0], stop[:-1]])
+        quantity_available = quantity_cumsum[stop] - quantity_cumsum[start]
+
+        # blocked quantity per level, standing orders are prioritized
+        quantity_blocked = np.zeros(len(price_list), dtype=np.int64)
+        for i, price in enumerate(price_list):
+            if price in state_compete:
+                timestamp_array, quantity_cumsum_compete = state_compete[price]
+                j = np.searchsorted(timestamp_array, order.timestamp.value, side="right")
+                quantity_blocked[i] = quantity_cumsum_compete[j]
+
+        # determine how much quantity can be used by agent order per level
+        quantity_used_list = self._match_levels(
+            quantity_available=quantity_available,
+            quantity_blocked=quantity_blocked,
+            quantity_left=int(order.quantity_left),
+        ).tolist()
+
+        for price, quantity_used in zip(price_list, quantity_used_list):
+
+            # bypass levels without liquidity used, remaining levels are unchanged
+            if not quantity_used:
+                continue
 
             # execute (partial) order at this price level
-            if quantity_used:
-                order.execute(self._timestamp, quantity_used, price)
+            order.execute(self._timestamp, quantity_used, self.to_price(price),
+                context=self.context,
+            )
 
             # use liquidity
             state[price] = self._use_liquidity(
@@ -650,6 +989,63 @@ class MarketState:
 
         return state
 
+    # match helper methods ---
+
+    @staticmethod
+    def _build_state_compete(state):
+        """
+        Convert competing state into arrays, per price level the timestamps
+        (ns, ASCENDING) and cumulative quantities, so that the quantity
+        standing at or before a given timestamp is found by `searchsorted`.
+
+        :param state:
+            dict, state filtered by side, {<price>: [(<timestamp>, <quantity>), *], *}
+        :return state_compete:
+            dict, {<price>: (<timestamp_array>, <quantity_cumsum>), *}, where
+            quantity_cumsum includes a leading 0
+        """
+
+        state_compete = {}
+        for price, liquidity_list in state.items():
+            timestamp_array = np.array([t.value for t, _ in liquidity_list], dtype=np.int64)
+            quantity_cumsum = np.concatenate([[0],
+                np.cumsum([q for _, q in liquidity_list], dtype=np.int64),
+            ])
+            state_compete[price] = (timestamp_array, quantity_cumsum)
+
+        return state_compete
+
+    @staticmethod
+    def _match_levels(quantity_available, quantity_blocked, quantity_left):
+        """
+        Fill a single order across price levels, that is, use the quantity
+        that is available and not blocked per level, in order of price 
+        priority, until the order is exhausted.
+
+        Note that quantities are integer (number of shares) and kept in
+        integer arrays, so that sums and differences of cumulative sums are
+        exact and each fill is an integer quantity.
+
+        :param quantity_available:
+            np.ndarray, quantity available per price level (int64)
+        :param quantity_blocked:
+            np.ndarray, quantity blocked by competing standing orders per level (int64)
+        :param quantity_left:
+            int, remaining order quantity
+        :return quantity_used:
+            np.ndarray, quantity used per price level (int64)
+        """
+
+        # compiled kernel, if enabled (see env.kernels)
+        if kernels.is_enabled():
+            return kernels.match_levels(quantity_available, quantity_blocked, quantity_left)
+
+        # ...
+        quantity_available = np.maximum(quantity_available - quantity_blocked, 0)
+        quantity_filled = np.minimum(np.cumsum(quantity_available), quantity_left)
+
+        return np.diff(quantity_filled, prepend=0)
+
     # class method ---
 
     @classmethod
@@ -660,15 +1056,20 @@ class MarketState:
         manually. 
         """
 
-        # delete all elements in MarketState.instances (dictionary)
+        # delete all elements in MarketState.instances (dictionary, default context)
         class_reference.instances.clear() 
 
 
 class Order:
 
-    history = list() # instance store
+    history = Context.default.orders # instance store (default context)
 
-    def __init__(self, timestamp, market_id, side, quantity, limit=None):
+    __slots__ = (
+        "timestamp", "market_id", "side", "quantity", "limit", "order_id", 
+        "_limit", "quantity_left", "status", "related_trades",
+    )
+
+    def __init__(self, timestamp, market_id, side, quantity, limit=None, context=None):
         """
         Instantiate order.
 
@@ -679,7 +1080,9 @@ class Order:
         - 'REJECTED': set in Order.__init__
 
         Note that all order instances are stored in and may be accessed through
-        the `history` class attribute (list).
+        the `orders` attribute (list) of the given context, the default context
+        is available through the `history` class attribute. Accepted and 
+        rejected orders are reported to `EventLog.sink`.
 
         :param timestamp:
             pd.Timestamp, date and time that order was submitted
@@ -691,15 +1094,24 @@ class Order:
             int, number of shares ordered
         :param limit:
             float, limit price to consider, optional
+        :param context:
+            Context, engine context to submit order to, default is 
+            Context.default
         """
 
+        # order is validated against and registered with the given context
+        context = context or Context.default
+
         # static attributes from arguments
         self.timestamp = timestamp
         self.market_id = market_id
         self.side = side
         self.quantity = quantity
         self.limit = limit
-        self.order_id = len(self.__class__.history)
+        self.order_id = len(context.orders)
+
+        # limit in internal representation of the market (set in Order._assert_params)
+        self._limit = limit
 
         # dynamic attributes
         self.quantity_left = quantity
@@ -708,43 +1120,50 @@ class Order:
 
         # assert order parameters
         try:
-            self._assert_params()
+            self._assert_params(context)
         # set status 'REJECTED' if parameters are invalid
         except Exception as error:
-            print("(INFO) order {order_id} was rejected: {error}".format(
-                order_id=self.order_id,
-                error=error,
-            ))
             self.status = "REJECTED"
+            message = str(error)
         # ...
         else:
-            print("(INFO) order {order_id} was accepted: {self}".format(
-                order_id=self.order_id,
-                self=self,
+            message = None
+
+        # write event to event log, skipped entirely unless a sink is set
+        if EventLog.sink:
+            EventLog.sink.write(Event("order", self.order_id, self.timestamp,
+                self.market_id, self.side, self.quantity, self.limit, self.status, 
+                message,
             ))
 
-        # global attributes update
-        self.__class__.history.append(self)
+        # context attributes update
+        context.orders.append(self)
 
-    def _assert_params(self):
+    def _assert_params(self, context):
         """
         Assert order parameters and provide information about an erroneous
         order submission. Note that program execution is supposed to continue.
+
+        Note that error messages are only formatted if an assertion fails,
+        accepted orders pass without any string formatting.
+
+        :param context:
+            Context, engine context that includes the market
         """
 
         # first, assert that market exists
-        assert self.market_id in MarketState.instances, \
+        market_state = context.markets.get(self.market_id)
+        assert market_state is not None, \
             "market_id '{market_id}' does not exist".format(
                 market_id=self.market_id,
             )
         # assert that market_state is available
-        timestamp = MarketState.instances[self.market_id].timestamp
-        assert not pd.isnull(timestamp), \
+        assert market_state.timestamp is not None, \
             "trading is yet to start for market '{market_id}'".format(
                 market_id=self.market_id
             )
         # assert that side is valid
-        assert self.side in ["buy", "sell"], \
+        assert self.side in ("buy", "sell"), \
             "side can only take values 'buy' and 'sell', not '{side}'".format(
                 side=self.side,
             )
@@ -758,15 +1177,17 @@ class Order:
         if not self.limit:
             return
         
-        # assert that limit is valid
-        tick_size = MarketState.instances[self.market_id].tick_size
-        assert not Decimal(str(self.limit)) % Decimal(str(tick_size)), \
+        # assert that limit is valid, based on cached tick_size
+        assert market_state.is_valid_limit(self.limit), \
             "limit {limit} is too granular for tick_size {tick_size}".format(
                 limit=self.limit,
-                tick_size=tick_size,
+                tick_size=market_state.tick_size,
             )
 
-    def execute(self, timestamp, quantity, price):
+        # set limit in internal representation (integer tick count in tick mode)
+        self._limit = market_state.to_ticks(self.limit)
+
+    def execute(self, timestamp, quantity, price, context=None):
         """
         Execute order.
 
@@ -779,10 +1200,15 @@ class Order:
             int, matched quantity
         :param price:
             float, matched price
+        :param context:
+            Context, engine context to register trade with, default is 
+            Context.default
         """
 
         # execute order (partially)
-        trade = Trade(timestamp, self.market_id, self.side, quantity, price)
+        trade = Trade(timestamp, self.market_id, self.side, quantity, price,
+            context=context,
+        )
         self.related_trades.append(trade)
 
         # update remaining quantity
@@ -822,7 +1248,7 @@ class Order:
         Reset order history.
         """
         
-        # delete all elements in Order.history (list)
+        # delete all elements in Order.history (list, default context)
         del class_reference.history[:]
 
 
@@ -835,14 +1261,23 @@ class OrderPool:
 
 class Trade:
 
-    history = list() # instance store
+    history = Context.default.trades # instance store (default context)
 
-    def __init__(self, timestamp, market_id, side, quantity, price):
+    __slots__ = (
+        "blotter", "trade_id",
+    )
+
+    def __init__(self, timestamp, market_id, side, quantity, price, context=None):
         """
         Instantiate trade.
 
         Note that all trade instances are stored in and may be accessed through
-        the `history` class attribute (list).
+        the `trades` attribute (list) of the given context, the default context
+        is available through the `history` class attribute. The attributes of
+        a trade (timestamp, market_id, side, quantity and price) are not kept
+        by the trade itself but recorded as a row in the `blotter` attribute 
+        (Blotter) of the context, the trade is merely a view on its row, with
+        row index trade_id. Executed trades are reported to `EventLog.sink`.
 
         :param timestamp:
             pd.Timestamp, date and time that trade was created
@@ -854,24 +1289,50 @@ class Trade:
             int, number of shares executed
         :param price:
             float, price of shares executed
+        :param context:
+            Context, engine context to register trade with, default is 
+            Context.default
         """
 
-        # static attributes from arguments
-        self.timestamp = timestamp
-        self.market_id = market_id
-        self.side = side
-        self.quantity = quantity
-        self.price = price
-        self.trade_id = len(self.__class__.history)
+        # trade is registered with the given context
+        context = context or Context.default
 
-        # ...
-        print("(INFO) trade {trade_id} was executed: {self}".format(
-            trade_id=self.trade_id,
-            self=self,
-        ))
+        # record trade in blotter, row index corresponds to trade_id
+        self.blotter = context.blotter
+        self.trade_id = len(self.blotter)
+        self.blotter.append(timestamp, market_id, side, quantity, price)
+
+        # write event to event log, skipped entirely unless a sink is set
+        if EventLog.sink:
+            EventLog.sink.write(Event("trade", self.trade_id, timestamp,
+                market_id, side, quantity, price, "EXECUTED",
+                None,
+            ))
 
-        # global attributes update
-        self.__class__.history.append(self)
+        # context attributes update
+        context.trades.append(self)
+
+    # attributes, decoded from blotter row ---
+
+    @property
+    def timestamp(self):
+        return self.blotter.get(self.trade_id, "timestamp")
+
+    @property
+    def market_id(self):
+        return self.blotter.get(self.trade_id, "market")
+
+    @property
+    def side(self):
+        return self.blotter.get(self.trade_id, "side")
+
+    @property
+    def quantity(self):
+        return self.blotter.get(self.trade_id, "quantity")
+
+    @property
+    def price(self):
+        return self.blotter.get(self.trade_id, "price")
 
     def __str__(self):
         """
@@ -892,11 +1353,17 @@ class Trade:
     def reset_history(class_reference):
         """
         Reset trade history. 
+
+        Note that the blotter is replaced rather than cleared, so that any
+        reference to the previous blotter remains valid.
         """
         
-        # delete all elements in Trade.history (list)
+        # delete all elements in Trade.history (list, default context)
         del class_reference.history[:]
 
+        # replace blotter of the default context with a new, empty blotter
+        Context.default.blotter = Blotter()
+
 
 # TODO
 class TradePool: 
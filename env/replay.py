@@ -2,15 +2,30 @@
 # -*- coding: utf-8 -*-
 
 # use relative imports for other modules 
-from env.market import MarketState, Order, Trade
+from env.context import Context
+from env.blotter import Blotter
+from env.bookdiff import BookDifferences
+from env.catalog import Catalog
+from env.checkpoint import Checkpoint, describe_agent
+from env.events import EventLog
+from env.market import MarketState
+from env.statestream import MarketStateStream
+from env.stream import BookStream, TradesStream, book_usecols
+
+# specific imports
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # general imports
 import copy
 import datetime
+import functools
+import glob
+import itertools
 import logging
 import sys
 # logging.basicConfig(level=logging.CRITICAL) # logging.basicConfig(level=logging.NOTSET)
 logging.basicConfig(stream=sys.stdout, level=logging.ERROR)
+import numpy as np
 import os
 import pandas as pd
 import random
@@ -27,11 +42,27 @@ class Episode:
         episode_start:str,
         episode_end:str,
         sampling_freq:str or int=1,
+        catalog=None,
+        chunk_size:str=None,
+        day_store=None,
+        book_depth:int=None,
+        cache_directory:str=None,
     ):
         """
         Prepare a single episode as a generator. The episode is the main 
         building block of each backtest. 
 
+        An episode may span multiple dates, e.g. to hold positions overnight.
+        Data is then streamed one date at a time, so that at most the current
+        and the next date are loaded at any time. Dates without data (e.g.
+        weekends and holidays) are skipped.
+
+        If chunk_size is specified, each date is in turn streamed in chunks of
+        chunk_size (e.g. '5min'), that is, sources are read, aligned and 
+        iterated one chunk at a time, with the next chunk read ahead. Memory
+        then depends on chunk_size rather than on the length of the episode,
+        while the sequence of updates remains the same.
+
         :param identifier_list:
             pd.Timestamp, start building the market state, ignore agent
         :param source_directory:
@@ -45,17 +76,45 @@ class Episode:
         :param sampling_freq:
             int or str, int for event-based subsampling, every i-th event or str for time-based subsampling, e.g.
             '1s' for last event in each second
+        :param catalog:
+            Catalog, catalog of source_directory to find paths, optional
+        :param chunk_size:
+            str, stream each date in chunks of chunk_size, e.g. '5min', optional
+        :param day_store:
+            DayStore, load decoded sources shared with other processes, optional
+        :param book_depth:
+            int, number of price levels to load from BOOK sources, None for 
+            all price levels, updates that change deeper price levels only 
+            are dropped (deduplication)
+        :param cache_directory:
+            str, directory to cache prepared (aligned) segments in, so that 
+            a segment is prepared only once across runs, optional (not used
+            with chunk_size)
         """
 
         # data settings
         self.identifier_list = identifier_list
         self.source_directory = source_directory
+        self.catalog = catalog or Catalog(source_directory)
 
         # ...
         self._episode_start_buffer = pd.Timestamp(episode_start_buffer)
         self._episode_start = pd.Timestamp(episode_start)
         self._episode_end = pd.Timestamp(episode_end)
         self.sampling_freq = sampling_freq
+        self.chunk_size = chunk_size
+        self.day_store = day_store
+        self.book_depth = book_depth
+        self.cache_directory = cache_directory
+
+        # shared sources hold entire dates, chunks would not save memory
+        assert not (chunk_size and day_store), \
+            "(ERROR) chunk_size and day_store cannot be combined"
+
+        # time-based subsampling must not split intervals across chunks
+        if chunk_size and isinstance(sampling_freq, str):
+            assert pd.Timedelta(chunk_size) % pd.Timedelta(sampling_freq) == pd.Timedelta(0), \
+                "(ERROR) chunk_size must be a multiple of sampling_freq"
 
         # setup routine
         self._episode_setup(
@@ -64,6 +123,8 @@ class Episode:
 
         # dynamically set attributes (on per-update basis)
         self._episode_buffering = None
+        # iteration starts with the first update at or after this timestamp, see seek
+        self._timestamp_seek = None
 
     # static attributes ---
 
@@ -118,15 +179,20 @@ class Episode:
 
         # prepare data ---
 
-        # build path_store to host all paths to load data from (only for this particular episode)
-        path_store = self._build_path_store(self._episode_start, self._episode_end)
-        # build data_store to host all data (only for this particular episode)
-        data_store = self._build_data_store(self._episode_start, self._episode_end, path_store)
-        # align data_store so that each data source has equal length
-        data_store = self._align_data_store(data_store)
-        # build data_monitor to iterate over
-        data_monitor = self._build_data_monitor(data_store)
+        # split episode into segments, one per date, so that data is loaded
+        # (streamed) one date at a time, starting with the buffer phase
+        self._segment_list = self._build_segment_list(self._episode_start_buffer, self._episode_end)
 
+        # load first part (segment or chunk), subsequent parts are loaded during iteration
+        self._part_iterator = self._iter_data()
+        self._book_last_store = dict()
+        data_store, data_monitor, difference_store = self._next_part() or (None, None, None)
+
+        # if no part includes any data, raise Exception that is caught in calling method
+        if data_monitor is None:
+            raise Exception("(ERROR) could not find data between {timestamp_start} and {timestamp_end}".format(
+                timestamp_start=self._episode_start, timestamp_end=self._episode_end,
+            ))
 
         # set attributes ---
 
@@ -134,13 +200,21 @@ class Episode:
         self._data_store = data_store
         # set data_monitor to iterate over using the __iter__ method
         self._data_monitor = data_monitor
+        # set difference_store to look up book differences per step
+        self._difference_store = difference_store
 
         # sanity check ---
 
+        # last timestamp, for multi-date (or chunked) episodes based on the catalog of the last date
+        if len(self._segment_list) == 1 and not self.chunk_size:
+            timestamp_last = self._data_monitor.iloc[-1, 0]
+        else:
+            timestamp_last = self._last_timestamp(*self._segment_list[-1])
+
         # total time_delta should not deviate from episode_length by more than <tolerance> seconds
         time_delta_observed = (
-            abs(self._data_monitor.iloc[0, 0] - self._episode_start) +
-            abs(self._data_monitor.iloc[-1, 0] - self._episode_end)
+            abs(self._data_monitor.iloc[0, 0] - self._episode_start_buffer) +
+            abs(timestamp_last - self._episode_end)
         )
         # ...
         time_delta_required = pd.Timedelta(max_deviation_tol, "s")
@@ -158,10 +232,371 @@ class Episode:
         self._episode_available = True
 
         # info
-        logging.info("(INFO) episode has successfully been set and includes a total of {num_steps} steps".format(
+        logging.info("(INFO) episode has successfully been set and includes a total of {num_steps} steps in its first part ({num_dates} dates)".format(
             num_steps=len(data_monitor.index),
+            num_dates=len(self._segment_list),
+        ))
+
+    def _build_segment_list(self, timestamp_start, timestamp_end):
+        """
+        Split the episode into segments, one per date between timestamp_start
+        and timestamp_end. Dates without data for any of the sources (e.g. 
+        weekends and holidays) are skipped, except for the first date.
+
+        :param timestamp_start:
+            pd.Timestamp, ...
+        :param timestamp_end:
+            pd.Timestamp, ...
+
+        :return segment_list:
+            list, [(<timestamp_start>, <timestamp_end>), *], one per date
+        """
+
+        segment_list = []
+
+        # ...
+        for date in pd.date_range(timestamp_start.normalize(), timestamp_end.normalize(), freq="1d"):
+
+            # skip dates without data, but keep first date (fails when loaded)
+            if segment_list and not all(self.catalog.find(identifier, date.date())
+                for identifier in self.identifier_list
+            ):
+                logging.info("(INFO) date {date} is skipped, no data available".format(
+                    date=date.date(),
+                ))
+                continue
+
+            # segment covers entire date, restricted to episode
+            segment_list.append((
+                max(timestamp_start, date),
+                min(timestamp_end, date + pd.Timedelta("1d") - pd.Timedelta(1, "ns")),
+            ))
+
+        return segment_list
+
+    def _load_segment(self, timestamp_start, timestamp_end):
+        """
+        Load and prepare data for a single segment (date) of the episode.
+
+        :param timestamp_start:
+            pd.Timestamp, ...
+        :param timestamp_end:
+            pd.Timestamp, ...
+
+        :return data_store:
+            dict, {<identifier>: <pd.DataFrame>, *}, aligned timestamps
+        :return data_monitor:
+            pd.DataFrame, changes per source and timestamp
+        """
+
+        # build path_store to host all paths to load data from (only for this particular segment)
+        path_store = self._build_path_store(timestamp_start, timestamp_end)
+
+        # load prepared segment from cache_directory, prepare and save it only once
+        if self.cache_directory:
+            cache = self._build_cache(timestamp_start, timestamp_end, path_store)
+            segment = (timestamp_start, timestamp_end)
+            with cache.lock(segment):
+                is_found, result = cache.load(segment)
+                if not is_found:
+                    result = self._prepare_segment(timestamp_start, timestamp_end, path_store)
+                    cache.save(segment, result)
+            return result
+
+        return self._prepare_segment(timestamp_start, timestamp_end, path_store)
+
+    def _prepare_segment(self, timestamp_start, timestamp_end, path_store):
+        """
+        Prepare data for a single segment (date) of the episode, see 
+        _load_segment.
+
+        :param timestamp_start:
+            pd.Timestamp, ...
+        :param timestamp_end:
+            pd.Timestamp, ...
+        :param path_store:
+            dict, {<identifier>: <path>, *}
+
+        :return data_store:
+            dict, {<identifier>: <pd.DataFrame>, *}, aligned timestamps
+        :return data_monitor:
+            pd.DataFrame, changes per source and timestamp
+        """
+
+        # build data_store to host all data (only for this particular segment)
+        data_store = self._build_data_store(timestamp_start, timestamp_end, path_store)
+        # align data_store so that each data source has equal length
+        data_store = self._align_data_store(data_store)
+        # build data_monitor to iterate over
+        data_monitor = self._build_data_monitor(data_store)
+
+        return data_store, data_monitor
+
+    def _build_cache(self, timestamp_start, timestamp_end, path_store):
+        """
+        Cache of prepared segments in cache_directory, keyed by all parameters
+        that a prepared segment depends on, including size and modification 
+        time of each source file, so that cached segments are invalidated 
+        whenever a source file changes (see Checkpoint).
+
+        :param timestamp_start:
+            pd.Timestamp, ...
+        :param timestamp_end:
+            pd.Timestamp, ...
+        :param path_store:
+            dict, {<identifier>: <path>, *}
+        :return cache:
+            Checkpoint, store of prepared segments
+        """
+
+        return Checkpoint(self.cache_directory, config=dict(
+            file_list=self._build_file_list(path_store),
+            window=(str(timestamp_start), str(timestamp_end)), # at full precision
+            sampling_freq=self.sampling_freq,
+            book_depth=self.book_depth,
         ))
 
+    @staticmethod
+    def _build_file_list(path_store):
+        """
+        Identify each source file by name, size and modification time, so
+        that anything cached is invalidated whenever a source file changes.
+
+        :param path_store:
+            dict, {<identifier>: <path>, *}
+        :return file_list:
+            list, [(<identifier>, <basename>, <size>, <mtime_ns>), *]
+        """
+
+        return [(identifier, os.path.basename(path), os.stat(path).st_size, os.stat(path).st_mtime_ns)
+            for identifier, path in path_store.items()
+        ]
+
+    @property
+    def cache_key(self):
+        """
+        Key of the entire episode, combined from the cache keys of all its
+        segments (see _build_cache), so that anything derived from the
+        sequence of updates (e.g. market states) can be cached alongside.
+        Segments without data are not part of the episode.
+        """
+
+        key_list = []
+
+        # ...
+        for segment in self._segment_list:
+            try:
+                path_store = self._build_path_store(*segment)
+            except Exception:
+                continue
+            key_list.append(self._build_cache(*segment, path_store).key)
+
+        return "-".join(key_list)
+
+    def _last_timestamp(self, timestamp_start, timestamp_end):
+        """
+        Estimate the last timestamp of a segment, based on the last timestamp
+        of the BOOK sources in the catalog (without loading data).
+
+        :param timestamp_start:
+            pd.Timestamp, ...
+        :param timestamp_end:
+            pd.Timestamp, ...
+
+        :return timestamp_last:
+            pd.Timestamp, last timestamp, restricted to the segment
+        """
+
+        # ...
+        bounds_list = [self.catalog.bounds(self.catalog.find(identifier, timestamp_start.date()))
+            for identifier in self.identifier_list if "BOOK" in identifier
+        ]
+        timestamp_last = max((last for _, last in bounds_list if last is not None), 
+            default=timestamp_start,
+        )
+
+        return min(timestamp_last, timestamp_end)
+
+    def _iter_chunks(self, timestamp_start, timestamp_end):
+        """
+        Load and prepare data for a single segment (date) of the episode in 
+        chunks of chunk_size. Chunk boundaries are multiples of chunk_size
+        from midnight. Each chunk includes all updates from its start up to
+        (but excluding) its end, except for the last chunk, which includes
+        timestamp_end as well. Chunks without any update are skipped.
+
+        Sources are read incrementally (see BookStream and TradesStream) and
+        filtered exactly as in _build_data_store, so that the concatenation
+        of all chunks equals the segment loaded as a whole.
+
+        :param timestamp_start:
+            pd.Timestamp, ...
+        :param timestamp_end:
+            pd.Timestamp, ...
+
+        :return chunk:
+            tuple, (data_store, data_monitor) per chunk
+        """
+
+        # build path_store to host all paths to load data from (only for this particular segment)
+        path_store = self._build_path_store(timestamp_start, timestamp_end)
+
+        # open stream per source ---
+
+        stream_store = dict()
+
+        # ...
+        for identifier in self.identifier_list:
+
+            # event_id 'BOOK' is read in chunks, event_id 'TRADES' as a whole
+            if "BOOK" in identifier:
+                stream_store[identifier] = BookStream(path_store[identifier], book_depth=self.book_depth)
+            if "TRADES" in identifier:
+                stream_store[identifier] = TradesStream(path_store[identifier])
+
+            # if source is empty, raise Exception that is caught in calling method
+            if stream_store[identifier].is_empty:
+                raise Exception("(ERROR) could not find data for {identifier} between {timestamp_start} and {timestamp_end}".format(
+                    identifier=identifier,
+                    timestamp_start=timestamp_start, timestamp_end=timestamp_end,
+                ))
+
+            # skip book updates before this segment (still used for deduplication)
+            if "BOOK" in identifier:
+                stream_store[identifier].read(timestamp_start)
+
+        # build chunks ---
+
+        # chunk boundaries, multiples of chunk_size from midnight
+        boundary_list = [timestamp for timestamp in pd.date_range(
+            timestamp_start.floor(self.chunk_size), timestamp_end, freq=self.chunk_size,
+        ) if timestamp_start < timestamp < timestamp_end]
+        chunk_list = list(zip([timestamp_start] + boundary_list, boundary_list + [timestamp_end]))
+
+        # number of book updates per source within this segment so far
+        num_rows_store = {identifier: 0 for identifier in self.identifier_list}
+
+        for chunk_start, chunk_end in chunk_list:
+
+            # ...
+            is_last = chunk_end == timestamp_end
+            data_store = dict()
+
+            # ...
+            for identifier in self.identifier_list:
+
+                # ...
+                if "BOOK" in identifier:
+                    df = stream_store[identifier].read(chunk_end, inclusive=is_last)
+                if "TRADES" in identifier:
+                    df = stream_store[identifier].read(chunk_start, chunk_end,
+                        timestamp_book=data_store[f'{identifier.replace("TRADES", "BOOK")}'][DATETIME],
+                        inclusive=is_last,
+                    )
+
+                # sampling frequency, event-based subsampling continues across chunks
+                num_rows = len(df.index)
+                df = self._sample_data(identifier, df, data_store,
+                    offset=num_rows_store[identifier],
+                )
+                num_rows_store[identifier] = num_rows_store[identifier] + num_rows
+
+                # add dataframe to output dictionary
+                data_store[identifier] = df
+
+            # skip chunks without any update
+            if not any(len(df.index) for df in data_store.values()):
+                continue
+
+            # align data_store so that each data source has equal length
+            data_store = self._align_data_store(data_store)
+            # build data_monitor to iterate over
+            data_monitor = self._build_data_monitor(data_store)
+
+            yield data_store, data_monitor
+
+    def _iter_data(self):
+        """
+        Iterate over all parts of the episode, that is, one part per segment,
+        or one part per chunk if chunk_size is specified. Segments that cannot
+        be loaded are skipped, unless no part has been loaded yet.
+
+        :return part:
+            tuple, (data_store, data_monitor) per part
+        """
+
+        is_started = False
+
+        # ...
+        for segment in self._segment_list:
+            try:
+                if self.chunk_size:
+                    for part in self._iter_chunks(*segment):
+                        is_started = True
+                        yield part
+                else:
+                    part = self._load_segment(*segment)
+                    is_started = True
+                    yield part
+            # first part is required, raise Exception that is caught in calling method
+            except Exception as e:
+                if not is_started:
+                    raise
+                logging.info("(ERROR) segment is skipped: {error}".format(error=e))
+
+    def _next_part(self):
+        """
+        Load the next part of the episode (see _iter_data) and precompute the
+        book differences of each BOOK source, continuing from the last book
+        update of the previous part.
+
+        :return part:
+            tuple, (data_store, data_monitor, difference_store), None if there
+            is no part left
+        """
+
+        part = next(self._part_iterator, None)
+        if part is None:
+            return None
+
+        # ...
+        data_store, data_monitor = part
+        difference_store = dict()
+        for identifier, df in data_store.items():
+            if "BOOK" in identifier:
+                difference_store[identifier] = BookDifferences(df, self._book_last_store.get(identifier))
+                self._book_last_store[identifier] = difference_store[identifier].book_last
+
+        return data_store, data_monitor, difference_store
+
+    def _iter_parts(self):
+        """
+        Iterate over all parts of the episode, starting with the (already
+        loaded) first part. While a part is being iterated, the next part is
+        read ahead in a background thread, so that at most two parts are 
+        loaded at any time.
+
+        :return part:
+            tuple, (data_store, data_monitor, difference_store, future) where
+            future returns the next part, None if last
+        """
+
+        # ...
+        part = (self._data_store, self._data_monitor, self._difference_store)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+
+            while part:
+
+                # read ahead next part
+                future = executor.submit(self._next_part)
+
+                # ...
+                yield part + (future,)
+
+                # move on to next part
+                part = future.result()
+
     # helper methods ---
 
     def _build_path_store(self, timestamp_start, timestamp_end):
@@ -170,7 +605,8 @@ class Episode:
         their corresponding key.
         
         Note that timestamp_start and timestamp_end must belong to the same 
-        date!
+        date! Episodes that span multiple dates are loaded one date at a time
+        (see _build_segment_list).
 
         :param timestamp_start:
             pd.Timestamp, ...
@@ -187,41 +623,20 @@ class Episode:
         assert timestamp_start.date() == timestamp_end.date(), \
             "(ERROR) timestamp_start and timestamp_end must belong to the same date"
         date = timestamp_start.date()
-        date_string = str(date).replace("-", "")
-
-        # path_list includes all paths available in directory
-        path_list = [os.path.join(pre, file) for pre, _, sub in os.walk(self.source_directory)
-            for file in sub if not file.startswith((".", "_"))
-        ]
 
         # ...
         for identifier in self.identifier_list:
 
-            # identify matching criteria
-            market_id, event_id = identifier.split(".")
-
-            # make copy of path_list
-            path_list_ = path_list.copy()
-            # filter based on matching criteria
-            path_list_ = filter(
-                lambda path: market_id.lower() in path.lower(), path_list_)
-            path_list_ = filter(
-                lambda path: event_id.lower() in path.lower(), path_list_)
-            path_list_ = filter(
-                lambda path: date_string in path, path_list_)
-            # ...
-            path_list_ = list(path_list_)
+            # find path based on matching criteria (market_id, event_id, date)
+            path = self.catalog.find(identifier, date)
 
-            # if path_list_this is empty, raise Exception that is caught in calling method
-            if not len(path_list_) == 1:
+            # if there is not exactly one matching path, raise Exception that is caught in calling method
+            if not path:
                 raise Exception("(ERROR) could not find path for {identifier} between {timestamp_start} and {timestamp_end}".format(
                     identifier=identifier,
                     timestamp_start=timestamp_start, timestamp_end=timestamp_end,
                 ))
 
-            # there should be exactly one matching path
-            path = path_list_[0]
-
             # add dataframe to output dictionary
             path_store[identifier] = path
 
@@ -251,44 +666,46 @@ class Episode:
         # ...
         for identifier in self.identifier_list:
 
+            # load decoded source from day_store, rows within this segment are views (no copy)
+            if self.day_store:
+                df, num_rows = self.day_store.load(identifier, path_store[identifier],
+                    timestamp_start, timestamp_end, book_depth=self.book_depth,
+                )
+                if "TRADES" in identifier:
+                    df = df.loc[df[DATETIME].isin(data_store[f'{identifier.replace("TRADES", "BOOK")}'][DATETIME])]
+                    num_rows = len(df.index)
+
             # load event_id 'BOOK' as .csv(.gz)
-            if "BOOK" in identifier:
-                df = pd.read_csv(path_store[identifier], parse_dates=[DATETIME])
+            elif "BOOK" in identifier:
+                df = pd.read_csv(path_store[identifier], parse_dates=[DATETIME], usecols=book_usecols(self.book_depth))
                 # Between some timestamps there are no LOB changes - filter them out
                 #df = pd.concat([df.drop_duplicates(subset=[c for c in df.columns[1:]], keep='first'), df.tail(1)]).reset_index(drop=True)
                 df = df.drop_duplicates(subset=[c for c in df.columns[1:]], keep='first').reset_index(drop=True)
+                num_rows = len(df.index)
 
             # load event_id 'TRADES' as .json
-            if "TRADES" in identifier:
+            elif "TRADES" in identifier:
                 df = pd.read_json(path_store[identifier], convert_dates=True)
                 df = df.loc[df[DATETIME].isin(data_store[f'{identifier.replace("TRADES", "BOOK")}'][DATETIME])]
+                num_rows = len(df.index)
 
             # if dataframe is empty, raise Exception that is caught in calling method
-            if not len(df.index) > 0:
+            if not num_rows > 0:
                 raise Exception("(ERROR) could not find data for {identifier} between {timestamp_start} and {timestamp_end}".format(
                     identifier=identifier,
                     timestamp_start=timestamp_start, timestamp_end=timestamp_end,
                 ))
 
-            # make timestamp timezone-unaware
-            df[DATETIME] = pd.DatetimeIndex(df[DATETIME]).tz_localize(None)
-            # filter dataframe to include only rows with timestamp between timestamp_start and timestamp_end
-            df = df[df[DATETIME].between(timestamp_start, timestamp_end)]
-
-            # Sampling frequency
-            # ToDo: Sampling frequency does not work properly yet. Potential problem: Trades are not resampled in the same way?
-            # Maybe we drop timestamps that are still available in the trade data.
-            if self.sampling_freq != 1:
-                if "BOOK" in identifier:
-                    if isinstance(self.sampling_freq, int):
-                        df = df.iloc[::self.sampling_freq]
-                    elif isinstance(self.sampling_freq, str):
-                        df = df.resample(self.sampling_freq, on=DATETIME).last()
-                        df = df.reset_index(drop=True).dropna().reset_index(drop=True)
+            # rows from day_store are timezone-unaware and within the segment already,
+            # skip filter to keep views
+            if not self.day_store:
+                # make timestamp timezone-unaware
+                df[DATETIME] = pd.DatetimeIndex(df[DATETIME]).tz_localize(None)
+                # filter dataframe to include only rows with timestamp between timestamp_start and timestamp_end
+                df = df[df[DATETIME].between(timestamp_start, timestamp_end)]
 
-                # Merge trades based on datetime to account for sampling frequency
-                if "TRADES" in identifier:
-                    df = df.loc[df[DATETIME].isin(data_store[f'{identifier.replace("TRADES", "BOOK")}'][DATETIME])]
+            # sampling frequency
+            df = self._sample_data(identifier, df, data_store)
 
             # add dataframe to output dictionary
             data_store[identifier] = df
@@ -298,6 +715,41 @@ class Episode:
 
         return data_store
 
+    def _sample_data(self, identifier, df, data_store, offset=0):
+        """
+        Apply sampling_freq to the dataframe of a single source.
+
+        :param identifier:
+            str, <market_id>.BOOK/TRADES identifier
+        :param df:
+            pd.DataFrame, original timestamps
+        :param data_store:
+            dict, {<identifier>: <pd.DataFrame>, *}, sampled sources so far
+        :param offset:
+            int, number of updates that precede df within the same segment
+            (event-based subsampling across chunks)
+
+        :return df:
+            pd.DataFrame, sampled
+        """
+
+        # Sampling frequency
+        # ToDo: Sampling frequency does not work properly yet. Potential problem: Trades are not resampled in the same way?
+        # Maybe we drop timestamps that are still available in the trade data.
+        if self.sampling_freq != 1:
+            if "BOOK" in identifier:
+                if isinstance(self.sampling_freq, int):
+                    df = df.iloc[-offset % self.sampling_freq::self.sampling_freq]
+                elif isinstance(self.sampling_freq, str):
+                    df = df.resample(self.sampling_freq, on=DATETIME).last()
+                    df = df.reset_index(drop=True).dropna().reset_index(drop=True)
+
+            # Merge trades based on datetime to account for sampling frequency
+            if "TRADES" in identifier:
+                df = df.loc[df[DATETIME].isin(data_store[f'{identifier.replace("TRADES", "BOOK")}'][DATETIME])]
+
+        return df
+
     def _align_data_store(self, data_store):
         """
         Consolidate and split again all sources so that each source dataframe
@@ -374,6 +826,36 @@ class Episode:
 
         return data_monitor
 
+    def book_difference(self, identifier):
+        """
+        Precomputed book difference of a BOOK source at the current step, see
+        BookDifferences and MarketState.update.
+
+        :param identifier:
+            str, <market_id>.BOOK identifier
+        :return book_difference:
+            list, [(<price>, <quantity>), *], None if not available
+        """
+
+        # ...
+        if identifier not in self._difference_store:
+            return None
+
+        return self._difference_store[identifier].get(self._step)
+
+    def seek(self, timestamp):
+        """
+        Skip all updates before timestamp, e.g. once all market states have 
+        been restored from snapshots taken at timestamp. Parts that end 
+        before timestamp are not iterated at all, book differences continue
+        across skipped updates. Call before iteration.
+
+        :param timestamp:
+            pd.Timestamp, timestamp of the first update to iterate
+        """
+
+        self._timestamp_seek = pd.Timestamp(timestamp)
+
     # iteration ---
         
     def __next__(self):
@@ -400,85 +882,104 @@ class Episode:
 
         # time
         time_start = time.time()
+        num_steps = 0
 
         # ...
-        for step, timestamp, *monitor_state in self._data_monitor.itertuples():
+        for self._data_store, self._data_monitor, self._difference_store, future in self._iter_parts():
 
-            # update timestamps ---
+            # skip updates before the timestamp set by seek, if any
+            step_start = 0 if self._timestamp_seek is None else (
+                self._data_monitor[DATETIME].searchsorted(self._timestamp_seek)
+            )
 
-            # track this timestamp
-            self._timestamp = self._data_monitor.iloc[step, 0]
-            
-            # track next timestamp, prevent IndexError that would arise with the last step
-            self._timestamp_next = self._data_monitor.iloc[min(
-                step + 1, len(self._data_monitor.index) - 1
-            ), 0]
+            for step, timestamp, *monitor_state in self._data_monitor.iloc[step_start:].itertuples():
 
-            # display progress ---
+                # update timestamps ---
 
-            # ...
-            progress = timestamp.value / (self._episode_end.value - self._episode_start_buffer.value)
-            eta = (time.time() - time_start) / progress
-
-            # info
-            logging.info("(INFO) step {step}, progress {progress}, eta {eta}".format(
-                step=step,
-                progress=progress,
-                eta=eta,
-            ))
+                # track this step and timestamp
+                self._step = step
+                self._timestamp = self._data_monitor.iloc[step, 0]
+                num_steps = num_steps + 1
+            
+                # track next timestamp, prevent IndexError that would arise with the last step
+                self._timestamp_next = self._data_monitor.iloc[min(
+                    step + 1, len(self._data_monitor.index) - 1
+                ), 0]
+
+                # with the last step of a part, next timestamp is the first of the next part
+                if step + 1 == len(self._data_monitor.index) and future.result():
+                    self._timestamp_next = future.result()[1].iloc[0, 0]
+
+                # display progress ---
+
+                # ...
+                progress = timestamp.value / (self._episode_end.value - self._episode_start_buffer.value)
+                eta = (time.time() - time_start) / progress
+
+                # info
+                logging.info("(INFO) step {step}, progress {progress}, eta {eta}".format(
+                    step=step,
+                    progress=progress,
+                    eta=eta,
+                ))
 
-            # handle buffer phase ---
+                # handle buffer phase ---
             
-            # update buffer flag, agent should start being informed only after buffering phase has ended
-            cache_episode_buffering = self._episode_buffering
-            self._episode_buffering = timestamp < self._episode_start
+                # update buffer flag, agent should start being informed only after buffering phase has ended
+                cache_episode_buffering = self._episode_buffering
+                self._episode_buffering = timestamp < self._episode_start
             
-            # info
-            if cache_episode_buffering != self._episode_buffering:
-                logging.info("(INFO) buffering phase for this episode has ended, allow trading ...")
+                # info
+                if cache_episode_buffering != self._episode_buffering:
+                    logging.info("(INFO) buffering phase for this episode has ended, allow trading ...")
             
-            # find data ---
+                # find data ---
 
-            # get identifier (column name) per updated source (based on self._data_monitor)
-            identifier_list = (self._data_monitor
-                .iloc[:, 1:]
-                .columns[monitor_state]
-                .values
-            )
+                # get identifier (column name) per updated source (based on self._data_monitor)
+                identifier_list = (self._data_monitor
+                    .iloc[:, 1:]
+                    .columns[monitor_state]
+                    .values
+                )
 
-            # get data per updated source (based on self._data_store)
-            data_list = [self._data_store[identifier].iloc[step, :] 
-                for identifier in identifier_list
-            ]
+                # get data per updated source (based on self._data_store)
+                data_list = [self._data_store[identifier].iloc[step, :] 
+                    for identifier in identifier_list
+                ]
 
-            # yield data ---
+                # yield data ---
 
-            # for each step, yield update via dictionary
-            update = dict(zip(identifier_list, data_list)) # {<identifier>: <data>, *}
+                # for each step, yield update via dictionary
+                update = dict(zip(identifier_list, data_list)) # {<identifier>: <data>, *}
 
-            # ...
-            yield update
+                # ...
+                yield update
         
         # time
         time_end = time.time()
         
         # ...
         time_delta = round(time_end - time_start, 3)
-        time_per_step = round((time_end - time_start) / step, 3)
+        time_per_step = round((time_end - time_start) / num_steps, 3)
 
         # info
         logging.info("(INFO)... episode has ended, took {time_delta}s for {step} steps ({time_per_step}s/step)".format(
             time_delta=time_delta,
-            step=step,
+            step=num_steps,
             time_per_step=time_per_step,
         ))
 
 class Backtest:
 
-    timestamp_global = None
+    timestamp_global = None # most recent timestamp across all backtests (display only)
 
     def __init__(self,
         agent, # backtest is wrapper for trading agent
+        tick_size:float or dict=None,
+        context=None,
+        book_depth:int=None,
+        match_trades:bool=True,
+        skip_buffer:bool=False,
     ):
         """
         Backtest wrapper that is used to evaluate a trading agent on one or 
@@ -489,17 +990,53 @@ class Backtest:
 
         :param agent:
             Agent, trading agent instance that is to be evaluated
+        :param tick_size:
+            float or dict, fixed tick size for all markets or {<market_id>: 
+            <tick_size>, *} per market, optional, if specified the market 
+            states run in tick mode (integer tick counts instead of prices)
+        :param context:
+            Context, engine context that owns markets, orders, trades and the
+            clock of this backtest, default is a new context per backtest
+        :param book_depth:
+            int, number of price levels the agent is informed about, 
+            overrides the book_depth declared by the agent, book updates 
+            that change deeper price levels only are not passed on to the 
+            agent, market states are still built from (and orders are 
+            matched against) all price levels
+        :param match_trades:
+            bool, load TRADES sources to match standing orders against the 
+            pre-trade state even if the agent does not declare 'TRADES' in 
+            its event_types, default is True
+        :param skip_buffer:
+            bool, start each episode at episode_start rather than at 
+            episode_start_buffer, market states are then initialised from 
+            their first book update, with a single entry per price level 
+            (see MarketState.initialize), default is False
         """
 
         # from arguments
         self._agent = agent 
+        self.tick_size = tick_size
+        self.book_depth = book_depth
+        self.match_trades = match_trades
+        self.skip_buffer = skip_buffer
+
+        # each backtest owns its engine context, independent of other backtests
+        self.context = context or Context()
 
         # list capturing all results (orders, trades, exposure, pnl)
         self.results = []
 
+        # market state streams per market, recorded or replayed (see run with cache_directory)
+        self._stream_store = dict()
+        # warm-start snapshots per market, restored or taken (see run with cache_directory)
+        self._restore_store = dict()
+        self._snapshot_store = dict()
+        self._snapshot_list = []
+
     # market/agent step ---
 
-    def _market_step(self, market_id, book_update, trade_update):
+    def _market_step(self, market_id, book_update, trade_update, book_difference=None):
         """
         Update post-trade market state and match standing orders against 
         pre-trade market state.
@@ -510,16 +1047,32 @@ class Backtest:
             pd.Series, ...
         :param trade_update:
             pd.Series, ...
+        :param book_difference:
+            list, precomputed book difference, see Episode.book_difference
         """
 
-        # update market state
-        MarketState.instances[market_id].update(
-            book_update=book_update,
-            trade_update=trade_update,
-        )
+        market_state = self.context.markets[market_id]
+        stream = self._stream_store.get(market_id)
+
+        # replay market state from a recorded stream, without update ...
+        if stream and stream.is_recorded:
+            stream.apply(market_state, book_update, trade_update)
+        # ... or update market state, record stream if required
+        else:
+            # without buffer phase, initialise market state from its first book update
+            if self.skip_buffer and market_state.timestamp is None:
+                is_updated = market_state.initialize(book_update=book_update)
+            else:
+                is_updated = market_state.update(
+                    book_update=book_update,
+                    trade_update=trade_update,
+                    book_difference=book_difference,
+                )
+            if stream:
+                stream.record(market_state, is_updated)
 
         # match standing agent orders against pre-trade state
-        MarketState.instances[market_id].match()
+        market_state.match()
 
     def _agent_step(self, source_id, either_update, timestamp, timestamp_next):
         """
@@ -537,8 +1090,19 @@ class Backtest:
             pd.Timestamp, ...
         """
 
+        # inform agent only about book updates that change the price levels
+        # it has declared, see BaseAgent.book_depth (neither on_quote nor on_time)
+        if source_id.endswith("BOOK") and self._book_depth_agent:
+            book_state = either_update.to_numpy()[1:1 + 4 * self._book_depth_agent].astype(float)
+            if np.array_equal(book_state, self._book_state_store.get(source_id), equal_nan=True):
+                return
+            self._book_state_store[source_id] = book_state
+
+        # inform agent only about event types it has declared, see BaseAgent.event_types
+        if source_id.split(".")[-1] not in getattr(self.agent, "event_types", ("BOOK", "TRADES")):
+            pass
         # case 1: alert agent every time that book is updated
-        if source_id.endswith("BOOK"):
+        elif source_id.endswith("BOOK"):
             self.agent.on_quote(market_id=source_id.split(".")[0], 
                 book_state=either_update,
             )
@@ -559,47 +1123,406 @@ class Backtest:
             timestamp_next=timestamp_next,
         )
 
-    # option 1: run single episode ---
+    # episode setup/report ---
 
-    def run(self, 
-        identifier_list:list,
-        source_directory:str,
-        episode_start_buffer:str,
-        episode_start:str,
-        episode_end:str,
-        sampling_freq:int or str,
-        display_interval:int=10_000,
-    ):  
+    @property
+    def _backtest_kwargs(self):
         """
-        Run agent against a single backtest instance based on a specified 
-        episode. 
+        Keyword arguments to create an equivalent backtest in a worker process.
+        """
+
+        return dict(
+            tick_size=self.tick_size,
+            book_depth=self.book_depth,
+            match_trades=self.match_trades,
+            skip_buffer=self.skip_buffer,
+        )
+
+    def _prune_sources(self, identifier_list, agent=None):
+        """
+        Determine sources to load and book depth to inform the agent about, 
+        based on the book_depth and event_types declared by the agent (see 
+        BaseAgent). BOOK sources are always loaded (with all price levels) to
+        build the market states, TRADES sources only if the agent is informed
+        about trades or if trades are used for matching.
 
         :param identifier_list:
             list, <market_id>.BOOK/TRADES identifier for each respective data source
-        :param source_directory:
-            str, path to book and trade sources, e.g. "/home/jovyan/_shared_storage/read_only/efn2_backtesting"
-        :param episode_start_buffer:
-            pd.Timestamp, 
-        :param episode_start:
-            pd.Timestamp, ...
+        :param agent:
+            Agent, agent to consider, default is the original agent
+        :return identifier_list:
+            list, identifiers of sources to load
+        :return book_depth:
+            int, number of price levels the agent is informed about, None for
+            all price levels
+        """
+
+        agent = agent or self._agent
+
+        # ...
+        book_depth = self.book_depth or getattr(agent, "book_depth", None)
+        event_types = getattr(agent, "event_types", ("BOOK", "TRADES"))
+
+        # ...
+        identifier_list = [identifier for identifier in identifier_list
+            if "BOOK" in identifier 
+            or identifier.split(".")[-1] in event_types 
+            or self.match_trades
+        ]
+
+        return identifier_list, book_depth
+
+    def _setup_episode(self, identifier_list):
+        """
+        Create a fresh copy of the original agent instance, bound to the 
+        context of this backtest, and create a MarketState instance for each 
+        market referenced in identifier_list.
+
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        """
+
+        # setup agent ---
+
+        # create fresh copy of the original agent instance
+        self.agent = copy.copy(self._agent)
+
+        # bind a copy of the market interface to the context of this backtest
+        self.agent.market_interface = copy.copy(self._agent.market_interface)
+        self.agent.market_interface.bind(self.context)
+
+        # price levels the agent is informed about, last informed state per BOOK source
+        _, self._book_depth_agent = self._prune_sources(identifier_list)
+        self._book_state_store = dict()
+
+        # setup market environment ---
+
+        # ...
+        self._setup_markets(identifier_list)
+
+    def _setup_markets(self, identifier_list):
+        """
+        Create a MarketState instance in the context of this backtest for each
+        market referenced in identifier_list.
+
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        """
+
+        # identify market instances based on market_id
+        market_id_list = set(identifier.split(".")[0] for identifier
+            in identifier_list
+        )
+        # create market_state instances
+        for market_id in market_id_list:
+            _ = MarketState(market_id, tick_size=self.tick_size.get(market_id)
+                if isinstance(self.tick_size, dict) else self.tick_size, 
+                context=self.context,
+            )
+
+    def _build_stream_cache(self, episode, market_id):
+        """
+        Cache of market state streams in the cache_directory of the episode,
+        keyed by market, tick_size and the cache keys of all segments of the
+        episode (see Episode.cache_key).
+
+        :param episode:
+            Episode, episode with cache_directory
+        :param market_id:
+            str, market identifier
+        :return cache:
+            Checkpoint, store of market state streams
+        """
+
+        config = dict(
+            kind="market_state",
+            market_id=market_id,
+            episode=episode.cache_key,
+            tick_size=self.tick_size.get(market_id)
+                if isinstance(self.tick_size, dict) else self.tick_size,
+        )
+        # market states are initialised differently without buffer phase
+        if self.skip_buffer:
+            config.update(skip_buffer=True)
+
+        return Checkpoint(episode.cache_directory, config=config)
+
+    def _setup_streams(self, episode, identifier_list):
+        """
+        Load a recorded market state stream per market from the cache_directory
+        of the episode, or start recording a new stream if there is none.
+
+        :param episode:
+            Episode, ...
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        """
+
+        self._stream_store = dict()
+
+        # market state streams are cached along with prepared segments only
+        if not episode.cache_directory:
+            return
+
+        # ...
+        for market_id in set(identifier.split(".")[0] for identifier in identifier_list):
+            cache = self._build_stream_cache(episode, market_id)
+            is_found, array_store = cache.load((episode.episode_start_buffer, episode.episode_end))
+            self._stream_store[market_id] = MarketStateStream(array_store if is_found else None)
+
+    def _save_streams(self, episode):
+        """
+        Save all market state streams that have been recorded during the
+        (completed) episode into the cache_directory of the episode.
+
+        :param episode:
+            Episode, ...
+        """
+
+        # ...
+        for market_id, stream in self._stream_store.items():
+            if not stream.is_recorded:
+                cache = self._build_stream_cache(episode, market_id)
+                cache.save((episode.episode_start_buffer, episode.episode_end), stream.to_arrays())
+
+        self._stream_store = dict()
+
+    def _build_snapshot_cache(self, episode, market_id):
+        """
+        Cache of warm-start snapshots in the cache_directory of the episode,
+        keyed by market, its source files of the first date,
+        episode_start_buffer and all parameters the market state depends on.
+        A snapshot taken at any timestamp of the first date is therefore
+        valid for all episodes with the same episode_start_buffer, regardless
+        of episode_start and episode_end.
+
+        :param episode:
+            Episode, episode with cache_directory
+        :param market_id:
+            str, market identifier
+        :return cache:
+            Checkpoint, store of snapshots, one per (episode_start_buffer,
+            <timestamp>)
+        """
+
+        # ...
+        path_store = episode._build_path_store(*episode._segment_list[0])
+        path_store = {identifier: path for identifier, path in path_store.items()
+            if identifier.split(".")[0] == market_id
+        }
+
+        return Checkpoint(episode.cache_directory, config=dict(
+            kind="snapshot",
+            market_id=market_id,
+            file_list=episode._build_file_list(path_store),
+            episode_start_buffer=str(episode.episode_start_buffer), # at full precision
+            sampling_freq=episode.sampling_freq,
+            book_depth=episode.book_depth,
+            tick_size=self.tick_size.get(market_id)
+                if isinstance(self.tick_size, dict) else self.tick_size,
+        ))
+
+    def _setup_snapshots(self, episode, identifier_list):
+        """
+        Restore each market state from the most recent warm-start snapshot
+        taken at or before episode_start (same episode_start_buffer), so that
+        the buffer phase is replayed only from the snapshot onwards. Markets
+        without snapshot are replayed from episode_start_buffer and snapshots
+        are taken at episode_start (see `_take_snapshots`). Once all markets
+        have been restored, the episode itself starts at the earliest
+        snapshot (see `Episode.seek`), updates of a market before its own
+        snapshot are skipped in `run`.
+
+        :param episode:
+            Episode, ...
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        """
+
+        # {<market_id>: <timestamp>, *}, updates before timestamp are skipped
+        self._restore_store = dict()
+        # {<market_id>: <snapshot>, *}, snapshots to save with the episode
+        self._snapshot_store = dict()
+        # markets to take snapshots of, once the buffer phase has ended
+        self._snapshot_list = []
+
+        # snapshots are cached along with prepared segments only, within the first date
+        if not episode.cache_directory or episode.episode_start > episode._segment_list[0][1]:
+            return
+
+        # ...
+        for market_id in set(identifier.split(".")[0] for identifier in identifier_list):
+            cache = self._build_snapshot_cache(episode, market_id)
+
+            # find snapshots between episode_start_buffer and episode_start
+            pattern = "{start}_*_{key}.pkl".format(
+                start=episode.episode_start_buffer.strftime("%Y%m%dT%H%M%S"), key=cache.key,
+            )
+            timestamp_list = [pd.Timestamp(os.path.basename(path).split("_")[1])
+                for path in glob.glob(os.path.join(cache.directory, pattern))
+            ]
+            timestamp_list = [timestamp for timestamp in timestamp_list
+                if timestamp <= episode.episode_start
+            ]
+
+            # take snapshot at episode_start if there is none
+            if not timestamp_list:
+                self._snapshot_list.append(market_id)
+                continue
+
+            # restore from the most recent snapshot
+            is_found, snapshot = cache.load((episode.episode_start_buffer, max(timestamp_list)))
+            if not is_found or snapshot["timestamp"] > episode.episode_start:
+                self._snapshot_list.append(market_id)
+                continue
+            self.context.markets[market_id].restore(snapshot["state"])
+            self._restore_store[market_id] = snapshot["timestamp"]
+
+            # market state stream continues after the snapshot, a partial stream is not recorded
+            stream = self._stream_store.get(market_id)
+            if stream and stream.is_recorded:
+                stream.seek(snapshot["num_updates"])
+            elif stream:
+                del self._stream_store[market_id]
+
+    def _take_snapshots(self, episode):
+        """
+        Take warm-start snapshots of all market states that have not been
+        restored from a snapshot, once the buffer phase has ended.
+
+        :param episode:
+            Episode, ...
+        """
+
+        # ...
+        for market_id in self._snapshot_list:
+            state = self.context.markets[market_id].snapshot()
+            # market state has not been updated before episode_start (no book update yet)
+            if state is None:
+                continue
+            self._snapshot_store[market_id] = {
+                'timestamp': episode.episode_start,
+                'num_updates': self._stream_store[market_id].num_updates,
+                'state': state,
+            }
+
+        self._snapshot_list = []
+
+    def _save_snapshots(self, episode):
+        """
+        Save all warm-start snapshots that have been taken during the
+        (completed) episode into the cache_directory of the episode.
+
+        :param episode:
+            Episode, ...
+        """
+
+        # ...
+        for market_id, snapshot in self._snapshot_store.items():
+            cache = self._build_snapshot_cache(episode, market_id)
+            cache.save((episode.episode_start_buffer, snapshot["timestamp"]), snapshot)
+
+        self._snapshot_store = dict()
+
+    def _report_episode(self):
+        """
+        Append the result of the current episode to self.results, then reset 
+        agent and market environment.
+        """
+
+        # report result ---
+
+        # TODO: ...
+        result = {
+            'Orders': self.agent.market_interface.order_list.copy(),
+            'Trades': self.agent.market_interface.trade_list.copy(), # views on blotter rows
+            'Blotter': self.agent.market_interface.blotter, # no copy, blotter is replaced on reset
+            'Exposure': self.agent.market_interface.exposure.copy(),
+            'PnL_realized': self.agent.market_interface.pnl_realized.copy(),
+            'PnL_unrealized': self.agent.market_interface.pnl_unrealized.copy(),
+        }
+
+        # save report
+        self.results.append(result)
+
+        # reset agent ---
+
+        # ...
+        del self.agent
+
+        # reset market environment ---
+
+        # delete all MarketState, Order and Trade instances in the engine context
+        self.context.reset()
+
+    # option 1: run single episode ---
+
+    def run(self, 
+        identifier_list:list,
+        source_directory:str,
+        episode_start_buffer:str,
+        episode_start:str,
+        episode_end:str,
+        sampling_freq:int or str,
+        display_interval:int=10_000,
+        catalog=None,
+        chunk_size:str=None,
+        day_store=None,
+        cache_directory:str=None,
+    ):  
+        """
+        Run agent against a single backtest instance based on a specified 
+        episode. 
+
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        :param source_directory:
+            str, path to book and trade sources, e.g. "/home/jovyan/_shared_storage/read_only/efn2_backtesting"
+        :param episode_start_buffer:
+            pd.Timestamp, 
+        :param episode_start:
+            pd.Timestamp, ...
         :param episode_end:
             pd.Timestamp, ...
         :param sampling_freq:
             int or str, int for event-based subsampling, every i-th event or str for time-based subsampling, e.g.
             '1s' for last event in each second
+        :param catalog:
+            Catalog, catalog of source_directory to find paths, optional
+        :param chunk_size:
+            str, stream episode in chunks of chunk_size, e.g. '5min', see 
+            Episode, optional
+        :param day_store:
+            DayStore, load decoded sources shared with other processes, see
+            Episode, optional
+        :param cache_directory:
+            str, directory to cache prepared episodes in, see Episode, 
+            market state streams, see MarketStateStream, and warm-start 
+            snapshots, see MarketState.snapshot, optional
         """
 
         # build episode ---
 
+        # without buffer phase, start building market states at episode_start
+        if self.skip_buffer:
+            episode_start_buffer = episode_start
+
+        # load only sources that are required, with all price levels (see _agent_step)
+        identifier_list_loaded, _ = self._prune_sources(identifier_list)
+
         # try to build episode based on the specified parameters
         try:
             episode = Episode(
-                identifier_list=identifier_list,
+                identifier_list=identifier_list_loaded,
                 source_directory=source_directory,
                 episode_start_buffer=episode_start_buffer,
                 episode_start=episode_start,
                 episode_end=episode_end,
                 sampling_freq=sampling_freq,
+                catalog=catalog,
+                chunk_size=chunk_size,
+                day_store=day_store,
+                cache_directory=cache_directory,
             )
         # return if episode could not be generated
         except Exception as e:
@@ -607,39 +1530,47 @@ class Backtest:
             logging.info("(ERROR) could not run episode with the specified parameters")
             return # do nothing
 
-        # setup agent ---
+        # setup agent and market environment ---
 
-        # create fresh copy of the original agent instance
-        self.agent = copy.copy(self._agent)
+        # ...
+        self._setup_episode(identifier_list)
 
-        # setup market environment ---
-
-        # identify market instances based on market_id
-        identifier_list = set(identifier.split(".")[0] for identifier
-            in identifier_list
-        )
-        # create market_state instances
-        for market_id in identifier_list:
-            _ = MarketState(market_id)
+        # replay market states from cache_directory, or record them once
+        self._setup_streams(episode, identifier_list_loaded)
+        # restore market states from warm-start snapshots, skip buffer phase up to the snapshots
+        self._setup_snapshots(episode, identifier_list_loaded)
+        if self._restore_store and len(self._restore_store) == len(set(
+            identifier.split(".")[0] for identifier in identifier_list_loaded
+        )):
+            episode.seek(min(self._restore_store.values()))
 
         # iterate over episode ---
 
         # ...
         for step, update_store in enumerate(episode, start=1): 
             
-            # update global timestamp
+            # update clock of the engine context (and global timestamp)
+            self.context.timestamp = episode.timestamp
             self.__class__.timestamp_global = episode.timestamp
 
             # ...
             market_list = set(identifier.split(".")[0] for identifier in update_store)
             source_list = list(update_store)
 
+            # take warm-start snapshots once the buffer phase has ended
+            if self._snapshot_list and not episode.episode_buffering:
+                self._take_snapshots(episode)
+
             # step 1: update book_state -> based on original data
             # step 2: match standing orders -> based on pre-trade state
             for market_id in market_list:
+                # skip updates that precede the snapshot a market state has been restored from
+                if episode.timestamp < self._restore_store.get(market_id, episode.timestamp):
+                    continue
                 self._market_step(market_id=market_id,
                     book_update=update_store.get(f"{market_id}.BOOK"),
                     trade_update=update_store.get(f"{market_id}.TRADES", pd.Series([None] * 3)), # optional, default to empty pd.Series
+                    book_difference=episode.book_difference(f"{market_id}.BOOK"),
                 )
 
             # during the buffer phase, do not inform agent about update
@@ -658,33 +1589,108 @@ class Backtest:
             if not (step % display_interval):
                 print(self.agent)
         
-        # report result ---
+        # report result and reset ---
 
-        # TODO: ...
-        result = {
-            'Orders': self.agent.market_interface.order_list.copy(),
-            'Trades': self.agent.market_interface.trade_list.copy(),
-            'Exposure': self.agent.market_interface.exposure.copy(),
-            'PnL_realized': self.agent.market_interface.pnl_realized.copy(),
-            'PnL_unrealized': self.agent.market_interface.pnl_unrealized.copy(),
-        }
+        # ...
+        self._save_streams(episode)
+        self._save_snapshots(episode)
+        self._report_episode()
 
-        # save report
-        self.results.append(result)
+        return True  # return successful episode
 
-        # reset agent ---
+    def run_partitioned(self, 
+        identifier_list:list,
+        source_directory:str,
+        episode_start_buffer:str,
+        episode_start:str,
+        episode_end:str,
+        sampling_freq:int or str,
+        n_workers:int=2,
+        agent_factory=None,
+    ):
+        """
+        Run a market-separable agent against a single episode, with markets 
+        partitioned across a pool of n_workers processes. Each worker replays
+        only the sources of its own markets and runs its own agent instance,
+        results are merged per market once all workers have finished.
 
-        # ...
-        del self.agent
+        The agent must declare itself market-separable by setting the class
+        attribute `market_separable = True`, that is, its decisions for one 
+        market must never depend on any other market. Note that this excludes
+        the exposure_limit, which applies across all markets of a worker, and
+        that `on_time` is called only for the timestamps of the respective 
+        worker's markets.
 
-        # reset market environment ---
+        Orders and trades are merged by timestamp and renumbered, so that 
+        order_id and trade_id remain unique.
+
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        :param source_directory:
+            str, path to book and trade sources, e.g. "/home/jovyan/_shared_storage/read_only/efn2_backtesting"
+        :param episode_start_buffer:
+            pd.Timestamp, 
+        :param episode_start:
+            pd.Timestamp, ...
+        :param episode_end:
+            pd.Timestamp, ...
+        :param sampling_freq:
+            int or str, int for event-based subsampling, every i-th event or str for time-based subsampling, e.g.
+            '1s' for last event in each second
+        :param n_workers:
+            int, number of worker processes to distribute markets across, default is 2
+        :param agent_factory:
+            callable, picklable factory that returns a fresh agent instance, 
+            default is a deep copy of the agent
+        """
+
+        # Assert
+        assert self._agent.market_separable, \
+            "Agent must be market-separable (market_separable = True) to partition markets"
+
+        # partition markets ---
 
-        # delete all MarketState instances in MarketState.instances class attribute
-        MarketState.reset_instances()
-        # delete all Order instances in Order.history class attribute
-        Order.reset_history()
-        # delete all Trade instances in Trade.history class attribute
-        Trade.reset_history()
+        # identify market instances based on market_id, in order of identifier_list
+        market_id_list = list(dict.fromkeys(identifier.split(".")[0] for identifier 
+            in identifier_list
+        ))
+        # distribute markets round-robin across partitions
+        num_partitions = max(1, min(n_workers, len(market_id_list)))
+        partition_list = [[identifier for identifier in identifier_list 
+            if identifier.split(".")[0] in market_id_list[i::num_partitions]
+        ] for i in range(num_partitions)]
+
+        # run partitions in parallel ---
+
+        # default to a deep copy of the original agent instance
+        agent_factory = agent_factory or functools.partial(copy.deepcopy, self._agent)
+
+        # write pending events once, rather than once per forked worker
+        EventLog.sink.flush()
+
+        with ProcessPoolExecutor(max_workers=num_partitions, initializer=EventLog.init_worker) as executor:
+            result_list = list(executor.map(_run_episode_worker,
+                [agent_factory] * num_partitions,
+                [self._backtest_kwargs] * num_partitions,
+                [dict(
+                    identifier_list=partition,
+                    source_directory=source_directory,
+                    episode_start_buffer=episode_start_buffer,
+                    episode_start=episode_start,
+                    episode_end=episode_end,
+                    sampling_freq=sampling_freq,
+                ) for partition in partition_list],
+            ))
+
+        # episode fails if any partition could not be run
+        if not all(result_list):
+            logging.info("(ERROR) could not run episode with the specified parameters")
+            return # do nothing
+
+        # report result ---
+
+        # merge results per market
+        self.results.append(_merge_results(result_list))
 
         return True  # return successful episode
 
@@ -702,6 +1708,11 @@ class Backtest:
         num_episodes:int=10,
         sampling_freq:int or str=1,
         seed=None,
+        n_workers:int=1,
+        agent_factory=None,
+        output_directory:str=None,
+        chunk_size:str=None,
+        cache_directory:str=None,
     ):
         """
         Run agent against a series of generated episodes, that is, run a similar 
@@ -731,6 +1742,20 @@ class Backtest:
             '1s' for last event in each second
         :param seed:
             None or int, if specified seed is set for generating random numbers
+        :param n_workers:
+            int, number of worker processes to distribute episodes across, default is 1
+        :param agent_factory:
+            callable, picklable factory that returns a fresh agent instance, 
+            used only if n_workers > 1, default is a deep copy of the agent
+        :param output_directory:
+            str, directory to save the result of each episode to, episodes 
+            with a saved result are skipped (resumed), optional
+        :param chunk_size:
+            str, stream each episode in chunks of chunk_size, e.g. '5min', 
+            see Episode, optional
+        :param cache_directory:
+            str, directory to cache prepared episodes in, so that re-runs 
+            skip loading, see Episode, optional
         """
 
         # Assert
@@ -773,29 +1798,26 @@ class Backtest:
 
         # iterate over episode_start_list ---
 
-        # ...
-        episode_counter = 0
-        episode_index = 0
-
-        # take next episode until ...
-        while episode_counter < min(len(episode_start_list), num_episodes):
-            
-            # ...
-            status = self.run(
-                identifier_list=identifier_list,
-                source_directory=source_directory,
-                episode_start_buffer=episode_start_list[episode_index],
-                episode_start=episode_start_list[episode_index] + episode_buffer,
-                episode_end=episode_start_list[episode_index] + episode_buffer + episode_length,
-                sampling_freq=sampling_freq,
-            )
-
-            # in either case, update index
-            episode_index = episode_index + 1
-
-            # update counter only if episode has been successfully run
-            if status:
-                episode_counter = episode_counter + 1
+        # (episode_start_buffer, episode_start, episode_end) per episode
+        episode_list = [(
+            episode_start,
+            episode_start + episode_buffer,
+            episode_start + episode_buffer + episode_length,
+        ) for episode_start in episode_start_list]
+
+        # take next episode until num_episodes have been run successfully
+        self._run_episodes(
+            identifier_list=identifier_list,
+            source_directory=source_directory,
+            episode_list=episode_list,
+            sampling_freq=sampling_freq,
+            num_episodes=num_episodes,
+            n_workers=n_workers,
+            agent_factory=agent_factory,
+            output_directory=output_directory,
+            chunk_size=chunk_size,
+            cache_directory=cache_directory,
+        )
 
     def run_episode_broadcast(self, 
         identifier_list:list,
@@ -806,6 +1828,11 @@ class Backtest:
         time_start:str="08:10:00", 
         time_end:str="16:30:00",
         sampling_freq:int or str=1,
+        n_workers:int=1,
+        agent_factory=None,
+        output_directory:str=None,
+        chunk_size:str=None,
+        cache_directory:str=None,
     ):
         """
         Run agent against a series of broadcast episodes, that is, run the same 
@@ -830,6 +1857,20 @@ class Backtest:
         :param sampling_freq:
             int or str, int for event-based subsampling, every i-th event or str for time-based subsampling, e.g.
             '1s' for last event in each second
+        :param n_workers:
+            int, number of worker processes to distribute episodes across, default is 1
+        :param agent_factory:
+            callable, picklable factory that returns a fresh agent instance, 
+            used only if n_workers > 1, default is a deep copy of the agent
+        :param output_directory:
+            str, directory to save the result of each episode to, episodes 
+            with a saved result are skipped (resumed), optional
+        :param chunk_size:
+            str, stream each episode in chunks of chunk_size, e.g. '5min', 
+            see Episode, optional
+        :param cache_directory:
+            str, directory to cache prepared episodes in, so that re-runs 
+            skip loading, see Episode, optional
         """
 
         # pd.Timestamp
@@ -861,24 +1902,35 @@ class Backtest:
         # iterate over episode_date_list ---
 
         # for each date + broadcast time_start_buffer, time_start, and time_end ...
-        for episode_date in episode_date_list:
+        episode_list = [(
+            episode_date + time_start_buffer,
+            episode_date + time_start,
+            episode_date + time_end,
+        ) for episode_date in episode_date_list]
 
-            # ...
-            self.run(
-                identifier_list=identifier_list,
-                source_directory=source_directory,
-                episode_start_buffer=episode_date + time_start_buffer,
-                episode_start=episode_date + time_start,
-                episode_end=episode_date + time_end,
-                sampling_freq=sampling_freq,
-            )
+        # ...
+        self._run_episodes(
+            identifier_list=identifier_list,
+            source_directory=source_directory,
+            episode_list=episode_list,
+            sampling_freq=sampling_freq,
+            n_workers=n_workers,
+            agent_factory=agent_factory,
+            output_directory=output_directory,
+            chunk_size=chunk_size,
+            cache_directory=cache_directory,
+        )
 
     def run_episode_list(self, 
         identifier_list:list,
         source_directory:str,
         episode_list:list,
         sampling_freq:int or str = 1,
-
+        n_workers:int=1,
+        agent_factory=None,
+        output_directory:str=None,
+        chunk_size:str=None,
+        cache_directory:str=None,
     ):
         """
         Run agent against a series of specified episodes, that is, work through 
@@ -893,19 +1945,546 @@ class Backtest:
         :param sampling_freq:
             int or str, int for event-based subsampling, every i-th event or str for time-based subsampling, e.g.
             '1s' for last event in each second
+        :param n_workers:
+            int, number of worker processes to distribute episodes across, default is 1
+        :param agent_factory:
+            callable, picklable factory that returns a fresh agent instance, 
+            used only if n_workers > 1, default is a deep copy of the agent
+        :param output_directory:
+            str, directory to save the result of each episode to, episodes 
+            with a saved result are skipped (resumed), optional
+        :param chunk_size:
+            str, stream each episode in chunks of chunk_size, e.g. '5min', 
+            see Episode, optional
+        :param cache_directory:
+            str, directory to cache prepared episodes in, so that re-runs 
+            skip loading, see Episode, optional
+        """
+
+        # iterate over episode_list ---
+
+        # for each episode ...
+        episode_list = [tuple(map(pd.Timestamp, episode)) for episode in episode_list]
+
+        # ...
+        self._run_episodes(
+            identifier_list=identifier_list,
+            source_directory=source_directory,
+            episode_list=episode_list,
+            sampling_freq=sampling_freq,
+            n_workers=n_workers,
+            agent_factory=agent_factory,
+            output_directory=output_directory,
+            chunk_size=chunk_size,
+            cache_directory=cache_directory,
+        )
+
+    # option 3: run parameter sweep ---
+
+    @classmethod
+    def run_sweep(class_reference,
+        agent_factory,
+        param_grid:dict or list,
+        identifier_list:list,
+        source_directory:str,
+        episode_list:list,
+        sampling_freq:int or str=1,
+        tick_size:float or dict=None,
+    ):
+        """
+        Run multiple agent instances, one per parameter set in param_grid, 
+        against a series of specified episodes, replaying each episode only 
+        once. 
+
+        As orders submitted by the agent do NOT have market impact, post-trade 
+        state and pre-trade state are identical for all agent instances. Hence,
+        a single shared market state is updated per market and step, while 
+        each agent instance runs in a separate backtest with its own engine 
+        context, that is separate simulated orders, matching and trades (see 
+        `MarketState.update_from`).
+
+        Results are identical to running each agent instance on its own, e.g.
+        using `Backtest(agent_factory(**params)).run_episode_list(...)`.
+
+        :param agent_factory:
+            callable, returns a fresh agent instance given keyword arguments
+        :param param_grid:
+            dict or list, either {<param>: [<value>, *], *} to evaluate the 
+            cartesian product of all values, or [{<param>: <value>, *}, *]
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        :param source_directory:
+            str, path to book and trade sources, e.g. "/home/jovyan/_shared_storage/read_only/efn2_backtesting"
+        :param episode_list:
+            list, includes (episode_start_buffer, episode_start, episode_end) tuples
+        :param sampling_freq:
+            int or str, int for event-based subsampling, every i-th event or str for time-based subsampling, e.g.
+            '1s' for last event in each second
+        :param tick_size:
+            float or dict, see Backtest
+        :return backtest_list:
+            list, one Backtest per parameter set (in order of param_grid), 
+            parameters are available as `params`, results as `results`
         """
 
+        # one backtest per parameter set, each with its own engine context
+        backtest_list = []
+        for params in _expand_param_grid(param_grid):
+            backtest = class_reference(agent=agent_factory(**params), tick_size=tick_size)
+            backtest.params = params
+            backtest_list.append(backtest)
+
+        # shared market replay, its context does not include any orders
+        replay = class_reference(agent=None, tick_size=tick_size)
+
+        # load sources required by any agent instance, with all price levels,
+        # each backtest informs its agent according to its own book_depth
+        prune_list = [backtest._prune_sources(identifier_list) for backtest in backtest_list]
+        identifier_list_loaded = [identifier for identifier in identifier_list
+            if any(identifier in loaded for loaded, _ in prune_list)
+        ]
+
         # iterate over episode_list ---
 
         # for each episode ...
         for episode_start_buffer, episode_start, episode_end in episode_list:
 
+            # try to build episode based on the specified parameters
+            try:
+                episode = Episode(
+                    identifier_list=identifier_list_loaded,
+                    source_directory=source_directory,
+                    episode_start_buffer=pd.Timestamp(episode_start_buffer),
+                    episode_start=pd.Timestamp(episode_start),
+                    episode_end=pd.Timestamp(episode_end),
+                    sampling_freq=sampling_freq,
+                )
+            # skip if episode could not be generated
+            except Exception as e:
+                print(e)
+                logging.info("(ERROR) could not run episode with the specified parameters")
+                continue
+
+            # setup agents and market environment (shared and per backtest)
+            replay._setup_markets(identifier_list)
+            for backtest in backtest_list:
+                backtest._setup_episode(identifier_list)
+
+            # iterate over episode ---
+
             # ...
-            self.run(
-                identifier_list=identifier_list,
-                source_directory=source_directory,
-                episode_start_buffer=pd.Timestamp(episode_start_buffer), 
-                episode_start=pd.Timestamp(episode_start), 
-                episode_end=pd.Timestamp(episode_end),
-                sampling_freq=sampling_freq,
+            for step, update_store in enumerate(episode, start=1):
+
+                # update clock of the shared context (and global timestamp)
+                replay.context.timestamp = episode.timestamp
+                class_reference.timestamp_global = episode.timestamp
+
+                # ...
+                market_list = set(identifier.split(".")[0] for identifier in update_store)
+                source_list = list(update_store)
+
+                # step 1: update shared book_state once -> based on original data
+                is_updated = {market_id: replay.context.markets[market_id].update(
+                    book_update=update_store.get(f"{market_id}.BOOK"),
+                    trade_update=update_store.get(f"{market_id}.TRADES", pd.Series([None] * 3)), # optional, default to empty pd.Series
+                    book_difference=episode.book_difference(f"{market_id}.BOOK"),
+                ) for market_id in market_list}
+
+                for backtest in backtest_list:
+
+                    # update clock of the engine context
+                    backtest.context.timestamp = episode.timestamp
+
+                    # step 2: match standing orders -> based on shared pre-trade state
+                    for market_id in market_list:
+                        market_state = backtest.context.markets[market_id]
+                        if is_updated[market_id]:
+                            market_state.update_from(replay.context.markets[market_id])
+                        market_state.match()
+
+                    # during the buffer phase, do not inform agent about update
+                    if episode.episode_buffering:
+                        continue
+
+                    # step 3: inform agent -> based on original data
+                    for source_id in source_list: 
+                        backtest._agent_step(source_id=source_id, 
+                            either_update=update_store.get(source_id),
+                            timestamp=episode.timestamp,
+                            timestamp_next=episode.timestamp_next,
+                        )
+
+            # report result and reset ---
+
+            # ...
+            for backtest in backtest_list:
+                backtest._report_episode()
+            replay.context.reset()
+
+        return backtest_list
+
+    # helper methods ---
+
+    def _run_or_resume(self, checkpoint, **run_kwargs):
+        """
+        Run agent against a single episode (see Backtest.run), unless the 
+        result of this episode has already been saved to checkpoint, in which
+        case the saved result is appended to self.results. 
+
+        :param checkpoint:
+            Checkpoint, store of per-episode results, None to run without
+        :param run_kwargs:
+            dict, keyword arguments passed on to Backtest.run
+        :return status:
+            bool, True if episode has been run successfully, None otherwise
+        """
+
+        # ...
+        if not checkpoint:
+            return self.run(**run_kwargs)
+
+        episode = (
+            run_kwargs["episode_start_buffer"], 
+            run_kwargs["episode_start"], 
+            run_kwargs["episode_end"],
+        )
+
+        # lock episode so that it is not run by another process at the same time
+        with checkpoint.lock(episode):
+
+            # resume: use saved result (only successful episodes are saved)
+            is_found, result = checkpoint.load(episode)
+            if is_found and result:
+                logging.info("(INFO) episode result has been loaded from {path}".format(
+                    path=checkpoint.path(episode),
+                ))
+                self.results.append(result)
+                return True
+
+            # otherwise, run episode and save result, failed episodes are run again next time
+            status = self.run(**run_kwargs)
+            if status:
+                checkpoint.save(episode, self.results[-1])
+
+        return status
+
+    def _run_episodes(self, 
+        identifier_list:list,
+        source_directory:str,
+        episode_list:list,
+        sampling_freq:int or str,
+        num_episodes:int=None,
+        n_workers:int=1,
+        agent_factory=None,
+        output_directory:str=None,
+        chunk_size:str=None,
+        cache_directory:str=None,
+    ):
+        """
+        Run agent against a series of episodes, either serially in this process
+        or distributed across a pool of n_workers processes. In either case, 
+        results are appended to self.results in the order of episode_list.
+
+        Note that each worker process runs one episode at a time, using its own
+        backtest (and thus engine context) and a fresh agent instance returned
+        by agent_factory. Events are written to the EventLog.sink of the 
+        respective worker process.
+
+        If output_directory is specified, the result of each episode is saved
+        to disk as soon as the episode has been completed, and episodes whose
+        result has already been saved with the same configuration are loaded
+        instead of being run again (see Checkpoint). 
+
+        Episodes are validated against the catalog of source_directory only as
+        they are taken, invalid episodes are skipped without loading any data,
+        see _iter_valid_episodes.
+
+        :param episode_list:
+            list, includes (episode_start_buffer, episode_start, episode_end) tuples
+        :param num_episodes:
+            int, stop after num_episodes successful episodes, optional
+        :param n_workers:
+            int, number of worker processes, default is 1
+        :param agent_factory:
+            callable, picklable factory that returns a fresh agent instance
+        :param output_directory:
+            str, directory to save the result of each episode to, optional
+        :param chunk_size:
+            str, stream each episode in chunks of chunk_size, optional
+        :param cache_directory:
+            str, directory to cache prepared episodes in, optional
+        :return status_list:
+            list, True if episode has been run successfully, None otherwise
+        """
+
+        # run all episodes if num_episodes is not specified
+        num_episodes = len(episode_list) if num_episodes is None else num_episodes
+
+        # parameters that are identical for all episodes
+        run_kwargs = dict(
+            identifier_list=identifier_list,
+            source_directory=source_directory,
+            sampling_freq=sampling_freq,
+        )
+
+        # results depend on agent (class and parameters), sources, sampling and tick size
+        config = dict(run_kwargs, 
+            source_directory=None, # results do not depend on location of sources
+            agent=describe_agent(agent_factory() if agent_factory else self._agent),
+            tick_size=self.tick_size,
+        )
+        # ... and on pruned sources, if any (configuration is unchanged otherwise)
+        identifier_list_loaded, book_depth = self._prune_sources(identifier_list)
+        if identifier_list_loaded != identifier_list or book_depth:
+            config.update(identifier_list=identifier_list_loaded, book_depth=book_depth)
+        # ... and on whether the buffer phase is skipped, if so
+        if self.skip_buffer:
+            config.update(skip_buffer=True)
+        checkpoint = Checkpoint(output_directory, config=config) if output_directory else None
+
+        # plan episodes ---
+
+        # reject invalid episodes before their data is loaded, so that num_episodes
+        # is filled from valid episodes only, episodes are validated lazily (one at
+        # a time, as they are taken) so that no more files are read than required
+        catalog = Catalog(source_directory, cache_path=cache_directory and 
+            os.path.join(cache_directory, "catalog.json"), # persist timestamps along with prepared episodes
+        )
+        episode_iterator = self._iter_valid_episodes(catalog, identifier_list, episode_list)
+
+        # share catalog with all episodes (not part of the checkpoint configuration)
+        run_kwargs["catalog"] = catalog
+        # results do not depend on chunk_size and cache_directory (not part of the checkpoint configuration)
+        run_kwargs["chunk_size"] = chunk_size
+        run_kwargs["cache_directory"] = cache_directory
+
+        try:
+            status_list = self._run_valid_episodes(episode_iterator, run_kwargs, 
+                num_episodes=num_episodes, 
+                n_workers=n_workers, 
+                agent_factory=agent_factory, 
+                checkpoint=checkpoint,
             )
+        # persist timestamps read so far, also if the run has been interrupted
+        finally:
+            catalog.save()
+
+        return status_list
+
+    def _iter_valid_episodes(self, catalog, identifier_list, episode_list):
+        """
+        Iterate over all episodes that are valid based on catalog, that is,
+        reject episodes with missing files or whose window lies outside the
+        timestamps of the BOOK files (see Catalog.is_valid). Each episode is
+        validated only once it is taken from the iterator.
+
+        :param catalog:
+            Catalog, catalog of source_directory
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        :param episode_list:
+            list, includes (episode_start_buffer, episode_start, episode_end) tuples
+        :return episode_iterator:
+            iterator, valid (episode_start_buffer, episode_start, episode_end) tuples
+        """
+
+        for episode_start_buffer, episode_start, episode_end in episode_list:
+
+            # data is loaded from episode_start if the buffer phase is skipped
+            if catalog.is_valid(identifier_list, episode_start if self.skip_buffer else episode_start_buffer, episode_end):
+                yield episode_start_buffer, episode_start, episode_end
+            else:
+                logging.info("(INFO) episode ({episode_start_buffer}, {episode_start}, {episode_end}) has been rejected based on catalog".format(
+                    episode_start_buffer=episode_start_buffer,
+                    episode_start=episode_start,
+                    episode_end=episode_end,
+                ))
+
+    def _run_valid_episodes(self, episode_iterator, run_kwargs, num_episodes, n_workers=1, agent_factory=None, checkpoint=None):
+        """
+        Run episodes taken from episode_iterator until num_episodes episodes
+        have been run successfully, see _run_episodes.
+
+        :param episode_iterator:
+            iterator, (episode_start_buffer, episode_start, episode_end) tuples
+        :param run_kwargs:
+            dict, keyword arguments passed on to Backtest.run (except episode)
+        :param num_episodes:
+            int, stop after num_episodes successful episodes
+        :param n_workers:
+            int, number of worker processes, default is 1
+        :param agent_factory:
+            callable, picklable factory that returns a fresh agent instance
+        :param checkpoint:
+            Checkpoint, store of per-episode results, optional
+        :return status_list:
+            list, True if episode has been run successfully, None otherwise
+        """
+
+        status_list = []
+        episode_counter = 0
+
+        # option 1: run episodes serially ---
+
+        if n_workers <= 1:
+
+            # take next episode until num_episodes have been run successfully
+            while episode_counter < num_episodes:
+
+                # ...
+                episode = next(episode_iterator, None)
+                if episode is None:
+                    break
+
+                # ...
+                episode_start_buffer, episode_start, episode_end = episode
+                status = self._run_or_resume(checkpoint,
+                    episode_start_buffer=episode_start_buffer,
+                    episode_start=episode_start,
+                    episode_end=episode_end,
+                    **run_kwargs,
+                )
+                status_list.append(status)
+
+                # update counter only if episode has been successfully run
+                if status:
+                    episode_counter = episode_counter + 1
+
+            return status_list
+
+        # option 2: run episodes in parallel ---
+
+        # default to a deep copy of the original agent instance
+        agent_factory = agent_factory or functools.partial(copy.deepcopy, self._agent)
+
+        # write pending events once, rather than once per forked worker
+        EventLog.sink.flush()
+
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=EventLog.init_worker) as executor:
+
+            # submit exactly as many episodes as are still missing (in waves), so
+            # that the same episodes are run as in the serial case
+            while episode_counter < num_episodes:
+
+                # ...
+                wave = list(itertools.islice(episode_iterator, num_episodes - episode_counter))
+                if not wave:
+                    break
+
+                # executor.map preserves the order of episodes
+                result_list = executor.map(_run_episode_worker,
+                    [agent_factory] * len(wave),
+                    [self._backtest_kwargs] * len(wave),
+                    [dict(run_kwargs, 
+                        episode_start_buffer=episode_start_buffer,
+                        episode_start=episode_start,
+                        episode_end=episode_end,
+                    ) for episode_start_buffer, episode_start, episode_end in wave],
+                    [checkpoint] * len(wave),
+                )
+
+                # merge results back in deterministic episode order
+                for result in result_list:
+                    status_list.append(result and True)
+
+                    # update counter only if episode has been successfully run
+                    if result:
+                        self.results.append(result)
+                        episode_counter = episode_counter + 1
+
+        return status_list
+
+
+def _run_episode_worker(agent_factory, backtest_kwargs, run_kwargs, checkpoint=None):
+    """
+    Run a single episode in a worker process, using a fresh agent instance
+    and a separate backtest instance. 
+
+    :param agent_factory:
+        callable, picklable factory that returns a fresh agent instance
+    :param backtest_kwargs:
+        dict, keyword arguments passed on to Backtest, e.g. tick_size
+    :param run_kwargs:
+        dict, keyword arguments passed on to Backtest.run
+    :param checkpoint:
+        Checkpoint, store of per-episode results, optional
+    :return result:
+        dict, result of the episode, None if episode could not be run
+    """
+
+    # ...
+    backtest = Backtest(agent=agent_factory(), **backtest_kwargs)
+    status = backtest._run_or_resume(checkpoint, **run_kwargs)
+
+    # write remaining events before result is returned to the main process
+    EventLog.sink.flush()
+
+    return backtest.results[0] if status else None
+
+
+def _expand_param_grid(param_grid):
+    """
+    Expand param_grid into a list of parameter sets. 
+
+    :param param_grid:
+        dict or list, either {<param>: [<value>, *], *} to expand into the 
+        cartesian product of all values, or [{<param>: <value>, *}, *]
+    :return params_list:
+        list, [{<param>: <value>, *}, *]
+    """
+
+    # list of parameter sets is used as is
+    if not isinstance(param_grid, dict):
+        return [dict(params) for params in param_grid]
+
+    # ...
+    return [dict(zip(param_grid, values)) 
+        for values in itertools.product(*param_grid.values())
+    ]
+
+
+def _merge_results(result_list):
+    """
+    Merge the results of multiple partitions (disjoint markets) of the same 
+    episode into a single result. Orders and trades are ordered by timestamp
+    and renumbered, per-market metrics are combined.
+
+    :param result_list:
+        list, [<result>, *], see Backtest.results
+    :return result:
+        dict, merged result
+    """
+
+    # merge orders and trades by timestamp (stable, in order of result_list)
+    order_list = sorted((order for result in result_list 
+        for order in result["Orders"]), key=lambda order: order.timestamp
+    )
+    trade_list = sorted((trade for result in result_list 
+        for trade in result["Trades"]), key=lambda trade: trade.timestamp
+    )
+
+    # merge blotters by timestamp (stable, in order of result_list), that is, in
+    # the same order as trade_list
+    blotter = Blotter.concat([result["Blotter"] for result in result_list])
+
+    # renumber so that order_id and trade_id are unique across partitions, 
+    # trades are views on their row of the merged blotter
+    for order_id, order in enumerate(order_list):
+        order.order_id = order_id
+    for trade_id, trade in enumerate(trade_list):
+        trade.blotter, trade.trade_id = blotter, trade_id
+
+    # ...
+    result = {
+        'Orders': order_list,
+        'Trades': trade_list,
+        'Blotter': blotter,
+    }
+
+    # per-market metrics, markets are disjoint across partitions
+    for key in ['Exposure', 'PnL_realized', 'PnL_unrealized']:
+        result[key] = {market_id: value for partition_result in result_list
+            for market_id, value in partition_result[key].items()
+        }
+
+    return result
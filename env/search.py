@@ -0,0 +1,335 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# use relative imports for other modules
+from env.daystore import DayStore
+from env.replay import Backtest, _expand_param_grid, _run_episode_worker
+
+# specific imports
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# general imports
+import contextlib
+import functools
+import math
+import pandas as pd
+import random
+
+
+def total_pnl(result):
+    """
+    Default search metric, that is the sum of realized and unrealized pnl
+    across all markets in the result of a single episode.
+
+    :param result:
+        dict, result of a single episode, see Backtest.results
+    :return score:
+        float, total pnl
+    """
+
+    return sum(result["PnL_realized"].values()) + sum(result["PnL_unrealized"].values())
+
+
+class ParameterSearch:
+
+    def __init__(self,
+        agent_factory,
+        param_space:dict or list,
+        identifier_list:list,
+        source_directory:str,
+        episode_list:list,
+        sampling_freq:int or str=1,
+        tick_size:float or dict=None,
+        metric=total_pnl,
+        n_iter:int=None,
+        seed:int=None,
+        halving_eta:int=None,
+        halving_min_episodes:int=1,
+        n_workers:int=1,
+        share_data:bool=False,
+    ):
+        """
+        Search driver that evaluates an agent for multiple parameter sets,
+        either exhaustively (grid search) or for n_iter randomly sampled
+        parameter sets (random search).
+
+        Each work unit is a (parameter set, episode) pair. Work units are
+        either run in this process, where all parameter sets share a single
+        replay per episode (see `Backtest.run_sweep`), or distributed across
+        a pool of n_workers processes. Use `run()` to iterate over the results
+        of all work units as soon as they are available.
+
+        If halving_eta is specified, successive halving is applied. In the
+        first round, all parameter sets run on halving_min_episodes episodes.
+        After each round, only the best 1/halving_eta parameter sets (by mean
+        score) survive, and the number of episodes is multiplied by
+        halving_eta for the next round, until episode_list is exhausted.
+
+        :param agent_factory:
+            callable, returns a fresh agent instance given keyword arguments,
+            must be picklable if n_workers > 1
+        :param param_space:
+            dict or list, either {<param>: [<value>, *], *} or a list of
+            parameter sets [{<param>: <value>, *}, *], in random search,
+            values may also be callables that take a random.Random instance
+            and return a value, e.g. lambda rng: rng.uniform(0.001, 0.005)
+        :param identifier_list:
+            list, <market_id>.BOOK/TRADES identifier for each respective data source
+        :param source_directory:
+            str, path to book and trade sources, e.g. "/home/jovyan/_shared_storage/read_only/efn2_backtesting"
+        :param episode_list:
+            list, includes (episode_start_buffer, episode_start, episode_end) tuples
+        :param sampling_freq:
+            int or str, int for event-based subsampling, every i-th event or str for time-based subsampling, e.g.
+            '1s' for last event in each second
+        :param tick_size:
+            float or dict, see Backtest
+        :param metric:
+            callable, returns a score (higher is better) given the result of
+            a single episode, default is total_pnl
+        :param n_iter:
+            int, number of randomly sampled parameter sets, if not specified
+            all parameter sets are evaluated (grid search)
+        :param seed:
+            None or int, if specified seed is set for random search
+        :param halving_eta:
+            int, reduction factor for successive halving, optional
+        :param halving_min_episodes:
+            int, number of episodes in the first round of successive halving,
+            default is 1
+        :param n_workers:
+            int, number of worker processes, default is 1
+        :param share_data:
+            bool, if True, worker processes share decoded sources via a
+            DayStore (in /dev/shm) rather than each parsing and holding a
+            private copy, default is False
+        """
+
+        # static attributes from arguments
+        self.agent_factory = agent_factory
+        self.identifier_list = identifier_list
+        self.source_directory = source_directory
+        self.episode_list = [tuple(map(pd.Timestamp, episode)) for episode in episode_list]
+        self.sampling_freq = sampling_freq
+        self.tick_size = tick_size
+        self.metric = metric
+        self.halving_eta = halving_eta
+        self.halving_min_episodes = halving_min_episodes
+        self.n_workers = n_workers
+        self.share_data = share_data
+
+        # parameter sets, either the full grid or n_iter random samples
+        if n_iter is None:
+            self.params_list = _expand_param_grid(param_space)
+        else:
+            self.params_list = self._sample_param_space(param_space, n_iter, seed)
+
+        # scores per parameter set, [[<score>, *], *] in order of params_list
+        self.scores = [[] for _ in self.params_list]
+
+    # properties ---
+
+    @property
+    def mean_scores(self):
+        """
+        Mean score per parameter set, None if no episode has been run
+        successfully.
+        """
+
+        return [sum(scores) / len(scores) if scores else None
+            for scores in self.scores
+        ]
+
+    @property
+    def best_params(self):
+        """
+        Parameter set with the highest mean score among the parameter sets 
+        that have been run on the most episodes (i.e. survived successive 
+        halving), None if no episode has been run successfully.
+        """
+
+        # consider only parameter sets with the maximum number of scores
+        num_scores = max(len(scores) for scores in self.scores) if self.scores else 0
+        candidates = [(score, i) for i, score in enumerate(self.mean_scores)
+            if score is not None and len(self.scores[i]) == num_scores
+        ]
+        if not candidates:
+            return None
+
+        # ties are broken by order of params_list
+        _, i = max(candidates, key=lambda x: (x[0], -x[1]))
+
+        return self.params_list[i]
+
+    # run ---
+
+    def run(self):
+        """
+        Run search and iterate over the results of all work units in order
+        of completion. Each item is a dictionary ...
+
+        - `Params`: dict, parameter set
+        - `Episode`: tuple, (episode_start_buffer, episode_start, episode_end)
+        - `Round`: int, round of successive halving (0 without halving)
+        - `Score`: float, score of the episode, None if episode failed
+        - `Result`: dict, result of the episode, see Backtest.results
+
+        Use `best_params` once all work units have been completed.
+        """
+
+        # indices into params_list that are still evaluated
+        survivor_list = list(range(len(self.params_list)))
+
+        for round_index, episode_list in enumerate(self._round_episodes()):
+
+            # run all work units of this round
+            yield from self._run_units(round_index, survivor_list, episode_list)
+
+            # without halving, all parameter sets survive
+            if not self.halving_eta:
+                continue
+
+            # keep the best 1/eta parameter sets, at least one
+            num_survivors = max(1, math.ceil(len(survivor_list) / self.halving_eta))
+            mean_scores = self.mean_scores
+            survivor_list = sorted(survivor_list, key=lambda i: (
+                mean_scores[i] is None, # failed parameter sets come last
+                -(mean_scores[i] or 0), # then by mean score DESCENDING
+                i, # ties are broken by order of params_list
+            ))[:num_survivors]
+            survivor_list = sorted(survivor_list)
+
+    def _round_episodes(self):
+        """
+        Split episode_list into rounds, a single round if successive halving
+        is not applied.
+
+        :return round_list:
+            list, [[<episode>, *], *] with additional episodes per round
+        """
+
+        # without halving, run all episodes at once
+        if not self.halving_eta:
+            return [self.episode_list]
+
+        round_list = []
+        start = 0
+        budget = self.halving_min_episodes
+
+        # run an increasing number of episodes per round, until exhausted
+        while start < len(self.episode_list):
+            round_list.append(self.episode_list[start:budget])
+            start = budget
+            budget = budget * self.halving_eta
+
+        return round_list
+
+    def _run_units(self, round_index, survivor_list, episode_list):
+        """
+        Run all (parameter set, episode) work units of a single round, either
+        serially in this process or distributed across a pool of n_workers
+        processes, and record the respective score.
+
+        :param round_index:
+            int, round of successive halving
+        :param survivor_list:
+            list, indices into params_list that are evaluated
+        :param episode_list:
+            list, includes (episode_start_buffer, episode_start, episode_end) tuples
+        """
+
+        # serial: all parameter sets share a single replay per episode
+        if self.n_workers <= 1:
+
+            for episode in episode_list:
+                backtest_list = Backtest.run_sweep(
+                    agent_factory=self.agent_factory,
+                    param_grid=[self.params_list[i] for i in survivor_list],
+                    identifier_list=self.identifier_list,
+                    source_directory=self.source_directory,
+                    episode_list=[episode],
+                    sampling_freq=self.sampling_freq,
+                    tick_size=self.tick_size,
+                )
+                for i, backtest in zip(survivor_list, backtest_list):
+                    result = backtest.results[0] if backtest.results else None
+                    yield self._record(round_index, i, episode, result)
+
+        # parallel: distribute work units across the process pool
+        else:
+
+            # decoded sources are shared across workers, store is removed once all workers are done
+            with (DayStore() if self.share_data else contextlib.nullcontext()) as day_store, \
+                ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+
+                future_dict = {executor.submit(_run_episode_worker,
+                    functools.partial(self.agent_factory, **self.params_list[i]),
+                    dict(tick_size=self.tick_size),
+                    dict(
+                        identifier_list=self.identifier_list,
+                        source_directory=self.source_directory,
+                        sampling_freq=self.sampling_freq,
+                        episode_start_buffer=episode[0],
+                        episode_start=episode[1],
+                        episode_end=episode[2],
+                        day_store=day_store,
+                    ),
+                ): (i, episode) for episode in episode_list for i in survivor_list}
+
+                # stream results in order of completion
+                for future in as_completed(future_dict):
+                    i, episode = future_dict[future]
+                    yield self._record(round_index, i, episode, future.result())
+
+    def _record(self, round_index, i, episode, result):
+        """
+        Score the result of a single work unit and add score to self.scores.
+
+        :return unit:
+            dict, see run()
+        """
+
+        # failed episodes are not scored
+        score = self.metric(result) if result else None
+        if score is not None:
+            self.scores[i].append(score)
+
+        unit = {
+            'Params': self.params_list[i],
+            'Episode': episode,
+            'Round': round_index,
+            'Score': score,
+            'Result': result,
+        }
+
+        return unit
+
+    # helper methods ---
+
+    @staticmethod
+    def _sample_param_space(param_space, n_iter, seed=None):
+        """
+        Sample n_iter parameter sets from param_space. Lists are sampled
+        uniformly, callables are called with a random.Random instance.
+
+        :param param_space:
+            dict or list, see ParameterSearch
+        :param n_iter:
+            int, number of parameter sets
+        :param seed:
+            None or int, if specified seed is set for generating random numbers
+        :return params_list:
+            list, [{<param>: <value>, *}, *]
+        """
+
+        rng = random.Random(seed)
+
+        # list of parameter sets is sampled without replacement
+        if not isinstance(param_space, dict):
+            params_list = list(param_space)
+            return [dict(params) for params in rng.sample(params_list, min(n_iter, len(params_list)))]
+
+        # ...
+        return [{param: value(rng) if callable(value) else rng.choice(value)
+            for param, value in param_space.items()
+        } for _ in range(n_iter)]
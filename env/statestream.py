@@ -0,0 +1,297 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# use relative imports for other modules
+from env.book import PriceLevels
+
+# general imports
+import numpy as np
+import pandas as pd
+
+# kinds of level records
+POSTTRADE_SET = 0
+POSTTRADE_DELETE = 1
+PRETRADE_BID_SET = 2
+PRETRADE_ASK_SET = 3
+
+
+class MarketStateStream:
+
+    def __init__(self, array_store=None):
+        """
+        Sequence of market state updates for a single market and episode. As
+        orders submitted by the agent do NOT have market impact, post-trade
+        state and pre-trade state depend on historical data only, so that
+        `MarketState.update` needs to run only once per market and episode.
+
+        A stream is either recorded, that is, `record(market_state,
+        is_updated)` is called after each update, or replayed, that is,
+        `apply(market_state)` is called instead of each update, in the same
+        order. The stream is stored as a few flat arrays (see `to_arrays()`)
+        ...
+
+        - per update: timestamp, midpoints, top of book, inferred tick size
+        - per changed price level: kind, price and liquidity_list (post-trade
+        levels that have been set or deleted, pre-trade levels that differ
+        from the post-trade state)
+        - per liquidity_list entry: timestamp and quantity
+
+        Liquidity lists that remain unchanged are shared between post-trade
+        state and pre-trade state, exactly as with `MarketState.update`.
+
+        :param array_store:
+            dict, arrays as returned by `to_arrays()`, empty stream to record
+            if not specified
+        """
+
+        # replay existing stream
+        if array_store is not None:
+            self._array_store = array_store
+            self._step = 0
+            self._record_index = 0
+            self._timestamp_store = dict() # timestamps are reused rather than re-created
+
+        # record new stream
+        else:
+            self._array_store = None
+            self._update_list = []
+            self._record_list = []
+            self._queue_list = []
+            self._levels_last = dict()
+
+    @property
+    def is_recorded(self):
+        """
+        Whether the stream has been recorded and can be replayed.
+        """
+
+        return self._array_store is not None
+
+    @property
+    def num_updates(self):
+        """
+        Number of updates that have been recorded or replayed so far.
+        """
+
+        return self._step if self.is_recorded else len(self._update_list)
+
+    # record ---
+
+    def record(self, market_state, is_updated):
+        """
+        Record a single update of the market state.
+
+        :param market_state:
+            MarketState, market state that has just been updated
+        :param is_updated:
+            bool, return value of `MarketState.update`
+        """
+
+        # skipped update (corrupted book update), nothing has changed
+        if not is_updated:
+            self._update_list.append((0, False, 0, 0, np.nan, np.nan, 0, 0, False))
+            return
+
+        # ...
+        levels = market_state._posttrade_state._levels
+        num_records = len(self._record_list)
+
+        # post-trade levels that have been set (new liquidity_list) or deleted
+        for price, liquidity_list in levels.items():
+            if self._levels_last.get(price) is not liquidity_list:
+                self._add_record(POSTTRADE_SET, price, liquidity_list)
+        for price in self._levels_last:
+            if price not in levels:
+                self._add_record(POSTTRADE_DELETE, price, [])
+        self._levels_last = dict(levels)
+
+        # pre-trade levels that differ from post-trade state (only after trades)
+        for kind, pretrade_state, posttrade_state in [
+            (PRETRADE_BID_SET, market_state._pretrade_state_bid, market_state._posttrade_state_bid),
+            (PRETRADE_ASK_SET, market_state._pretrade_state_ask, market_state._posttrade_state_ask),
+        ]:
+            for price, liquidity_list in pretrade_state.items():
+                if posttrade_state.get(price) is not liquidity_list:
+                    self._add_record(kind, price, liquidity_list)
+
+        # ...
+        self._update_list.append((
+            market_state._timestamp.value, True,
+            market_state._midpoint_last, market_state._midpoint_this,
+            np.nan if market_state._best_bid is None else market_state._best_bid,
+            np.nan if market_state._best_ask is None else market_state._best_ask,
+            market_state._tick_units, market_state._tick_units_count,
+            len(self._record_list) > num_records,
+        ))
+
+    def _add_record(self, kind, price, liquidity_list):
+        """
+        Add a single level record, liquidity_list is appended to the queue.
+        """
+
+        self._record_list.append((len(self._update_list), kind, price,
+            len(self._queue_list), len(self._queue_list) + len(liquidity_list),
+        ))
+        self._queue_list.extend((timestamp.value, quantity)
+            for timestamp, quantity in liquidity_list
+        )
+
+    def to_arrays(self):
+        """
+        Convert recorded stream into flat arrays.
+
+        :return array_store:
+            dict, {<name>: <np.ndarray>, *}
+        """
+
+        # per update
+        update_array = np.array(self._update_list, dtype=[
+            ("timestamp", np.int64), ("is_updated", bool),
+            ("midpoint_last", np.float64), ("midpoint_this", np.float64),
+            ("best_bid", np.float64), ("best_ask", np.float64),
+            ("tick_units", np.int64), ("tick_units_count", np.int64),
+            ("has_records", bool),
+        ])
+        # per changed price level
+        record_array = np.array(self._record_list, dtype=[
+            ("step", np.int64), ("kind", np.int8), ("price", np.float64),
+            ("start", np.int64), ("stop", np.int64),
+        ])
+        # per liquidity_list entry
+        queue_array = np.array(self._queue_list, dtype=[
+            ("timestamp", np.int64), ("quantity", np.float64),
+        ])
+
+        return {'updates': update_array, 'records': record_array, 'queue': queue_array}
+
+    # replay ---
+
+    def apply(self, market_state, book_update, trade_update):
+        """
+        Apply the next update to the market state, equivalent to
+        `MarketState.update(...)` with the original book and trade update.
+        The book and trade update are only kept as the last update, so that
+        the market state can be continued with `MarketState.update` (e.g.
+        once restored from a snapshot, see `MarketState.snapshot`).
+
+        :param market_state:
+            MarketState, market state to update
+        :param book_update:
+            pd.Series, book data of this update
+        :param trade_update:
+            pd.Series, trade data of this update
+        :return is_updated:
+            bool, False if update was skipped (corrupted book update)
+        """
+
+        # ...
+        update = self._array_store["updates"][self._step]
+        step = self._step
+        self._step = step + 1
+
+        # skipped update (corrupted book update), nothing has changed
+        if not update["is_updated"]:
+            return False
+
+        # in tick mode, prices are integer tick counts
+        to_price = int if market_state.tick_mode else float
+
+        # keep last book update and trade update, as with `MarketState.update`
+        _, book_update, trade_update = market_state._unpack_update(book_update, trade_update)
+        market_state._book_last = getattr(market_state, "_book_this", dict())
+        market_state._book_this = dict(zip(book_update[0::2], book_update[1::2]))
+        market_state._trade_this = trade_update
+
+        # set variables required to determine current state
+        market_state._timestamp = self._to_timestamp(update["timestamp"])
+        market_state._midpoint_last = float(update["midpoint_last"])
+        market_state._midpoint_this = float(update["midpoint_this"])
+        market_state._tick_units = int(update["tick_units"])
+        market_state._tick_units_count = int(update["tick_units_count"])
+
+        # if variable does not exist, set empty price levels for post-trade state
+        if not hasattr(market_state, "_posttrade_state"):
+            market_state._posttrade_state = PriceLevels()
+
+        # collect level records of this update
+        record_list = []
+        if update["has_records"]:
+            records = self._array_store["records"]
+            while self._record_index < len(records) and records[self._record_index]["step"] == step:
+                record_list.append(records[self._record_index])
+                self._record_index = self._record_index + 1
+
+        # post-trade state ---
+
+        levels = market_state._posttrade_state
+        for record in record_list:
+            if record["kind"] == POSTTRADE_SET:
+                levels[to_price(record["price"])] = self._to_liquidity_list(record)
+            elif record["kind"] == POSTTRADE_DELETE:
+                del levels[to_price(record["price"])]
+
+        # split by side, cache top of book
+        market_state._posttrade_state_bid = levels.view("bid", market_state._midpoint_this)
+        market_state._posttrade_state_ask = levels.view("ask", market_state._midpoint_this)
+        market_state._best_bid = None if update["best_bid"] != update["best_bid"] else to_price(update["best_bid"])
+        market_state._best_ask = None if update["best_ask"] != update["best_ask"] else to_price(update["best_ask"])
+
+        # pre-trade state ---
+
+        # copy of post-trade state, with levels that differ after trades
+        pretrade_state_bid = dict(market_state._posttrade_state_bid.items())
+        pretrade_state_ask = dict(market_state._posttrade_state_ask.items())
+        is_reverted = False
+        for record in record_list:
+            if record["kind"] == PRETRADE_BID_SET:
+                pretrade_state_bid[to_price(record["price"])] = self._to_liquidity_list(record)
+                is_reverted = True
+            elif record["kind"] == PRETRADE_ASK_SET:
+                pretrade_state_ask[to_price(record["price"])] = self._to_liquidity_list(record)
+                is_reverted = True
+
+        # restore price priority (bid side DESCENDING, ask side ASCENDING)
+        if is_reverted:
+            pretrade_state_bid = dict(sorted(pretrade_state_bid.items(), reverse=True))
+            pretrade_state_ask = dict(sorted(pretrade_state_ask.items(), reverse=False))
+        market_state._pretrade_state_bid = pretrade_state_bid
+        market_state._pretrade_state_ask = pretrade_state_ask
+
+        # fetch the relevant orders submitted by the trading agent
+        _ = market_state._update_simulated_orders()
+
+        return True
+
+    def seek(self, num_updates):
+        """
+        Skip the first num_updates updates, e.g. once the market state has
+        been restored from a snapshot taken after these updates.
+
+        :param num_updates:
+            int, number of updates to skip
+        """
+
+        self._step = num_updates
+        self._record_index = int(np.searchsorted(self._array_store["records"]["step"], num_updates))
+
+    def _to_timestamp(self, value):
+        """
+        Timestamp for a given integer value (ns), reused across updates.
+        """
+
+        value = int(value)
+        if value not in self._timestamp_store:
+            self._timestamp_store[value] = pd.Timestamp(value)
+
+        return self._timestamp_store[value]
+
+    def _to_liquidity_list(self, record):
+        """
+        Liquidity_list for a given level record, see `_add_record`.
+        """
+
+        queue = self._array_store["queue"][record["start"]:record["stop"]]
+
+        return [(self._to_timestamp(timestamp), float(quantity))
+            for timestamp, quantity in zip(queue["timestamp"].tolist(), queue["quantity"].tolist())
+        ]
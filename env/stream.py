@@ -0,0 +1,191 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# general imports
+import numpy as np
+import pandas as pd
+import re
+
+DATETIME = "TIMESTAMP_UTC"
+
+
+def book_usecols(book_depth=None):
+    """
+    Columns to load from a BOOK source, that is, the timestamp and all price
+    levels up to book_depth (e.g. 'L1-BidPrice', ..., 'L3-AskSize').
+
+    :param book_depth:
+        int, number of price levels, None for all price levels
+    :return usecols:
+        callable, see pd.read_csv, None to load all columns
+    """
+
+    if book_depth is None:
+        return None
+
+    # columns that do not refer to a price level are kept
+    def usecols(column):
+        match = re.match(r"L(\d+)-", column)
+        return not match or int(match.group(1)) <= book_depth
+
+    return usecols
+
+
+class BookStream:
+
+    def __init__(self, path, chunk_rows=100_000, book_depth=None):
+        """
+        Stream over a BOOK source (.csv(.gz)) that reads the file in chunks of
+        chunk_rows rows, rather than as a whole. Use `read(timestamp_end)` to
+        obtain all rows up to timestamp_end that have not been read before.
+
+        Rows are deduplicated exactly as in Episode, that is, a row is dropped
+        if the same book state has occurred in any previous row of the file.
+        To this end, a sorted array of hashes of all book states seen so far
+        is kept (8 bytes per distinct book state).
+
+        Note that rows are expected to be sorted by timestamp.
+
+        :param path:
+            str, path to .csv(.gz) file
+        :param chunk_rows:
+            int, number of rows to read at once, default is 100_000
+        :param book_depth:
+            int, number of price levels to load, None for all price levels
+        """
+
+        # ...
+        self._reader = pd.read_csv(path, parse_dates=[DATETIME], chunksize=chunk_rows,
+            usecols=book_usecols(book_depth),
+        )
+        self._is_exhausted = False
+
+        # hashes of all book states seen so far (sorted)
+        self._seen = np.empty(0, dtype=np.uint64)
+
+        # rows that have been read from file but not yet returned
+        self._buffer = None
+        self._pull()
+
+        # ...
+        self.is_empty = not len(self._buffer.index)
+
+    def _pull(self):
+        """
+        Read the next chunk of rows from file, deduplicate and append them
+        to the buffer.
+        """
+
+        try:
+            df = next(self._reader)
+        except StopIteration:
+            self._is_exhausted = True
+            return
+
+        # hash book states, cast to float so that hashes do not depend on
+        # the dtype inferred per chunk
+        hashes = pd.util.hash_pandas_object(df.iloc[:, 1:].astype(float),
+            index=False,
+        ).to_numpy()
+
+        # keep first occurrence within chunk, if not seen in previous chunks
+        index = np.minimum(np.searchsorted(self._seen, hashes), max(len(self._seen) - 1, 0))
+        is_seen = (self._seen[index] == hashes) if len(self._seen) else np.zeros(len(hashes), dtype=bool)
+        is_first = ~pd.Series(hashes).duplicated().to_numpy() & ~is_seen
+
+        # ...
+        df = df[is_first].reset_index(drop=True)
+        self._seen = np.union1d(self._seen, hashes[is_first])
+
+        # make timestamp timezone-unaware
+        df[DATETIME] = pd.DatetimeIndex(df[DATETIME]).tz_localize(None)
+
+        # ...
+        self._buffer = df if self._buffer is None else pd.concat([self._buffer, df],
+            ignore_index=True,
+        )
+
+    def read(self, timestamp_end, inclusive=False):
+        """
+        Return all rows up to timestamp_end that have not been read before.
+
+        :param timestamp_end:
+            pd.Timestamp, ...
+        :param inclusive:
+            bool, whether to include rows with timestamp equal to timestamp_end
+        :return df:
+            pd.DataFrame, ...
+        """
+
+        # make sure that buffer includes all rows up to timestamp_end
+        while not self._is_exhausted and (not len(self._buffer.index) or
+            self._buffer[DATETIME].iloc[-1] <= timestamp_end
+        ):
+            self._pull()
+
+        # split buffer
+        if inclusive:
+            mask = self._buffer[DATETIME] <= timestamp_end
+        else:
+            mask = self._buffer[DATETIME] < timestamp_end
+        df = self._buffer[mask]
+        self._buffer = self._buffer[~mask]
+
+        return df
+
+
+class TradesStream:
+
+    def __init__(self, path):
+        """
+        Stream over a TRADES source (.json). Trades are loaded per date as a
+        whole (trades are small compared to book updates), but returned only
+        per time window using `read(...)`, filtered as in Episode.
+
+        :param path:
+            str, path to .json file
+        """
+
+        # ...
+        self._df = pd.read_json(path, convert_dates=True)
+
+        # timezone-unaware timestamps, used to select time windows
+        self._timestamps = pd.Series(pd.DatetimeIndex(self._df[DATETIME]).tz_localize(None),
+            index=self._df.index,
+        )
+
+        # ...
+        self.is_empty = not len(self._df.index)
+
+    def read(self, timestamp_start, timestamp_end, timestamp_book, inclusive=False):
+        """
+        Return all trades between timestamp_start and timestamp_end that have
+        a corresponding book update.
+
+        :param timestamp_start:
+            pd.Timestamp, ...
+        :param timestamp_end:
+            pd.Timestamp, ...
+        :param timestamp_book:
+            pd.Series, timestamps of book updates in the same time window
+        :param inclusive:
+            bool, whether to include trades with timestamp equal to timestamp_end
+        :return df:
+            pd.DataFrame, ...
+        """
+
+        # select time window
+        mask = self._timestamps >= timestamp_start
+        if inclusive:
+            mask = mask & (self._timestamps <= timestamp_end)
+        else:
+            mask = mask & (self._timestamps < timestamp_end)
+
+        # trades require a corresponding book update
+        mask = mask & self._df[DATETIME].isin(timestamp_book)
+
+        # make timestamp timezone-unaware
+        df = self._df.loc[mask].copy()
+        df[DATETIME] = self._timestamps[mask]
+
+        return df
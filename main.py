@@ -2,10 +2,13 @@
 # -*- coding: utf-8 -*-
 
 from agent.agent import BaseAgent
+from env.campaign import Campaign
 from env.replay import Backtest
 
+import argparse
 import numpy as np
 import pandas as pd
+import sys
 
 
 class Agent(BaseAgent):
@@ -104,6 +107,28 @@ class Agent(BaseAgent):
 
 if __name__ == "__main__":
 
+    # Option 4 (worker): run episodes of a campaign directory on a shared 
+    # filesystem, start any number of workers on any host using
+    # `python main.py --campaign <directory> [--source-directory <path>]`
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", help="campaign directory to work on")
+    parser.add_argument("--source-directory", help="path to sources on this host")
+    parser.add_argument("--claim-timeout", type=int, default=3600, 
+        help="seconds after which claims of dead workers are returned",
+    )
+    parser.add_argument("--max-attempts", type=int, default=3, 
+        help="failed attempts after which an episode is given up (moved to failed/)",
+    )
+    args = parser.parse_args()
+
+    if args.campaign:
+        Campaign(args.campaign).work(
+            claim_timeout=args.claim_timeout,
+            source_directory=args.source_directory,
+            max_attempts=args.max_attempts,
+        )
+        sys.exit()
+
     # TODO: INSTANTIATE AGENT. Please refer to the corresponding file for more information.
     agent = Agent(
         name="test_agent",
@@ -184,6 +209,21 @@ if __name__ == "__main__":
         time_end="08:06:00",
     )
 
+    # Option 4: share a series of specified episodes across worker processes
+    # on any number of hosts, that is, write a campaign to a directory on a
+    # shared filesystem and start workers using `python main.py --campaign 
+    # <directory>`, results are available via Campaign(<directory>).results
+    # Campaign.create(
+    #     directory="/mnt/shared/campaign_2021_01",
+    #     agent_factory=functools.partial(Agent, name="test_agent"),
+    #     identifier_list=identifier_list,
+    #     source_directory=r"C:\Users\Tino\Data\EFN2",
+    #     episode_list=[
+    #         ("2021-01-04T08:00:00", "2021-01-04T08:05:00", "2021-01-04T08:06:00"),
+    #         # ...
+    #     ],
+    # )
+
     # TODO: EVALUATE YOUR BACKTESTING RESULTS
     # E.g., you can use result list backtest.results to analyze your runs
     pnl_realized_all_runs = [d['PnL_realized'] for d in backtest.results]